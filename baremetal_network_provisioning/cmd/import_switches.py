@@ -0,0 +1,189 @@
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Import an inventory of physical switches and their credentials.
+
+The inventory is a JSON document such as:
+
+    {"credentials": [{"name": "creds1", "protocol_type": "snmpv2c",
+                      "write_community": "public"}],
+     "switches": [{"name": "sw1", "ip_address": "10.0.0.1",
+                   "mac_address": "44:31:92:61:89:d2", "vendor": "hpe",
+                   "management_protocol": "snmpv2c",
+                   "credentials": "creds1"}]}
+
+Switches refer to credentials by name or id. The credentials, the
+switches and their validation jobs are written in one transaction, the
+switches with a single executemany insert, then the jobs are run. Jobs
+left behind by an interrupted import are restarted by the ML2 worker.
+
+Usage: bnp-import-switches --config-file /etc/neutron/neutron.conf
+       --config-file /etc/neutron/plugins/ml2/ml2_conf_hpe.ini INVENTORY
+"""
+
+import json
+import sys
+
+import webob.exc
+
+from neutron._i18n import _LE
+from neutron._i18n import _LI
+from neutron.common import config
+from neutron import context as neutron_context
+
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from baremetal_network_provisioning.common import constants as const
+from baremetal_network_provisioning.common import exceptions
+from baremetal_network_provisioning.db import bm_nw_provision_db as db
+from baremetal_network_provisioning.ml2.extensions import bnp_switch
+# registers the ml2_hpe options
+from baremetal_network_provisioning.ml2 import mechanism_hpe  # noqa
+
+LOG = logging.getLogger(__name__)
+
+cli_opts = [
+    cfg.StrOpt('inventory', positional=True,
+               help=_("JSON file of the switches and credentials to "
+                      "import")),
+]
+
+SWITCH_KEYS = ['name', 'ip_address', 'vendor', 'management_protocol',
+               'credentials', 'mac_address']
+SNMP_CRED_KEYS = ['name', 'protocol_type', 'write_community',
+                  'security_name', 'auth_protocol', 'auth_key',
+                  'priv_protocol', 'priv_key', 'security_level']
+NETCONF_CRED_KEYS = ['name', 'protocol_type', 'user_name', 'password',
+                     'key_path']
+
+
+def _error(msg):
+    return exceptions.HPNetProvisioningConfigError(msg=msg)
+
+
+def _add_credentials(context, credentials):
+    """Add the credentials and map their (name, protocol) to their id."""
+    cred_ids = {}
+    for cred in credentials:
+        protocol = cred.get('protocol_type')
+        if protocol not in const.SUPPORTED_PROTOCOLS:
+            raise _error(_("Invalid protocol %(protocol)s of credentials "
+                           "%(name)s") % {'protocol': protocol,
+                                          'name': cred.get('name')})
+        if const.PROTOCOL_SNMP in protocol:
+            cred = dict((key, cred.get(key)) for key in SNMP_CRED_KEYS)
+            db_cred = db.add_bnp_snmp_cred(context, cred)
+        else:
+            cred = dict((key, cred.get(key)) for key in NETCONF_CRED_KEYS)
+            db_cred = db.add_bnp_netconf_cred(context, cred)
+        cred_ids[(cred['name'], protocol)] = db_cred.id
+    return cred_ids
+
+
+def _check_switches(context, switches):
+    """Check the switches are complete and their addresses unused."""
+    ip_addresses = set()
+    mac_addresses = set()
+    for switch in switches:
+        for key in SWITCH_KEYS:
+            if not switch.get(key):
+                raise _error(_("Key %(key)s not found in switch %(switch)s")
+                             % {'key': key, 'switch': switch})
+        if switch['ip_address'] in ip_addresses:
+            raise _error(_("Duplicate ip_address %s in the inventory") %
+                         switch['ip_address'])
+        if switch['mac_address'] in mac_addresses:
+            raise _error(_("Duplicate mac_address %s in the inventory") %
+                         switch['mac_address'])
+        ip_addresses.add(switch['ip_address'])
+        mac_addresses.add(switch['mac_address'])
+    for ip_address, mac_address in db.get_bnp_phys_switches_by_ip_or_mac(
+            context, ip_addresses, mac_addresses):
+        if ip_address in ip_addresses:
+            raise _error(_("Switch with ip_address %s is already present") %
+                         ip_address)
+        raise _error(_("Switch with mac_address %s is already present") %
+                     mac_address)
+
+
+def import_inventory(context, inventory):
+    """Add the switches and credentials of an inventory.
+
+    Returns the added switches, whose validation is pending, each with
+    the id of its validation job.
+    """
+    switches = inventory.get('switches', [])
+    with context.session.begin(subtransactions=True):
+        cred_ids = _add_credentials(context,
+                                    inventory.get('credentials', []))
+        _check_switches(context, switches)
+        for switch in switches:
+            protocol = switch['management_protocol']
+            creds = switch['credentials']
+            if (creds, protocol) in cred_ids:
+                switch['credentials'] = cred_ids[(creds, protocol)]
+            else:
+                try:
+                    access_parameters = bnp_switch.get_access_param(
+                        context, protocol, creds)
+                except webob.exc.HTTPBadRequest as e:
+                    raise _error(e.explanation)
+                switch['credentials'] = access_parameters['id']
+            # the default of the family attribute of the API
+            switch.setdefault('family', '')
+            switch['port_provisioning'] = (
+                const.PORT_PROVISIONING_STATUS['enable'])
+            switch['validation_result'] = const.VALIDATION_PENDING
+        switches = db.add_bnp_phys_switches(context, switches)
+        for switch in switches:
+            switch['validation_job'] = db.add_bnp_validation_job(
+                context, switch['id'])['id']
+        return switches
+
+
+def validate_switches(context, controller, switches):
+    """Run the validation jobs of switches and map them to their result."""
+    controller.run_validation_jobs([switch['validation_job']
+                                    for switch in switches])
+    context.session.expire_all()
+    results = {}
+    for switch in switches:
+        job = db.get_bnp_validation_job(context, switch['validation_job'])
+        results[switch['id']] = job['validation_result'] if job else None
+    return results
+
+
+def main():
+    cfg.CONF.register_cli_opts(cli_opts)
+    config.init(sys.argv[1:])
+    config.setup_logging()
+    with open(cfg.CONF.inventory) as inventory_file:
+        inventory = json.load(inventory_file)
+    context = neutron_context.get_admin_context()
+    controller = bnp_switch.BNPSwitchController()
+    try:
+        switches = import_inventory(context, inventory)
+    except exceptions.HPNetProvisioningConfigError as e:
+        LOG.error(_LE("Inventory not imported: %s"), e)
+        return 1
+    LOG.info(_LI("Imported %s switches"), len(switches))
+    results = validate_switches(context, controller, switches)
+    failed = [switch['name'] for switch in switches
+              if results[switch['id']] != const.SUCCESS]
+    if failed:
+        LOG.error(_LE("Validation failed for switches %s"), failed)
+        return 1
+    return 0
@@ -37,9 +37,13 @@ SNMP_V3 = 'snmpv3'
 SNMP_PORT = 161
 PHY_PORT_TYPE = '6'
 SNMP_NO_SUCH_INSTANCE = 'No Such'
+# Error status of an SNMPv1 request reading an object that does not exist
+SNMP_NO_SUCH_NAME = 2
 
 NETCONF_SSH = 'netconf_ssh'
 NETCONF_SOAP = 'netconf_soap'
+# Columns shared by the SNMP and NETCONF credential tables
+CREDENTIAL_COLUMNS = ('id', 'name', 'protocol_type')
 
 OID_MAC_ADDRESS = '1.0.8802.1.1.2.1.3.2.0'
 OID_IF_INDEX = '1.3.6.1.2.1.2.2.1.1'
@@ -49,6 +53,8 @@ OID_PORT_STATUS = '1.3.6.1.2.1.2.2.1.8'
 OID_VLAN_CREATE = '1.3.6.1.2.1.17.7.1.4.3.1.5'
 OID_VLAN_EGRESS_PORT = '1.3.6.1.2.1.17.7.1.4.3.1.2'
 OID_SYS_NAME = '1.3.6.1.2.1.1.5.0'
+# Objects read or written by a single multi-varbind request
+SNMP_MAX_VAR_BINDS = 24
 PROTOCOL_SNMP = 'snmp'
 PORT_STATUS = {'1': 'UP',
                '2': 'DOWN',
@@ -65,3 +71,24 @@ REQUEST_TIMED_OUT = 'Request Timed Out'
 NO_DRVR_FOUND = 'No Provisioning driver found for given Vendor/Family/Protocol'
 FAMILY = 'family'
 DEVICE_NOT_REACHABLE = 'Either device is not reacheable or invalid credentials'
+NO_CREDENTIALS_FOUND = 'No credentials found for the switch'
+VALIDATION_PENDING = 'Pending'
+
+JOB_PENDING = 'PENDING'
+JOB_RUNNING = 'RUNNING'
+JOB_DONE = 'DONE'
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+BNP_CREDENTIALS_GENERATION = 'bnp_credentials'
+BNP_SWITCHES_GENERATION = 'bnp_physical_switches'
+BNP_SWITCH_PORTS_GENERATION = 'bnp_switch_port_mappings'
+BNP_SWITCH_PHYSICAL_PORTS_GENERATION = 'bnp_switch_physical_ports'
+
+# Rows read and encoded at a time by the streamed list responses
+STREAM_CHUNK_SIZE = 1000
+
+# Retries of an egress update from the stored vlan bitmap
+VLAN_EGRESS_RETRIES = 3
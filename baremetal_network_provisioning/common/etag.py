@@ -0,0 +1,57 @@
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Conditional GET of the BNP collections."""
+
+import webob.dec
+import webob.exc
+
+from neutron import wsgi
+
+from baremetal_network_provisioning.db import bm_nw_provision_db as db
+
+
+class ETagResource(object):
+    """Add generation based ETags to the index of a WSGI resource.
+
+    The ETag of a collection is made of the generation counters of the
+    tables it is read from, which the DB write functions bump. A GET
+    whose If-None-Match holds the current ETag gets a 304 without the
+    rows being read or serialized.
+    """
+
+    def __init__(self, application, resources):
+        self.application = application
+        self.resources = resources
+
+    def get_etag(self, context):
+        generations = db.get_bnp_generations(context, self.resources)
+        return '-'.join(str(generations[resource])
+                        for resource in self.resources)
+
+    @webob.dec.wsgify(RequestClass=wsgi.Request)
+    def __call__(self, request):
+        route_args = request.environ.get('wsgiorg.routing_args',
+                                         ((), {}))[1]
+        if request.method != 'GET' or route_args.get('action') != 'index':
+            return request.get_response(self.application)
+        # read before the rows, a write in between only costs a refetch
+        etag = self.get_etag(request.context)
+        if etag in request.if_none_match:
+            return webob.exc.HTTPNotModified(etag=etag)
+        response = request.get_response(self.application)
+        if response.status_int == 200:
+            response.etag = etag
+        return response
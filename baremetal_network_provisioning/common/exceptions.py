@@ -37,6 +37,11 @@ class ConnectionFailed(exceptions.NeutronException):
     message = _(" Connection has failed: %(msg)s")
 
 
+class StreamTimeout(exceptions.NeutronException):
+    message = _("Streaming %(collection)s took more than %(timeout)s "
+                "seconds")
+
+
 class SNMPFailure(exc.HTTPBadRequest):
 
     def __init__(self, **kwargs):
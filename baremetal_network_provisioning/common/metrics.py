@@ -0,0 +1,291 @@
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process timing metrics of the provisioning hot paths."""
+
+import bisect
+import collections
+import functools
+import math
+import threading
+import time
+
+from neutron._i18n import _LW
+
+from oslo_config import cfg
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Sliding windows of the switch statistics, in seconds
+STATS_WINDOWS = (60, 300, 3600)
+STATS_MAX_SAMPLES = 10000
+PERCENTILES = (50, 90, 99)
+
+
+class Histogram(object):
+    """Cumulative histogram of durations in seconds."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            snapshot = {'count': self.count, 'sum': self.sum}
+        buckets = collections.OrderedDict()
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        snapshot['buckets'] = buckets
+        return snapshot
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(name):
+    """Get the histogram registered under name, creating it if needed."""
+    with _histograms_lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram()
+        return _histograms[name]
+
+
+def observe(name, value):
+    histogram(name).observe(value)
+
+
+def get_histograms():
+    """Get a snapshot of every registered histogram."""
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    return dict((name, hist.snapshot())
+                for name, hist in histograms.items())
+
+
+class PhaseTimer(object):
+    """Time the consecutive phases of one operation.
+
+    Each call to lap() closes the phase that started at the previous
+    lap, or at the creation of the timer, under the given name.
+    """
+
+    def __init__(self, operation, **details):
+        self.operation = operation
+        self.details = details
+        self.phases = collections.OrderedDict()
+        self._start = self._last = time.time()
+
+    def lap(self, phase):
+        now = time.time()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def finish(self, threshold=None):
+        """Feed the histograms and log a breakdown of a slow operation."""
+        if not self.phases:
+            # nothing of interest was timed, e.g. a port of another driver
+            return
+        total = time.time() - self._start
+        observe(self.operation, total)
+        for phase, elapsed in self.phases.items():
+            observe('%s.%s' % (self.operation, phase), elapsed)
+        if threshold and total >= threshold:
+            fields = ['%s=%s' % item for item in sorted(self.details.items())]
+            fields.append('total=%.3fs' % total)
+            fields.extend('%s=%.3fs' % item for item in self.phases.items())
+            LOG.warning(_LW("Slow %(operation)s: %(fields)s"),
+                        {'operation': self.operation,
+                         'fields': ' '.join(fields)})
+        return total
+
+
+class SlidingWindow(object):
+    """Timestamped samples of the last max_age seconds.
+
+    At most max_samples are kept, the oldest are dropped first. A busy
+    window then holds less than max_age seconds of samples, which span
+    tells.
+    """
+
+    def __init__(self, max_age=STATS_WINDOWS[-1],
+                 max_samples=STATS_MAX_SAMPLES):
+        self.max_age = max_age
+        self.samples = collections.deque(maxlen=max_samples)
+        # stamp of the last sample dropped to make room for a new one
+        self._dropped_at = None
+        self._lock = threading.Lock()
+
+    def add(self, value, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if len(self.samples) == self.samples.maxlen:
+                self._dropped_at = self.samples[0][0]
+            self.samples.append((now, value))
+            while self.samples[0][0] < now - self.max_age:
+                self.samples.popleft()
+
+    def values(self, age, now=None):
+        """Get the values of the samples of the last age seconds."""
+        since = (time.time() if now is None else now) - age
+        with self._lock:
+            return [value for stamp, value in self.samples if stamp >= since]
+
+    def span(self, age, now=None):
+        """Get the seconds of the last age seconds still fully sampled."""
+        now = time.time() if now is None else now
+        with self._lock:
+            dropped_at = self._dropped_at
+        if dropped_at is not None and dropped_at >= now - age:
+            return now - dropped_at
+        return age
+
+
+OUTCOMES = 'outcomes'
+LATENCIES = 'latencies'
+
+_windows = {}
+_windows_lock = threading.Lock()
+
+
+def _window(kind, name, switch_id):
+    key = (kind, name, switch_id)
+    with _windows_lock:
+        if key not in _windows:
+            _windows[key] = SlidingWindow()
+        return _windows[key]
+
+
+def record_outcome(operation, switch_id, success, count=1):
+    """Count operations on a switch, and overall, with their failures."""
+    for scope in (None, switch_id):
+        _window(OUTCOMES, operation, scope).add(
+            (count, 0 if success else count))
+
+
+def record_latency(phase, switch_id, seconds):
+    """Record the duration of a phase on a switch, and overall."""
+    for scope in (None, switch_id):
+        _window(LATENCIES, phase, scope).add(seconds)
+
+
+def percentile(values, percent):
+    """Get the nearest rank percentile of sorted values."""
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+def _summarize_outcomes(values):
+    count = sum(value[0] for value in values)
+    failures = sum(value[1] for value in values)
+    return {'count': count, 'failures': failures,
+            'failure_rate': float(failures) / count if count else 0.0}
+
+
+def _summarize_latencies(values):
+    values = sorted(values)
+    summary = {'count': len(values)}
+    for percent in PERCENTILES:
+        summary['p%d' % percent] = (percentile(values, percent)
+                                    if values else None)
+    return summary
+
+
+def get_switch_stats(now=None):
+    """Summarize the windows of every switch, and overall under None.
+
+    Each switch maps the outcome counts of its operations and the
+    latency percentiles of its phases to their summary per window. The
+    span of a summary is the number of seconds it actually covers,
+    shorter than the window when samples were dropped to bound memory.
+    The statistics are those of the current process only.
+    """
+    now = time.time() if now is None else now
+    with _windows_lock:
+        windows = dict(_windows)
+    stats = {}
+    for (kind, name, switch_id), window in windows.items():
+        summarize = (_summarize_outcomes if kind == OUTCOMES
+                     else _summarize_latencies)
+        scope = stats.setdefault(switch_id, {OUTCOMES: {}, LATENCIES: {}})
+        summaries = {}
+        for age in STATS_WINDOWS:
+            summary = summarize(window.values(age, now))
+            summary['span'] = window.span(age, now)
+            summaries[str(age)] = summary
+        scope[kind][name] = summaries
+    return stats
+
+
+_local = threading.local()
+
+
+def lap(phase):
+    """Close a phase of the operation timed in this thread, if any."""
+    timers = getattr(_local, 'timers', None)
+    if timers:
+        timers[-1].lap(phase)
+
+
+def timed(operation):
+    """Decorate a method so the phases it reports through lap() are timed.
+
+    The first positional argument after self, when it is a port dict or
+    a port id, is recorded in the slow operation log line.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            timer = PhaseTimer(operation, port=_port_id(args))
+            timers = getattr(_local, 'timers', None)
+            if timers is None:
+                timers = _local.timers = []
+            timers.append(timer)
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                timers.pop()
+                timer.finish(cfg.CONF.ml2_hpe.slow_bind_threshold)
+        return wrapper
+    return decorator
+
+
+def _port_id(args):
+    if not args:
+        return None
+    port = args[0]
+    if isinstance(port, dict):
+        return port.get('port', {}).get('id')
+    current = getattr(port, 'current', None)
+    if isinstance(current, dict):
+        return current.get('id')
+    return port
@@ -18,6 +18,8 @@ from baremetal_network_provisioning.common import exceptions
 
 import struct
 
+from eventlet import tpool
+from neutron._i18n import _LW
 from oslo_config import cfg
 from oslo_log import log as logging
 from pysnmp.entity.rfc3413.oneliner import cmdgen
@@ -40,6 +42,38 @@ Priv_protocol = {None: cmdgen.usmNoPrivProtocol,
                  'aes256': cmdgen.usmAesCfb256Protocol}
 
 
+# set by the first request of this module run in the native thread pool
+_pool_started = False
+
+
+def set_thread_pool_size(size):
+    """Size the native thread pool running the blocking SNMP requests.
+
+    The pool is the tpool of eventlet, shared by the whole process and
+    sized by its first call, so the size only applies when set before
+    that call. The mechanism driver sets it when initialized, before
+    any SNMP request. Once this module has used the pool the size is
+    ignored with a warning.
+    """
+    if _pool_started:
+        LOG.warning(_LW("The native thread pool is already running, "
+                        "snmp_thread_pool_size %s is ignored"), size)
+        return
+    tpool.set_num_threads(size)
+
+
+def _execute(func, *args, **kwargs):
+    """Run a blocking pysnmp call in the native thread pool.
+
+    pysnmp waits for responses in its own socket loop, which would
+    otherwise block every green thread of the neutron-server worker
+    until the request completes or times out.
+    """
+    global _pool_started
+    _pool_started = True
+    return tpool.execute(func, *args, **kwargs)
+
+
 class SNMPClient(object):
 
     """SNMP client object.
@@ -88,14 +122,16 @@ class SNMPClient(object):
             timeout=self.timeout,
             retries=self.retries)
 
-    def get(self, oid):
-        """Use PySNMP to perform an SNMP GET operation on a single object.
+    def get(self, *oids):
+        """Use PySNMP to perform an SNMP GET operation on objects.
 
+        Several objects are read with a single request.
         """
         try:
-            results = self.cmd_gen.getCmd(self._get_auth(),
-                                          self._get_transport(),
-                                          oid)
+            results = _execute(self.cmd_gen.getCmd,
+                               self._get_auth(),
+                               self._get_transport(),
+                               *oids)
         except snmp_error.PySnmpError as e:
             raise exceptions.SNMPFailure(operation="GET", error=e)
 
@@ -111,13 +147,55 @@ class SNMPClient(object):
 
         return var_binds
 
+    def get_existing(self, *oids):
+        """Use PySNMP to read several objects that may not exist.
+
+        Returns the values of the objects in the order of oids, None for
+        the objects the agent does not have. SNMPv2c and SNMPv3 agents
+        report them object by object, SNMPv1 agents fail the request with
+        noSuchName on the first of them, which is then left out of the
+        request sent again.
+        """
+        positions = range(len(oids))
+        values = [None] * len(oids)
+        while positions:
+            try:
+                results = _execute(self.cmd_gen.getCmd,
+                                   self._get_auth(),
+                                   self._get_transport(),
+                                   *[oids[position]
+                                     for position in positions])
+            except snmp_error.PySnmpError as e:
+                raise exceptions.SNMPFailure(operation="GET", error=e)
+
+            error_indication, error_status, error_index, var_binds = results
+
+            if error_indication:
+                raise exceptions.SNMPFailure(operation="GET",
+                                             error=error_indication)
+
+            if error_status:
+                if (int(error_status) != constants.SNMP_NO_SUCH_NAME or
+                        not 0 < int(error_index) <= len(positions)):
+                    raise exceptions.SNMPFailure(
+                        operation="GET", error=error_status.prettyPrint())
+                del positions[int(error_index) - 1]
+                continue
+
+            for position, (name, value) in zip(positions, var_binds):
+                if constants.SNMP_NO_SUCH_INSTANCE not in value.prettyPrint():
+                    values[position] = value
+            break
+        return values
+
     def get_bulk(self, *oids):
         try:
-            results = self.cmd_gen.bulkCmd(self._get_auth(),
-                                           self._get_transport(),
-                                           0, 52,
-                                           *oids
-                                           )
+            results = _execute(self.cmd_gen.bulkCmd,
+                               self._get_auth(),
+                               self._get_transport(),
+                               0, 52,
+                               *oids
+                               )
         except snmp_error.PySnmpError as e:
             raise exceptions.SNMPFailure(operation="GET_BULK", error=e)
 
@@ -140,11 +218,20 @@ class SNMPClient(object):
         :param value: The value of the object to set.
         :raises: SNMPFailure if an SNMP request fails.
         """
+        self.set_multiple([(oid, value)])
+
+    def set_multiple(self, var_binds):
+        """Use PySNMP to perform an SNMP SET operation on several objects.
+
+        :param var_binds: The (oid, value) pairs to set in one request.
+        :raises: SNMPFailure if an SNMP request fails.
+        """
         try:
             # oid = tuple(map(string.atoi, string.split(oid, '.')[1:]))
-            results = self.cmd_gen.setCmd(self._get_auth(),
-                                          self._get_transport(),
-                                          (oid, value))
+            results = _execute(self.cmd_gen.setCmd,
+                               self._get_auth(),
+                               self._get_transport(),
+                               *var_binds)
         except Exception as e:
             raise exceptions.SNMPFailure(operation="SET", error=e)
         except snmp_error.PySnmpError as e:
@@ -0,0 +1,117 @@
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Streamed JSON responses of the large BNP collections."""
+
+import itertools
+import json
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+import webob
+import webob.dec
+import webob.exc
+
+from neutron._i18n import _LE
+from neutron import wsgi
+
+from baremetal_network_provisioning.common import constants as const
+from baremetal_network_provisioning.common import exceptions as hp_exc
+
+LOG = logging.getLogger(__name__)
+
+JSON_CONTENT_TYPE = 'application/json'
+
+
+def _chunks(items, chunk_size):
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def _encode_chunks(collection, chunks, timeout=0):
+    """Encode {collection: [items]} as JSON from chunks of items.
+
+    A failure once the response has started, including a stream that
+    takes more than timeout seconds, is raised to the WSGI server which
+    aborts the connection. Closing the JSON instead would pass the items
+    sent so far for the whole collection.
+    """
+    started = time.time()
+    yield '{%s: [' % json.dumps(collection)
+    separator = ''
+    try:
+        for chunk in chunks:
+            yield separator + ', '.join(json.dumps(item) for item in chunk)
+            separator = ', '
+            # the rows are read from a cursor holding a DB connection
+            # for as long as the client takes to read them
+            if timeout and time.time() - started > timeout:
+                raise hp_exc.StreamTimeout(collection=collection,
+                                           timeout=timeout)
+    except Exception as e:
+        LOG.error(_LE("Aborting the stream of %(collection)s: %(err)s"),
+                  {'collection': collection, 'err': e})
+        raise
+    yield ']}'
+
+
+def encode_collection(collection, items, chunk_size=const.STREAM_CHUNK_SIZE):
+    """Encode {collection: [items]} as JSON, chunk_size items at a time."""
+    return _encode_chunks(collection, _chunks(items, chunk_size))
+
+
+class StreamingIndexResource(object):
+    """Stream the JSON index of a WSGI resource.
+
+    The index items come from the iter_index method of the controller
+    and are encoded while the response body is written, so the memory
+    used is bounded by the chunk size rather than by the collection.
+    The first chunk is read before the response starts, so that a
+    failing query still gets an error status. Other actions, other
+    formats and invalid requests go to the wrapped resource, which
+    renders their faults.
+    """
+
+    def __init__(self, application, controller):
+        self.application = application
+        self.controller = controller
+
+    @webob.dec.wsgify(RequestClass=wsgi.Request)
+    def __call__(self, request):
+        route_args = request.environ.get('wsgiorg.routing_args',
+                                         ((), {}))[1]
+        if (request.method != 'GET' or route_args.get('action') != 'index'
+                or request.best_match_content_type() != JSON_CONTENT_TYPE):
+            return request.get_response(self.application)
+        try:
+            collection, items = self.controller.iter_index(request)
+            chunks = _chunks(items, const.STREAM_CHUNK_SIZE)
+            first = list(itertools.islice(chunks, 1))
+        except webob.exc.HTTPException:
+            return request.get_response(self.application)
+        except Exception as e:
+            LOG.error(_LE("Error in listing %(path)s: %(err)s"),
+                      {'path': request.path, 'err': e})
+            return webob.exc.HTTPInternalServerError()
+        app_iter = _encode_chunks(collection,
+                                  itertools.chain(first, chunks),
+                                  cfg.CONF.ml2_hpe.stream_timeout)
+        return webob.Response(request=request,
+                              content_type=JSON_CONTENT_TYPE,
+                              app_iter=app_iter)
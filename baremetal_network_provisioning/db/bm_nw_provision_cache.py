@@ -0,0 +1,228 @@
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_utils import timeutils
+
+from baremetal_network_provisioning.common import constants as const
+from baremetal_network_provisioning.db import bm_nw_provision_db as db
+
+
+LOG = logging.getLogger(__name__)
+
+
+class GenerationCache(object):
+    """Process-local cache validated against a DB generation counter.
+
+    Entries are dropped as soon as the generation stored in
+    bnp_generations differs from the one they were loaded under, so a
+    write made through any neutron-server worker invalidates the
+    entries held by every other worker. The generation is read at most
+    once per cache_generation_ttl, unless this process bumped it since.
+    """
+
+    def __init__(self, resource):
+        self.resource = resource
+        self._generation = None
+        self._checked_at = None
+        self._local_bumps = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _sync(self, context):
+        now = time.time()
+        ttl = cfg.CONF.ml2_hpe.cache_generation_ttl
+        local_bumps = db.get_local_bnp_bumps(self.resource)
+        with self._lock:
+            if (self._checked_at is not None and
+                    local_bumps == self._local_bumps and
+                    now - self._checked_at < ttl):
+                return self._generation
+        generation = db.get_bnp_generation(context, self.resource)
+        with self._lock:
+            if generation != self._generation:
+                LOG.debug("Resetting %(resource)s cache at generation "
+                          "%(generation)s", {'resource': self.resource,
+                                             'generation': generation})
+                self._entries.clear()
+                self._generation = generation
+            self._checked_at = now
+            self._local_bumps = local_bumps
+        return generation
+
+    def get(self, context, key, loader):
+        """Return the cached value for key, loading it on a miss."""
+        generation = self._sync(context)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+        value = loader()
+        if value:
+            with self._lock:
+                if self._generation == generation:
+                    self._entries[key] = value
+        return value
+
+    def invalidate(self):
+        """Drop every entry held by this worker."""
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
+            self._checked_at = None
+
+
+class SwitchSnapshot(collections.Mapping):
+    """Read-only copy of a BNPPhysicalSwitch row.
+
+    Columns are readable both as keys and as attributes, like on the
+    row itself, but a snapshot is shared by every caller of the cache
+    and cannot be modified. Copy it with dict() to get a mutable dict.
+    """
+
+    __slots__ = ('_values',)
+
+    def __init__(self, switch):
+        object.__setattr__(self, '_values', dict(switch))
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(_("BNP switch snapshots are read-only"))
+
+    def __repr__(self):
+        return 'SwitchSnapshot(%r)' % self._values
+
+
+credentials = GenerationCache(const.BNP_CREDENTIALS_GENERATION)
+switches = GenerationCache(const.BNP_SWITCHES_GENERATION)
+physical_ports = GenerationCache(const.BNP_SWITCH_PHYSICAL_PORTS_GENERATION)
+
+
+def _cred_to_dict(cred):
+    return dict(cred) if cred else None
+
+
+def get_credential_by_id(context, protocol, cred_id):
+    """Get the credential dict that matches id for the protocol."""
+    def _load():
+        if const.PROTOCOL_SNMP in protocol:
+            cred = db.get_snmp_cred_by_id(context, cred_id)
+        else:
+            cred = db.get_netconf_cred_by_id(context, cred_id)
+        return _cred_to_dict(cred)
+    cred = credentials.get(context, ('id', cred_id), _load)
+    return dict(cred) if cred else None
+
+
+def get_credentials_by_name(context, protocol, name):
+    """Get the credential dicts that match name and protocol."""
+    def _load():
+        if const.PROTOCOL_SNMP in protocol:
+            creds = db.get_snmp_cred_by_name_and_protocol(context, name,
+                                                          protocol)
+        else:
+            creds = db.get_netconf_cred_by_name_and_protocol(context, name,
+                                                             protocol)
+        return tuple(_cred_to_dict(cred) for cred in creds or [])
+    creds = credentials.get(context, ('name', name, protocol), _load)
+    return [dict(cred) for cred in creds]
+
+
+def _switch_snapshot(switch):
+    return SwitchSnapshot(switch) if switch else None
+
+
+def get_switch_by_id(context, switch_id):
+    """Get the snapshot of the switch that matches id."""
+    def _load():
+        return _switch_snapshot(db.get_bnp_phys_switch(context, switch_id))
+    return switches.get(context, ('id', switch_id), _load)
+
+
+def get_switch_by_mac(context, mac):
+    """Get the snapshot of the switch that matches mac address."""
+    def _load():
+        return _switch_snapshot(db.get_bnp_phys_switch_by_mac(context, mac))
+    return switches.get(context, ('mac', mac), _load)
+
+
+def get_switch_by_ip(context, ip_address):
+    """Get the snapshot of the switch that matches ip address."""
+    def _load():
+        return _switch_snapshot(db.get_bnp_phys_switch_by_ip(context,
+                                                             ip_address))
+    return switches.get(context, ('ip', ip_address), _load)
+
+
+def get_switches_by_name(context, name):
+    """Get the snapshots of the switches that match name."""
+    def _load():
+        return tuple(_switch_snapshot(switch) for switch in
+                     db.get_bnp_phys_switch_by_name(context, name) or [])
+    return list(switches.get(context, ('name', name), _load))
+
+
+def _port_set(ports):
+    return set((port['ifindex'], port['interface_name'],
+                port.get('port_status')) for port in ports)
+
+
+def set_switch_ports(context, switch_id, ports, max_age=None):
+    """Store the physical ports just walked on a switch.
+
+    With max_age, ports equal to the stored ones are only stored again,
+    to refresh the walk time, once the stored walk is older than max_age
+    seconds.
+    """
+    if max_age is not None:
+        walked_at, stored = get_switch_ports(context, switch_id)
+        if (walked_at and _port_set(ports) == _port_set(stored) and
+                not timeutils.is_older_than(walked_at, max_age)):
+            return
+    db.set_bnp_switch_physical_ports(context, switch_id, ports)
+
+
+def get_switch_ports(context, switch_id):
+    """Get the time of the last walk of a switch and the ports it found.
+
+    The time is None when the switch was never walked.
+    """
+    def _load():
+        ports = db.get_bnp_switch_physical_ports(context, switch_id)
+        walked_at = ports[0].walked_at if ports else None
+        return walked_at, tuple({'ifindex': port.ifindex,
+                                 'interface_name': port.interface_name,
+                                 'port_status': port.port_status}
+                                for port in ports)
+    walked_at, ports = physical_ports.get(context, switch_id, _load)
+    return walked_at, [dict(port) for port in ports]
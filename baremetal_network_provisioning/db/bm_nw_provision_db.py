@@ -13,25 +13,75 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import datetime
+
+from oslo_db import exception as db_exc
 from oslo_log import log as logging
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
+import sqlalchemy as sa
+from sqlalchemy import orm
 from sqlalchemy.orm import exc
 
+from baremetal_network_provisioning.common import constants as const
 from baremetal_network_provisioning.db import bm_nw_provision_models as models
 
+from neutron._i18n import _
 from neutron._i18n import _LE
 from neutron._i18n import _LI
+from neutron.common import exceptions as n_exc
 from neutron.db import models_v2
+from neutron.db import sqlalchemyutils
 
 
 LOG = logging.getLogger(__name__)
 
+# generation bumps made by this process, by resource
+_local_bumps = collections.Counter()
+
 
 def get_subnets_by_network(context, network_id):
     subnet_qry = context.session.query(models_v2.Subnet)
     return subnet_qry.filter_by(network_id=network_id).all()
 
 
+def get_bnp_generation(context, resource):
+    """Get the generation counter of a resource."""
+    query = context.session.query(models.BNPGeneration.generation)
+    generation = query.filter_by(resource=resource).scalar()
+    return generation or 0
+
+
+def get_bnp_generations(context, resources):
+    """Get the generation counters of several resources, by resource."""
+    generation = models.BNPGeneration
+    query = context.session.query(generation.resource,
+                                  generation.generation)
+    generations = dict(query.filter(generation.resource.in_(resources)))
+    return dict((resource, generations.get(resource) or 0)
+                for resource in resources)
+
+
+def bump_bnp_generation(context, resource):
+    """Increment the generation counter of a resource."""
+    session = context.session
+    with session.begin(subtransactions=True):
+        updated = (session.query(models.BNPGeneration).filter_by(
+            resource=resource).update(
+                {'generation': models.BNPGeneration.generation + 1},
+                synchronize_session=False))
+        if not updated:
+            session.add(models.BNPGeneration(resource=resource,
+                                             generation=1))
+    _local_bumps[resource] += 1
+
+
+def get_local_bnp_bumps(resource):
+    """Get the number of generation bumps of a resource by this process."""
+    return _local_bumps[resource]
+
+
 def add_bnp_phys_switch(context, switch):
     """Add physical switch."""
     session = context.session
@@ -49,9 +99,51 @@ def add_bnp_phys_switch(context, switch):
             vendor=switch['vendor'],
             family=switch['family'])
         session.add(phy_switch)
+        bump_bnp_generation(context, const.BNP_SWITCHES_GENERATION)
     return phy_switch
 
 
+def add_bnp_phys_switches(context, switches):
+    """Add physical switches with a single executemany insert.
+
+    Returns the inserted rows as dicts, with their generated ids.
+    """
+    rows = []
+    for switch in switches:
+        rows.append({'id': uuidutils.generate_uuid(),
+                     'name': switch['name'],
+                     'ip_address': switch['ip_address'],
+                     'mac_address': switch['mac_address'],
+                     'port_provisioning': switch['port_provisioning'],
+                     'management_protocol': switch['management_protocol'],
+                     'credentials': switch['credentials'],
+                     'validation_result': switch['validation_result'],
+                     'vendor': switch['vendor'],
+                     'family': switch['family']})
+    if not rows:
+        return rows
+    session = context.session
+    with session.begin(subtransactions=True):
+        session.execute(models.BNPPhysicalSwitch.__table__.insert(), rows)
+        bump_bnp_generation(context, const.BNP_SWITCHES_GENERATION)
+    return rows
+
+
+def get_bnp_phys_switches_by_ip_or_mac(context, ip_addresses, mac_addresses):
+    """Get ip and mac address of the switches that use any of them."""
+    phys_switch = models.BNPPhysicalSwitch
+    clauses = []
+    if ip_addresses:
+        clauses.append(phys_switch.ip_address.in_(set(ip_addresses)))
+    if mac_addresses:
+        clauses.append(phys_switch.mac_address.in_(set(mac_addresses)))
+    if not clauses:
+        return []
+    query = context.session.query(phys_switch.ip_address,
+                                  phys_switch.mac_address)
+    return query.filter(sa.or_(*clauses)).all()
+
+
 def add_bnp_neutron_port(context, port):
     """Add neutron port."""
     session = context.session
@@ -63,6 +155,7 @@ def add_bnp_neutron_port(context, port):
             segmentation_id=port['segmentation_id'],
             bind_status=port['bind_status'])
         session.add(neutron_port)
+        bump_bnp_generation(context, const.BNP_SWITCH_PORTS_GENERATION)
 
 
 def add_bnp_switch_port_map(context, mapping):
@@ -75,6 +168,54 @@ def add_bnp_switch_port_map(context, mapping):
             ifindex=mapping['ifindex'],
             switch_id=mapping['switch_id'])
         session.add(port_map)
+        bump_bnp_generation(context, const.BNP_SWITCH_PORTS_GENERATION)
+
+
+def record_binding(context, bindings):
+    """Record the DB state of one or several port bindings.
+
+    Each binding is a dict with the keys of a switch port mapping and of
+    a neutron port. The mappings, the neutron ports, the vlan port counts
+    and the validation result of the switches are written in a single
+    transaction. The generation of the switch port mappings is left to
+    the caller to bump once that transaction is committed, so that binds
+    on different switches do not queue on its row.
+    """
+    if isinstance(bindings, dict):
+        bindings = [bindings]
+    if not bindings:
+        return
+    port_maps = []
+    neutron_ports = []
+    vlan_ports = {}
+    for binding in bindings:
+        port_maps.append({'neutron_port_id': binding['neutron_port_id'],
+                          'switch_port_name': binding['switch_port_name'],
+                          'ifindex': binding['ifindex'],
+                          'switch_id': binding['switch_id']})
+        neutron_ports.append({'neutron_port_id': binding['neutron_port_id'],
+                              'lag_id': binding['lag_id'],
+                              'access_type': binding['access_type'],
+                              'segmentation_id': binding['segmentation_id'],
+                              'bind_status': binding['bind_status']})
+        key = (binding['switch_id'], binding['segmentation_id'])
+        vlan_ports[key] = vlan_ports.get(key, 0) + 1
+    switch_ids = set(switch_id for switch_id, seg_id in vlan_ports)
+    session = context.session
+    with session.begin(subtransactions=True):
+        session.bulk_insert_mappings(models.BNPSwitchPortMapping, port_maps)
+        session.bulk_insert_mappings(models.BNPNeutronPort, neutron_ports)
+        for (switch_id, seg_id), count in vlan_ports.items():
+            update_bnp_vlan_port_count(context, switch_id, seg_id, count)
+        validation_result = models.BNPPhysicalSwitch.validation_result
+        validated = session.query(models.BNPPhysicalSwitch).filter(
+            models.BNPPhysicalSwitch.id.in_(switch_ids),
+            sa.or_(validation_result.is_(None),
+                   validation_result != const.SUCCESS)).update(
+            {'validation_result': const.SUCCESS},
+            synchronize_session=False)
+        if validated:
+            bump_bnp_generation(context, const.BNP_SWITCHES_GENERATION)
 
 
 def get_bnp_phys_switch(context, switch_id):
@@ -144,6 +285,100 @@ def get_bnp_neutron_port_by_seg_id(context, segmentation_id):
     return port_map
 
 
+def get_bnp_vlan_port_count(context, switch_id, segmentation_id):
+    """Get the number of ports bound to a vlan on a switch."""
+    query = context.session.query(models.BNPVlanPortCount.port_count)
+    port_count = query.filter_by(switch_id=switch_id,
+                                 segmentation_id=segmentation_id).scalar()
+    return port_count or 0
+
+
+def get_bnp_vlan_usage(context):
+    """Get the bound ports and active vlans of the switches by switch id."""
+    port_count = models.BNPVlanPortCount
+    query = context.session.query(port_count.switch_id,
+                                  sa.func.sum(port_count.port_count),
+                                  sa.func.count(port_count.segmentation_id))
+    query = query.filter(port_count.port_count > 0).group_by(
+        port_count.switch_id)
+    return dict((switch_id, (int(ports), vlans))
+                for switch_id, ports, vlans in query)
+
+
+def update_bnp_vlan_port_count(context, switch_id, segmentation_id, delta):
+    """Add delta to the number of ports bound to a vlan on a switch.
+
+    The row of the vlan is inserted by its first bind. When a concurrent
+    first bind inserted it meanwhile, the insert fails on the primary key
+    and delta is added to the inserted row instead.
+    """
+    session = context.session
+    values = {'port_count': models.BNPVlanPortCount.port_count + delta}
+    with session.begin(subtransactions=True):
+        query = session.query(models.BNPVlanPortCount).filter_by(
+            switch_id=switch_id, segmentation_id=segmentation_id)
+        updated = query.update(values, synchronize_session=False)
+        if not updated and delta > 0:
+            try:
+                with session.begin_nested():
+                    session.add(models.BNPVlanPortCount(
+                        switch_id=switch_id,
+                        segmentation_id=segmentation_id,
+                        port_count=delta))
+            except db_exc.DBDuplicateEntry:
+                query.update(values, synchronize_session=False)
+        query.filter(models.BNPVlanPortCount.port_count <= 0).delete(
+            synchronize_session=False)
+
+
+def get_bnp_switch_vlan(context, switch_id, vlan):
+    """Get the stored egress bitmap and version of a vlan on a switch."""
+    query = context.session.query(models.BNPSwitchVlan.egress_bitmap,
+                                  models.BNPSwitchVlan.version)
+    return query.filter_by(switch_id=switch_id, vlan=vlan).first()
+
+
+def get_bnp_switch_vlan_versions(context, switch_id):
+    """Get the version of the stored egress bitmaps of a switch by vlan."""
+    query = context.session.query(models.BNPSwitchVlan.vlan,
+                                  models.BNPSwitchVlan.version)
+    return dict(query.filter_by(switch_id=switch_id))
+
+
+def update_bnp_switch_vlan(context, switch_id, vlan, egress_bitmap,
+                           version=None):
+    """Store the egress bitmap of a vlan on a switch.
+
+    With a version, the bitmap is stored only if the row is still at
+    that version, a vlan without stored bitmap being at version 0.
+    Without, it is stored unconditionally. Returns whether the bitmap
+    was stored.
+    """
+    session = context.session
+    values = {'egress_bitmap': egress_bitmap,
+              'version': models.BNPSwitchVlan.version + 1}
+    with session.begin(subtransactions=True):
+        query = session.query(models.BNPSwitchVlan).filter_by(
+            switch_id=switch_id, vlan=vlan)
+        if version is None:
+            updated = query.update(values, synchronize_session=False)
+        else:
+            updated = query.filter_by(version=version).update(
+                values, synchronize_session=False)
+        if not updated and not version:
+            try:
+                with session.begin_nested():
+                    session.add(models.BNPSwitchVlan(
+                        switch_id=switch_id, vlan=vlan,
+                        egress_bitmap=egress_bitmap, version=1))
+                updated = 1
+            except db_exc.DBDuplicateEntry:
+                # a concurrent writer stored the first bitmap
+                if version is None:
+                    updated = query.update(values, synchronize_session=False)
+    return bool(updated)
+
+
 def get_bnp_switch_port_map_by_switchid(context, switch_id):
     """Get switch port map by switch_id."""
     try:
@@ -168,31 +403,90 @@ def get_bnp_switch_port_mappings(context, neutron_port_id):
     return port_map
 
 
-def get_all_bnp_switch_port_maps(context, filter_dict):
-    """Get all switch port maps."""
+def _bnp_switch_port_maps_query(context, filters=None):
+    switchportmap = models.BNPSwitchPortMapping
+    neutronport = models.BNPNeutronPort
+    physwitch = models.BNPPhysicalSwitch
+    query = context.session.query(switchportmap.neutron_port_id,
+                                  switchportmap.switch_port_name,
+                                  neutronport.lag_id,
+                                  neutronport.segmentation_id,
+                                  neutronport.access_type,
+                                  neutronport.bind_status, physwitch.name)
+    query = query.join(neutronport,
+                       neutronport.neutron_port_id ==
+                       switchportmap.neutron_port_id)
+    query = query.join(physwitch, switchportmap.switch_id == physwitch.id)
+    if filters:
+        query = query.filter(sa.and_(*filters))
+    return query
+
+
+def get_all_bnp_switch_port_maps(context, filters=None):
+    """Get all switch port maps matching every clause of filters."""
     try:
-        switchportmap = models.BNPSwitchPortMapping
-        neutronport = models.BNPNeutronPort
-        physwitch = models.BNPPhysicalSwitch
-        query = context.session.query(switchportmap.neutron_port_id,
-                                      switchportmap.switch_port_name,
-                                      neutronport.lag_id,
-                                      neutronport.segmentation_id,
-                                      neutronport.access_type,
-                                      neutronport.bind_status, physwitch.name)
-        query = query.join(neutronport,
-                           neutronport.neutron_port_id ==
-                           switchportmap.neutron_port_id)
-        query = query.join(physwitch, switchportmap.switch_id == physwitch.id)
-        for key, value in filter_dict.iteritems():
-            query = query.filter(key == value)
-        port_maps = query.all()
+        port_maps = _bnp_switch_port_maps_query(context, filters).all()
     except exc.NoResultFound:
         LOG.error(_LE("no switch port mappings found"))
         return
     return port_maps
 
 
+def iter_bnp_switch_port_maps(context, filters=None,
+                              chunk_size=const.STREAM_CHUNK_SIZE):
+    """Iterate over the switch port maps matching every clause of filters.
+
+    The rows are read from a server side cursor chunk_size at a time, so
+    only one chunk of them is held in memory.
+    """
+    query = _bnp_switch_port_maps_query(context, filters)
+    return iter(query.execution_options(stream_results=True).yield_per(
+        chunk_size))
+
+
+def get_bnp_switch_vlan_members(context, switch_id):
+    """Get the (segmentation_id, ifindex) of the ports bound on a switch."""
+    switchportmap = models.BNPSwitchPortMapping
+    neutronport = models.BNPNeutronPort
+    query = context.session.query(neutronport.segmentation_id,
+                                  switchportmap.ifindex)
+    query = query.join(neutronport,
+                       neutronport.neutron_port_id ==
+                       switchportmap.neutron_port_id)
+    return query.filter(switchportmap.switch_id == switch_id,
+                        neutronport.segmentation_id.isnot(None)).all()
+
+
+def get_orphan_bnp_port_maps(context, limit, segmentation_ids=None):
+    """Get at most limit port maps whose neutron port no longer exists.
+
+    With segmentation_ids, only the port maps bound to these vlans are
+    returned. A limit of None returns them all.
+    """
+    switchportmap = models.BNPSwitchPortMapping
+    neutronport = models.BNPNeutronPort
+    port = models_v2.Port
+    query = context.session.query(switchportmap.neutron_port_id,
+                                  switchportmap.switch_id,
+                                  switchportmap.ifindex,
+                                  neutronport.segmentation_id)
+    query = query.outerjoin(neutronport,
+                            neutronport.neutron_port_id ==
+                            switchportmap.neutron_port_id)
+    query = query.outerjoin(port, port.id == switchportmap.neutron_port_id)
+    query = query.filter(port.id.is_(None))
+    if segmentation_ids is not None:
+        query = query.filter(
+            neutronport.segmentation_id.in_(segmentation_ids))
+    return query.limit(limit).all()
+
+
+def get_bnp_phys_switches_by_ids(context, switch_ids):
+    """Get physical switches that match the ids."""
+    query = context.session.query(models.BNPPhysicalSwitch)
+    return query.filter(models.BNPPhysicalSwitch.id.in_(switch_ids)).all()
+
+
 def get_bnp_phys_switch_by_mac(context, mac):
     """Get physical switch that matches mac address."""
     try:
@@ -211,6 +505,7 @@ def delete_bnp_switch_port_mappings(context, neutron_port_id):
         if neutron_port_id:
             session.query(models.BNPSwitchPortMapping).filter_by(
                 neutron_port_id=neutron_port_id).delete()
+            bump_bnp_generation(context, const.BNP_SWITCH_PORTS_GENERATION)
 
 
 def delete_bnp_phys_switch(context, switch_id):
@@ -221,6 +516,7 @@ def delete_bnp_phys_switch(context, switch_id):
             if switch_id:
                 session.query(models.BNPPhysicalSwitch).filter_by(
                     id=switch_id).delete()
+                bump_bnp_generation(context, const.BNP_SWITCHES_GENERATION)
     except exc.NoResultFound:
         LOG.error(_LE("no switch found for switch id: %s"), switch_id)
 
@@ -232,17 +528,83 @@ def delete_bnp_neutron_port(context, nport_id):
         if nport_id:
             session.query(models.BNPNeutronPort).filter_by(
                 neutron_port_id=nport_id).delete()
+            bump_bnp_generation(context, const.BNP_SWITCH_PORTS_GENERATION)
 
 
-def get_all_bnp_phys_switches(context, **args):
-    """Get all physical switches."""
-    try:
-        query = context.session.query(
-            models.BNPPhysicalSwitch).filter_by(**args)
-        switches = query.all()
-    except exc.NoResultFound:
-        LOG.error(_LE("no physical switch found"))
-        return
+def delete_bnp_port_maps(context, neutron_port_ids):
+    """Delete mappings that match neutron_port_ids.
+
+    Their neutron ports are removed by the cascading foreign key. Returns
+    the number of mappings deleted, mappings already deleted by a
+    concurrent transaction are not counted. As for record_binding, the
+    caller bumps the generation of the switch port mappings once its
+    transaction is committed.
+    """
+    if not neutron_port_ids:
+        return 0
+    session = context.session
+    with session.begin(subtransactions=True):
+        deleted = session.query(models.BNPSwitchPortMapping).filter(
+            models.BNPSwitchPortMapping.neutron_port_id.in_(
+                neutron_port_ids)).delete(synchronize_session=False)
+    return deleted
+
+
+def _filter_bnp_phys_switches(query, args):
+    """Filter a query of switches on columns, a list matches any value."""
+    model = models.BNPPhysicalSwitch
+    for key, value in args.items():
+        if isinstance(value, list):
+            query = query.filter(getattr(model, key).in_(value))
+        else:
+            query = query.filter(getattr(model, key) == value)
+    return query
+
+
+def get_all_bnp_phys_switches(context, fields=None, sorts=None, limit=None,
+                              marker=None, page_reverse=False, **args):
+    """Get all physical switches.
+
+    When fields is given only these columns are read and each switch is
+    returned as a dict. sorts is a list of (column, ascending) pairs, and
+    limit and marker select the page of switches following the switch
+    whose id is marker. A list value of args matches any of its values.
+    Unknown columns and markers raise BadRequest.
+    """
+    model = models.BNPPhysicalSwitch
+    columns = model.__table__.columns.keys()
+    for key in set(fields or []) | set(args):
+        if key not in columns:
+            raise n_exc.BadRequest(
+                resource='bnp_switch',
+                msg=_("%s is not a switch attribute") % key)
+    if fields:
+        query = context.session.query(*[getattr(model, field)
+                                        for field in fields])
+    else:
+        query = context.session.query(model)
+    query = _filter_bnp_phys_switches(query, args)
+    if sorts or limit:
+        sorts = list(sorts or [])
+        if 'id' not in [key for key, ascending in sorts]:
+            # the primary key makes the order, and so the pages, stable
+            sorts.append(('id', True))
+        if page_reverse:
+            sorts = [(key, not ascending) for key, ascending in sorts]
+        marker_obj = None
+        if marker:
+            marker_obj = get_bnp_phys_switch(context, marker)
+            if not marker_obj:
+                raise n_exc.BadRequest(
+                    resource='bnp_switch',
+                    msg=_("marker %s does not match a switch") % marker)
+        query = sqlalchemyutils.paginate_query(query, model, limit, sorts,
+                                               marker_obj=marker_obj)
+    switches = query.all()
+    if page_reverse:
+        switches.reverse()
+    if fields:
+        switches = [dict(zip(fields, switch)) for switch in switches]
     return switches
 
 
@@ -262,10 +624,38 @@ def update_bnp_phy_switch(context, sw_id, switch):
                      'vendor': switch['vendor'],
                      'family': switch['family']},
                     synchronize_session=False))
+            bump_bnp_generation(context, const.BNP_SWITCHES_GENERATION)
     except exc.NoResultFound:
         LOG.error(_LE("no physical switch found for id: %s"), sw_id)
 
 
+def get_bnp_phys_switch_access(context, **args):
+    """Get the distinct (management_protocol, credentials) of switches.
+
+    The switches are those matching args, as in get_all_bnp_phys_switches.
+    """
+    model = models.BNPPhysicalSwitch
+    query = context.session.query(model.management_protocol,
+                                  model.credentials).distinct()
+    return _filter_bnp_phys_switches(query, args).all()
+
+
+def update_bnp_phys_switches(context, values, **args):
+    """Apply the same column values to the physical switches matching args.
+
+    The switches are matched as in get_all_bnp_phys_switches and updated
+    with a single UPDATE statement. Returns the number of switches
+    updated.
+    """
+    with context.session.begin(subtransactions=True):
+        query = context.session.query(models.BNPPhysicalSwitch)
+        updated = _filter_bnp_phys_switches(query, args).update(
+            values, synchronize_session=False)
+        if updated:
+            bump_bnp_generation(context, const.BNP_SWITCHES_GENERATION)
+    return updated
+
+
 def update_bnp_phys_switch_result_status(context, sw_id, sw_status):
     """Update physical switch validation result status."""
     try:
@@ -274,10 +664,171 @@ def update_bnp_phys_switch_result_status(context, sw_id, sw_status):
                 id=sw_id).update(
                     {'validation_result': sw_status},
                     synchronize_session=False))
+            bump_bnp_generation(context, const.BNP_SWITCHES_GENERATION)
     except exc.NoResultFound:
         LOG.error(_LE("no physical switch found for id: %s"), sw_id)
 
 
+def add_bnp_validation_job(context, switch_id):
+    """Add a pending validation job of a physical switch."""
+    session = context.session
+    with session.begin(subtransactions=True):
+        job = models.BNPValidationJob(
+            id=uuidutils.generate_uuid(),
+            switch_id=switch_id,
+            status=const.JOB_PENDING,
+            created_at=timeutils.utcnow())
+        session.add(job)
+    return job
+
+
+def get_bnp_validation_job(context, job_id):
+    """Get the validation job that matches id."""
+    query = context.session.query(models.BNPValidationJob)
+    return query.filter_by(id=job_id).first()
+
+
+def get_last_bnp_validation_job(context, switch_id):
+    """Get the latest validation job of a physical switch."""
+    job = models.BNPValidationJob
+    query = context.session.query(job).filter_by(switch_id=switch_id)
+    return query.order_by(job.created_at.desc()).first()
+
+
+def claim_bnp_validation_job(context, job_id, timeout):
+    """Mark a validation job running and return it.
+
+    A pending job is claimed, as is a running job started more than
+    timeout seconds ago by a worker that stopped. Returns None when the
+    job is done, deleted or running in another worker.
+    """
+    job_model = models.BNPValidationJob
+    now = timeutils.utcnow()
+    claimable = job_model.status == const.JOB_PENDING
+    if timeout > 0:
+        expired = now - datetime.timedelta(seconds=timeout)
+        claimable = sa.or_(claimable,
+                           sa.and_(job_model.status == const.JOB_RUNNING,
+                                   job_model.started_at < expired))
+    session = context.session
+    with session.begin(subtransactions=True):
+        claimed = session.query(job_model).filter(
+            job_model.id == job_id, claimable).update(
+                {'status': const.JOB_RUNNING, 'started_at': now},
+                synchronize_session=False)
+    if claimed:
+        return get_bnp_validation_job(context, job_id)
+
+
+def get_stale_bnp_validation_job_ids(context, timeout):
+    """Get the ids of the validation jobs abandoned by their worker.
+
+    These are the jobs pending for more than timeout seconds and the
+    jobs running for more than timeout seconds.
+    """
+    job = models.BNPValidationJob
+    expired = timeutils.utcnow() - datetime.timedelta(seconds=timeout)
+    query = context.session.query(job.id).filter(sa.or_(
+        sa.and_(job.status == const.JOB_PENDING, job.created_at < expired),
+        sa.and_(job.status == const.JOB_RUNNING, job.started_at < expired)))
+    return [job_id for job_id, in query]
+
+
+def finish_bnp_validation_job(context, job_id, validation_result):
+    """Record the result of a validation job on the job and its switch.
+
+    The switch is left alone when a newer job was started for it, the
+    result of that job is the one that matters.
+    """
+    job_model = models.BNPValidationJob
+    session = context.session
+    with session.begin(subtransactions=True):
+        job = session.query(job_model).filter_by(id=job_id).first()
+        if not job:
+            # the switch and its jobs were deleted meanwhile
+            return
+        job.status = const.JOB_DONE
+        job.validation_result = validation_result
+        job.finished_at = timeutils.utcnow()
+        newer = session.query(job_model.id).filter(
+            job_model.switch_id == job.switch_id,
+            job_model.created_at > job.created_at).first()
+        if not newer:
+            update_bnp_phys_switch_result_status(context, job.switch_id,
+                                                 validation_result)
+
+
+def delete_finished_bnp_validation_jobs(context, retention, limit):
+    """Delete the validation jobs finished more than retention seconds ago.
+
+    The latest job of each switch is kept, it is the one shown for the
+    switch. At most limit jobs are deleted, returns how many were.
+    """
+    job = models.BNPValidationJob
+    newer = orm.aliased(job)
+    expired = timeutils.utcnow() - datetime.timedelta(seconds=retention)
+    session = context.session
+    with session.begin(subtransactions=True):
+        query = session.query(job.id).filter(
+            job.status == const.JOB_DONE, job.finished_at < expired,
+            sa.exists().where(sa.and_(newer.switch_id == job.switch_id,
+                                      newer.created_at > job.created_at)))
+        job_ids = [job_id for job_id, in query.limit(limit)]
+        if not job_ids:
+            return 0
+        return session.query(job).filter(job.id.in_(job_ids)).delete(
+            synchronize_session=False)
+
+
+def get_bnp_switch_physical_ports(context, switch_id):
+    """Get the physical ports found by the last walk of a switch."""
+    port = models.BNPSwitchPhysicalPort
+    query = context.session.query(port).filter_by(switch_id=switch_id)
+    return query.order_by(port.ifindex).all()
+
+
+def set_bnp_switch_physical_ports(context, switch_id, ports):
+    """Replace the physical ports of a switch by those just walked."""
+    walked_at = timeutils.utcnow()
+    session = context.session
+    with session.begin(subtransactions=True):
+        session.query(models.BNPSwitchPhysicalPort).filter_by(
+            switch_id=switch_id).delete(synchronize_session=False)
+        session.bulk_insert_mappings(
+            models.BNPSwitchPhysicalPort,
+            [{'switch_id': switch_id,
+              'ifindex': port['ifindex'],
+              'interface_name': port['interface_name'],
+              'port_status': port.get('port_status'),
+              'walked_at': walked_at} for port in ports])
+        bump_bnp_generation(context,
+                            const.BNP_SWITCH_PHYSICAL_PORTS_GENERATION)
+
+
+def get_bnp_switch_health(context, switch_id):
+    """Get the last polled health of a physical switch."""
+    query = context.session.query(models.BNPSwitchHealth)
+    return query.filter_by(switch_id=switch_id).first()
+
+
+def get_all_bnp_switch_health(context):
+    """Get the last polled health of the switches by switch id."""
+    query = context.session.query(models.BNPSwitchHealth)
+    return dict((health.switch_id, health) for health in query.all())
+
+
+def update_bnp_switch_health(context, switch_id, values):
+    """Add or update the health of a physical switch."""
+    session = context.session
+    with session.begin(subtransactions=True):
+        health = session.query(models.BNPSwitchHealth).filter_by(
+            switch_id=switch_id).first()
+        if not health:
+            health = models.BNPSwitchHealth(switch_id=switch_id)
+            session.add(health)
+        health.update(values)
+
+
 def update_bnp_phys_switch_access_params(context, switch_id, params):
     """Update physical switch with access params."""
     try:
@@ -293,6 +844,7 @@ def update_bnp_phys_switch_access_params(context, switch_id, params):
                      'priv_key': params['priv_key'],
                      'security_level': params['security_level']},
                     synchronize_session=False))
+            bump_bnp_generation(context, const.BNP_SWITCHES_GENERATION)
     except exc.NoResultFound:
         LOG.error(_LE("no physical switch found for id: %s"), switch_id)
 
@@ -313,6 +865,7 @@ def update_bnp_snmp_cred_by_id(context, cred_id, creds):
                  'priv_key': creds['priv_key'],
                  'security_level': creds['security_level']},
              synchronize_session=False))
+            bump_bnp_generation(context, const.BNP_CREDENTIALS_GENERATION)
     except exc.NoResultFound:
         LOG.error(_LE("no snmp switch credentials found for id: %s"), cred_id)
 
@@ -359,6 +912,7 @@ def update_bnp_netconf_cred_by_id(context, cred_id, creds):
               'password': creds['password'],
               'key_path': creds['key_path']},
              synchronize_session=False))
+            bump_bnp_generation(context, const.BNP_CREDENTIALS_GENERATION)
     except exc.NoResultFound:
         LOG.error(
             _LE("no netconf switch credentials found for id: %s"), cred_id)
@@ -381,6 +935,7 @@ def add_bnp_snmp_cred(context, snmp_cred):
             priv_key=snmp_cred['priv_key'],
             security_level=snmp_cred['security_level'])
         session.add(snmp_cred)
+        bump_bnp_generation(context, const.BNP_CREDENTIALS_GENERATION)
     return snmp_cred
 
 
@@ -397,6 +952,7 @@ def add_bnp_netconf_cred(context, netconf_cred):
             password=netconf_cred['password'],
             key_path=netconf_cred['key_path'])
         session.add(netconf_cred)
+        bump_bnp_generation(context, const.BNP_CREDENTIALS_GENERATION)
     return netconf_cred
 
 
@@ -424,6 +980,54 @@ def get_all_netconf_creds(context, **args):
     return netconf_creds
 
 
+def _bnp_creds_union(**args):
+    """Select the shared columns of the SNMP and NETCONF credentials."""
+    selects = []
+    for model in (models.BNPSNMPCredential, models.BNPNETCONFCredential):
+        select = sa.select([getattr(model, column)
+                            for column in const.CREDENTIAL_COLUMNS])
+        for key, value in args.items():
+            select = select.where(getattr(model, key) == value)
+        selects.append(select)
+    return sa.union_all(*selects).alias('bnp_credentials')
+
+
+def get_all_bnp_creds(context, limit=None, marker=None, page_reverse=False,
+                      **args):
+    """Get the id, name and protocol_type of all credentials.
+
+    The SNMP and NETCONF credentials are read with a single UNION ALL
+    query whose filters are applied in each branch. limit and marker
+    select the page of credentials following the credential whose id
+    is marker, in id order.
+    """
+    creds = _bnp_creds_union(**args)
+    query = sa.select([creds])
+    if page_reverse:
+        if marker:
+            query = query.where(creds.c.id < marker)
+        query = query.order_by(creds.c.id.desc())
+    else:
+        if marker:
+            query = query.where(creds.c.id > marker)
+        query = query.order_by(creds.c.id)
+    if limit:
+        query = query.limit(limit)
+    creds = [dict(row) for row in context.session.execute(query)]
+    if page_reverse:
+        creds.reverse()
+    return creds
+
+
+def get_bnp_cred_by_id(context, id):
+    """Get the id, name and protocol_type of the credential with id."""
+    creds = get_all_bnp_creds(context, limit=1, id=id)
+    if not creds:
+        LOG.info(_LI("no credential found with id: %s"), id)
+        return
+    return creds[0]
+
+
 def get_snmp_cred_by_name(context, name):
     """Get SNMP Credential that matches name."""
     try:
@@ -474,6 +1078,7 @@ def delete_snmp_cred_by_id(context, id):
     with session.begin(subtransactions=True):
         session.query(models.BNPSNMPCredential).filter_by(
             id=id).delete()
+        bump_bnp_generation(context, const.BNP_CREDENTIALS_GENERATION)
 
 
 def delete_netconf_cred_by_id(context, id):
@@ -482,6 +1087,7 @@ def delete_netconf_cred_by_id(context, id):
     with session.begin(subtransactions=True):
         session.query(models.BNPNETCONFCredential).filter_by(
             id=id).delete()
+        bump_bnp_generation(context, const.BNP_CREDENTIALS_GENERATION)
 
 
 def get_bnp_phys_switch_by_name(context, name):
@@ -503,5 +1109,6 @@ def delete_bnp_phys_switch_by_name(context, name):
             if name:
                 session.query(models.BNPPhysicalSwitch).filter_by(
                     name=name).delete()
+                bump_bnp_generation(context, const.BNP_SWITCHES_GENERATION)
     except exc.NoResultFound:
         LOG.error(_LE("no switch found for switch name: %s"), name)
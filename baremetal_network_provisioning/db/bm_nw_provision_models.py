@@ -33,7 +33,10 @@ class BNPPhysicalSwitch(model_base.BASEV2, models_v2.HasId):
     credentials = sa.Column(sa.String(36), nullable=False)
     validation_result = sa.Column(sa.String(255), nullable=True)
     __table_args__ = (sa.PrimaryKeyConstraint('id'),
-                      sa.UniqueConstraint('ip_address', 'mac_address'))
+                      sa.UniqueConstraint('ip_address', 'mac_address'),
+                      sa.Index('ix_bnp_physical_switches_mac_address',
+                               'mac_address'),
+                      sa.Index('ix_bnp_physical_switches_name', 'name'))
 
 
 class BNPSwitchPortMapping(model_base.BASEV2):
@@ -41,12 +44,14 @@ class BNPSwitchPortMapping(model_base.BASEV2):
     __tablename__ = "bnp_switch_port_mappings"
     neutron_port_id = sa.Column(sa.String(36), nullable=False)
     switch_port_name = sa.Column(sa.String(255), nullable=False)
-    switch_id = sa.Column(sa.String(255), nullable=False)
+    switch_id = sa.Column(sa.String(36), nullable=False)
     ifindex = sa.Column(sa.String(36), nullable=False)
-    __table_args__ = (sa.PrimaryKeyConstraint('neutron_port_id'),)
-    sa.ForeignKeyConstraint(['switch_id'],
-                            ['bnp_physical_switches.id'],
-                            ondelete='CASCADE')
+    __table_args__ = (sa.PrimaryKeyConstraint('neutron_port_id'),
+                      sa.ForeignKeyConstraint(['switch_id'],
+                                              ['bnp_physical_switches.id'],
+                                              ondelete='CASCADE'),
+                      sa.Index('ix_bnp_switch_port_mappings_switch_id',
+                               'switch_id'))
 
 
 class BNPNeutronPort(model_base.BASEV2):
@@ -57,10 +62,88 @@ class BNPNeutronPort(model_base.BASEV2):
     access_type = sa.Column(sa.String(16), nullable=False)
     segmentation_id = sa.Column(sa.Integer, nullable=False)
     bind_status = sa.Column(sa.Boolean(), nullable=True)
-    __table_args__ = (sa.PrimaryKeyConstraint('neutron_port_id'),)
-    sa.ForeignKeyConstraint(['neutron_port_id'],
-                            ['bnp_switch_port_mappings.neutron_port_id'],
-                            ondelete='CASCADE')
+    __table_args__ = (sa.PrimaryKeyConstraint('neutron_port_id'),
+                      sa.ForeignKeyConstraint(
+                          ['neutron_port_id'],
+                          ['bnp_switch_port_mappings.neutron_port_id'],
+                          ondelete='CASCADE'),
+                      sa.Index('ix_bnp_neutron_ports_segmentation_id',
+                               'segmentation_id'))
+
+
+class BNPVlanPortCount(model_base.BASEV2):
+    """Define the number of ports bound to a vlan on a switch."""
+    __tablename__ = "bnp_vlan_port_counts"
+    switch_id = sa.Column(sa.String(36), nullable=False)
+    segmentation_id = sa.Column(sa.Integer, nullable=False)
+    port_count = sa.Column(sa.Integer, nullable=False, default=0)
+    __table_args__ = (sa.PrimaryKeyConstraint('switch_id', 'segmentation_id'),
+                      sa.ForeignKeyConstraint(['switch_id'],
+                                              ['bnp_physical_switches.id'],
+                                              ondelete='CASCADE'))
+
+
+class BNPSwitchVlan(model_base.BASEV2):
+    """Define the egress ports last written to a vlan on a switch."""
+    __tablename__ = "bnp_switch_vlans"
+    switch_id = sa.Column(sa.String(36), nullable=False)
+    vlan = sa.Column(sa.Integer, nullable=False)
+    egress_bitmap = sa.Column(sa.LargeBinary, nullable=False)
+    version = sa.Column(sa.Integer, nullable=False, default=1)
+    __table_args__ = (sa.PrimaryKeyConstraint('switch_id', 'vlan'),
+                      sa.ForeignKeyConstraint(['switch_id'],
+                                              ['bnp_physical_switches.id'],
+                                              ondelete='CASCADE'))
+
+
+class BNPValidationJob(model_base.BASEV2, models_v2.HasId):
+    """Define a background validation of a switch on its device."""
+    __tablename__ = "bnp_validation_jobs"
+    switch_id = sa.Column(sa.String(36), nullable=False)
+    status = sa.Column(sa.String(16), nullable=False)
+    validation_result = sa.Column(sa.String(255), nullable=True)
+    created_at = sa.Column(sa.DateTime, nullable=False)
+    started_at = sa.Column(sa.DateTime, nullable=True)
+    finished_at = sa.Column(sa.DateTime, nullable=True)
+    __table_args__ = (sa.PrimaryKeyConstraint('id'),
+                      sa.ForeignKeyConstraint(['switch_id'],
+                                              ['bnp_physical_switches.id'],
+                                              ondelete='CASCADE'),
+                      sa.Index('ix_bnp_validation_jobs_switch_id_created_at',
+                               'switch_id', 'created_at'))
+
+
+class BNPSwitchHealth(model_base.BASEV2):
+    """Define the reachability of a switch seen by the health poller."""
+    __tablename__ = "bnp_switch_health"
+    switch_id = sa.Column(sa.String(36), nullable=False)
+    reachable = sa.Column(sa.Boolean(), nullable=False, default=False)
+    rtt = sa.Column(sa.Float, nullable=True)
+    last_poll_at = sa.Column(sa.DateTime, nullable=True)
+    last_success_at = sa.Column(sa.DateTime, nullable=True)
+    circuit_state = sa.Column(sa.String(16), nullable=False,
+                              default='closed')
+    consecutive_failures = sa.Column(sa.Integer, nullable=False, default=0)
+    error_count = sa.Column(sa.Integer, nullable=False, default=0)
+    last_error = sa.Column(sa.String(255), nullable=True)
+    __table_args__ = (sa.PrimaryKeyConstraint('switch_id'),
+                      sa.ForeignKeyConstraint(['switch_id'],
+                                              ['bnp_physical_switches.id'],
+                                              ondelete='CASCADE'))
+
+
+class BNPSwitchPhysicalPort(model_base.BASEV2):
+    """Define a physical port found by the last walk of a switch."""
+    __tablename__ = "bnp_switch_physical_ports"
+    switch_id = sa.Column(sa.String(36), nullable=False)
+    ifindex = sa.Column(sa.String(36), nullable=False)
+    interface_name = sa.Column(sa.String(255), nullable=False)
+    port_status = sa.Column(sa.String(16), nullable=True)
+    walked_at = sa.Column(sa.DateTime, nullable=False)
+    __table_args__ = (sa.PrimaryKeyConstraint('switch_id', 'ifindex'),
+                      sa.ForeignKeyConstraint(['switch_id'],
+                                              ['bnp_physical_switches.id'],
+                                              ondelete='CASCADE'))
 
 
 class BNPSNMPCredential(model_base.BASEV2, models_v2.HasId):
@@ -75,7 +158,9 @@ class BNPSNMPCredential(model_base.BASEV2, models_v2.HasId):
     priv_protocol = sa.Column(sa.String(16), nullable=True)
     priv_key = sa.Column(sa.String(255), nullable=True)
     security_level = sa.Column(sa.String(16), nullable=True)
-    __table_args__ = (sa.PrimaryKeyConstraint('id'),)
+    __table_args__ = (sa.PrimaryKeyConstraint('id'),
+                      sa.Index('ix_bnp_snmp_credentials_name_protocol_type',
+                               'name', 'protocol_type'))
 
 
 class BNPNETCONFCredential(model_base.BASEV2, models_v2.HasId):
@@ -86,4 +171,14 @@ class BNPNETCONFCredential(model_base.BASEV2, models_v2.HasId):
     user_name = sa.Column(sa.String(255), nullable=True)
     password = sa.Column(sa.String(255), nullable=True)
     key_path = sa.Column(sa.String(255), nullable=True)
-    __table_args__ = (sa.PrimaryKeyConstraint('id'),)
+    __table_args__ = (sa.PrimaryKeyConstraint('id'),
+                      sa.Index('ix_bnp_netconf_credentials_name_protocol_type',
+                               'name', 'protocol_type'))
+
+
+class BNPGeneration(model_base.BASEV2):
+    """Define generation counters used to invalidate worker caches."""
+    __tablename__ = "bnp_generations"
+    resource = sa.Column(sa.String(64), nullable=False)
+    generation = sa.Column(sa.BigInteger, nullable=False, default=0)
+    __table_args__ = (sa.PrimaryKeyConstraint('resource'),)
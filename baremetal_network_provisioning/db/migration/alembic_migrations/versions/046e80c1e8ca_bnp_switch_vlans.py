@@ -0,0 +1,41 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp switch vlans
+Revision ID: 046e80c1e8ca
+Revises: 29f90c378533
+Create Date: 2016-07-01 10:41:57.226918
+"""
+
+# revision identifiers, used by Alembic.
+revision = '046e80c1e8ca'
+down_revision = '29f90c378533'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('bnp_switch_vlans',
+                    sa.Column('switch_id', sa.String(36), nullable=False),
+                    sa.Column('vlan', sa.Integer, nullable=False),
+                    sa.Column('egress_bitmap', sa.LargeBinary,
+                              nullable=False),
+                    sa.Column('version', sa.Integer, nullable=False),
+                    sa.PrimaryKeyConstraint('switch_id', 'vlan'),
+                    sa.ForeignKeyConstraint(
+                        ['switch_id'],
+                        ['bnp_physical_switches.id'],
+                        ondelete='CASCADE'))
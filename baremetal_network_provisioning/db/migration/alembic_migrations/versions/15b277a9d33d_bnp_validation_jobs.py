@@ -0,0 +1,45 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp validation jobs
+Revision ID: 15b277a9d33d
+Revises: 97d3680feb8d
+Create Date: 2016-07-05 11:26:48.513207
+"""
+
+# revision identifiers, used by Alembic.
+revision = '15b277a9d33d'
+down_revision = '97d3680feb8d'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('bnp_validation_jobs',
+                    sa.Column('id', sa.String(36), nullable=False),
+                    sa.Column('switch_id', sa.String(36), nullable=False),
+                    sa.Column('status', sa.String(16), nullable=False),
+                    sa.Column('validation_result', sa.String(255),
+                              nullable=True),
+                    sa.Column('created_at', sa.DateTime, nullable=False),
+                    sa.Column('finished_at', sa.DateTime, nullable=True),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.ForeignKeyConstraint(
+                        ['switch_id'],
+                        ['bnp_physical_switches.id'],
+                        ondelete='CASCADE'))
+    op.create_index('ix_bnp_validation_jobs_switch_id_created_at',
+                    'bnp_validation_jobs', ['switch_id', 'created_at'])
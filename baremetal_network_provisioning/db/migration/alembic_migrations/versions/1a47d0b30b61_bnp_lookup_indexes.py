@@ -0,0 +1,41 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp lookup indexes
+Revision ID: 1a47d0b30b61
+Revises: 341fb4e0baa9
+Create Date: 2016-06-24 11:37:05.640215
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1a47d0b30b61'
+down_revision = '341fb4e0baa9'
+
+from alembic import op
+
+
+def upgrade():
+    op.create_index('ix_bnp_physical_switches_mac_address',
+                    'bnp_physical_switches', ['mac_address'])
+    op.create_index('ix_bnp_physical_switches_name',
+                    'bnp_physical_switches', ['name'])
+    op.create_index('ix_bnp_switch_port_mappings_switch_id',
+                    'bnp_switch_port_mappings', ['switch_id'])
+    op.create_index('ix_bnp_neutron_ports_segmentation_id',
+                    'bnp_neutron_ports', ['segmentation_id'])
+    op.create_index('ix_bnp_snmp_credentials_name_protocol_type',
+                    'bnp_snmp_credentials', ['name', 'protocol_type'])
+    op.create_index('ix_bnp_netconf_credentials_name_protocol_type',
+                    'bnp_netconf_credentials', ['name', 'protocol_type'])
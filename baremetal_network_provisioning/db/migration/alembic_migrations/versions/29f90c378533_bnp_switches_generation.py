@@ -0,0 +1,35 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp switches generation
+Revision ID: 29f90c378533
+Revises: cef3eff07574
+Create Date: 2016-06-29 16:20:44.915032
+"""
+
+# revision identifiers, used by Alembic.
+revision = '29f90c378533'
+down_revision = 'cef3eff07574'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    generations = sa.table('bnp_generations',
+                           sa.column('resource', sa.String(64)),
+                           sa.column('generation', sa.BigInteger))
+    op.bulk_insert(generations,
+                   [{'resource': 'bnp_physical_switches', 'generation': 0}])
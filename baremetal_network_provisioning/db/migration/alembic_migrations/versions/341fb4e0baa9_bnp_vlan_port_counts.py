@@ -0,0 +1,46 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp vlan port counts
+Revision ID: 341fb4e0baa9
+Revises: c2d2138371d8
+Create Date: 2016-06-22 14:03:27.181904
+"""
+
+# revision identifiers, used by Alembic.
+revision = '341fb4e0baa9'
+down_revision = 'c2d2138371d8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('bnp_vlan_port_counts',
+                    sa.Column('switch_id', sa.String(36), nullable=False),
+                    sa.Column('segmentation_id', sa.Integer, nullable=False),
+                    sa.Column('port_count', sa.Integer, nullable=False),
+                    sa.PrimaryKeyConstraint('switch_id', 'segmentation_id'),
+                    sa.ForeignKeyConstraint(
+                        ['switch_id'],
+                        ['bnp_physical_switches.id'],
+                        ondelete='CASCADE'))
+    op.execute("INSERT INTO bnp_vlan_port_counts "
+               "(switch_id, segmentation_id, port_count) "
+               "SELECT m.switch_id, p.segmentation_id, COUNT(*) "
+               "FROM bnp_switch_port_mappings m "
+               "JOIN bnp_neutron_ports p "
+               "ON p.neutron_port_id = m.neutron_port_id "
+               "GROUP BY m.switch_id, p.segmentation_id")
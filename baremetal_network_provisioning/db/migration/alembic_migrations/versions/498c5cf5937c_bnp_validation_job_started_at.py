@@ -0,0 +1,32 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp validation job started_at
+Revision ID: 498c5cf5937c
+Revises: 8a043055a4b2
+Create Date: 2016-07-08 10:12:37.204518
+"""
+
+# revision identifiers, used by Alembic.
+revision = '498c5cf5937c'
+down_revision = '8a043055a4b2'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('bnp_validation_jobs',
+                  sa.Column('started_at', sa.DateTime, nullable=True))
@@ -0,0 +1,48 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp switch health
+Revision ID: 8ec23895ff00
+Revises: 15b277a9d33d
+Create Date: 2016-07-06 14:08:21.367540
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8ec23895ff00'
+down_revision = '15b277a9d33d'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('bnp_switch_health',
+                    sa.Column('switch_id', sa.String(36), nullable=False),
+                    sa.Column('reachable', sa.Boolean(), nullable=False),
+                    sa.Column('rtt', sa.Float, nullable=True),
+                    sa.Column('last_poll_at', sa.DateTime, nullable=True),
+                    sa.Column('last_success_at', sa.DateTime,
+                              nullable=True),
+                    sa.Column('circuit_state', sa.String(16),
+                              nullable=False),
+                    sa.Column('consecutive_failures', sa.Integer,
+                              nullable=False),
+                    sa.Column('error_count', sa.Integer, nullable=False),
+                    sa.Column('last_error', sa.String(255), nullable=True),
+                    sa.PrimaryKeyConstraint('switch_id'),
+                    sa.ForeignKeyConstraint(
+                        ['switch_id'],
+                        ['bnp_physical_switches.id'],
+                        ondelete='CASCADE'))
@@ -0,0 +1,70 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp switch credential ids
+Revision ID: 97d3680feb8d
+Revises: 046e80c1e8ca
+Create Date: 2016-07-04 15:12:33.804126
+"""
+
+# revision identifiers, used by Alembic.
+revision = '97d3680feb8d'
+down_revision = '046e80c1e8ca'
+
+from alembic import op
+import sqlalchemy as sa
+
+switches = sa.table('bnp_physical_switches',
+                    sa.column('id', sa.String(36)),
+                    sa.column('management_protocol', sa.String(16)),
+                    sa.column('credentials', sa.String(36)))
+
+CREDENTIAL_TABLES = ['bnp_snmp_credentials', 'bnp_netconf_credentials']
+
+
+def upgrade():
+    # switches used to store either the name or the id of their credential
+    bind = op.get_bind()
+    cred_ids = set()
+    cred_names = {}
+    for table_name in CREDENTIAL_TABLES:
+        table = sa.table(table_name,
+                         sa.column('id', sa.String(36)),
+                         sa.column('name', sa.String(36)),
+                         sa.column('protocol_type', sa.String(255)))
+        for cred_id, name, protocol in bind.execute(
+                sa.select([table.c.id, table.c.name, table.c.protocol_type])):
+            cred_ids.add(cred_id)
+            cred_names.setdefault((name, protocol), []).append(cred_id)
+    resolved = {}
+    unresolved = []
+    for switch_id, protocol, creds in bind.execute(
+            sa.select([switches.c.id, switches.c.management_protocol,
+                       switches.c.credentials])):
+        if creds in cred_ids:
+            continue
+        matches = cred_names.get((creds, protocol), [])
+        if len(matches) != 1:
+            unresolved.append("%s (%s matches %d credentials)" %
+                              (switch_id, creds, len(matches)))
+        else:
+            resolved[switch_id] = matches[0]
+    if unresolved:
+        # the switches are read by credential id only from now on
+        raise RuntimeError("Update these switches with a credential id "
+                           "before upgrading: %s" % ', '.join(unresolved))
+    for switch_id, cred_id in resolved.items():
+        op.execute(switches.update().where(
+            switches.c.id == switch_id).values(credentials=cred_id))
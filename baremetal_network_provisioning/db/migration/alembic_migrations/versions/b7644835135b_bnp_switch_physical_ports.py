@@ -0,0 +1,48 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp switch physical ports
+Revision ID: b7644835135b
+Revises: 498c5cf5937c
+Create Date: 2016-07-08 15:40:21.918364
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b7644835135b'
+down_revision = '498c5cf5937c'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('bnp_switch_physical_ports',
+                    sa.Column('switch_id', sa.String(36), nullable=False),
+                    sa.Column('ifindex', sa.String(36), nullable=False),
+                    sa.Column('interface_name', sa.String(255),
+                              nullable=False),
+                    sa.Column('port_status', sa.String(16), nullable=True),
+                    sa.Column('walked_at', sa.DateTime, nullable=False),
+                    sa.PrimaryKeyConstraint('switch_id', 'ifindex'),
+                    sa.ForeignKeyConstraint(
+                        ['switch_id'],
+                        ['bnp_physical_switches.id'],
+                        ondelete='CASCADE'))
+    generations = sa.table('bnp_generations',
+                           sa.column('resource', sa.String(64)),
+                           sa.column('generation', sa.BigInteger))
+    op.bulk_insert(generations,
+                   [{'resource': 'bnp_switch_physical_ports',
+                     'generation': 0}])
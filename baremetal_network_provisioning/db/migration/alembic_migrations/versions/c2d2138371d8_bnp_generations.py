@@ -0,0 +1,37 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp generation counters
+Revision ID: c2d2138371d8
+Revises: 3297cd3f2323
+Create Date: 2016-06-20 10:12:41.520213
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'c2d2138371d8'
+down_revision = '3297cd3f2323'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    generations = op.create_table(
+        'bnp_generations',
+        sa.Column('resource', sa.String(64), nullable=False),
+        sa.Column('generation', sa.BigInteger, nullable=False),
+        sa.PrimaryKeyConstraint('resource'))
+    op.bulk_insert(generations,
+                   [{'resource': 'bnp_credentials', 'generation': 0}])
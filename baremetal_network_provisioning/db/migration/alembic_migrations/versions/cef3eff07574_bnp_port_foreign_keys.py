@@ -0,0 +1,52 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""bnp port foreign keys
+Revision ID: cef3eff07574
+Revises: 1a47d0b30b61
+Create Date: 2016-06-27 09:52:18.310447
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'cef3eff07574'
+down_revision = '1a47d0b30b61'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+FOREIGN_KEYS = [
+    ('bnp_switch_port_mappings_ibfk_1', 'bnp_switch_port_mappings',
+     'bnp_physical_switches', ['switch_id'], ['id']),
+    ('bnp_neutron_ports_ibfk_1', 'bnp_neutron_ports',
+     'bnp_switch_port_mappings', ['neutron_port_id'], ['neutron_port_id']),
+]
+
+
+def upgrade():
+    # tables created from the models had no foreign keys, drop the rows
+    # they let through before adding the constraints
+    op.execute("DELETE FROM bnp_switch_port_mappings WHERE switch_id NOT IN "
+               "(SELECT id FROM bnp_physical_switches)")
+    op.execute("DELETE FROM bnp_neutron_ports WHERE neutron_port_id NOT IN "
+               "(SELECT neutron_port_id FROM bnp_switch_port_mappings)")
+    inspector = sa.inspect(op.get_bind())
+    for name, source, referent, local_cols, remote_cols in FOREIGN_KEYS:
+        if any(fk['referred_table'] == referent and
+               fk['constrained_columns'] == local_cols
+               for fk in inspector.get_foreign_keys(source)):
+            continue
+        op.create_foreign_key(name, source, referent, local_cols,
+                              remote_cols, ondelete='CASCADE')
@@ -34,15 +34,64 @@ class PortProvisioningDriver(object):
         """set_isolation create the vlan and the  associate vlan to
 
          the physical ports.
+
+         When port carries the egress_bitmap last written to the vlan,
+         drivers may apply the change to it instead of reading the
+         switch. They return the egress bitmap they wrote, or None.
          """
         pass
 
     @abc.abstractmethod
     def delete_isolation(self, port):
-        """delete_isolation deletes the vlan from the physical ports."""
+        """delete_isolation deletes the vlan from the physical ports.
+
+        The egress_bitmap of port is used and returned as by
+        set_isolation.
+        """
 
         pass
 
+    def update_isolation(self, port):
+        """update_isolation adds and removes several physical ports of
+
+        a switch to and from one vlan. Drivers able to do this in a
+        single device operation should override it.
+        """
+        port_dict = dict(port['port'])
+        egress_bitmap = None
+        for ifindex in port_dict.get('add_ifindexes', []):
+            egress_bitmap = self.set_isolation(
+                {'port': dict(port_dict, switchports=[{'ifindex': ifindex}])})
+            port_dict['egress_bitmap'] = egress_bitmap
+        for ifindex in port_dict.get('del_ifindexes', []):
+            egress_bitmap = self.delete_isolation(
+                {'port': dict(port_dict, ifindex=ifindex)})
+            port_dict['egress_bitmap'] = egress_bitmap
+        return egress_bitmap
+
+    def sync_vlans(self, port):
+        """sync_vlans makes physical ports members of their vlans.
+
+        port carries the credentials of a switch and its vlans, mapping
+        segmentation ids to the ifindexes of their ports. Returns, per
+        segmentation id, whether the vlan was created, the ifindexes
+        added to it and the egress bitmap written. Drivers able to do
+        this in a few device operations should override it, this one
+        adds the ports of each vlan through update_isolation and reports
+        them all as added since it cannot tell the existing members.
+        """
+        port_dict = dict(port['port'])
+        port_dict.pop('vlans')
+        result = {}
+        for seg_id, ifindexes in port['port']['vlans'].items():
+            egress_bitmap = self.update_isolation(
+                {'port': dict(port_dict, segmentation_id=seg_id,
+                              add_ifindexes=ifindexes)})
+            result[seg_id] = {'created': False,
+                              'added_ifindexes': ifindexes,
+                              'egress_bitmap': egress_bitmap}
+        return result
+
     @abc.abstractmethod
     def create_lag(self, port):
         """create_lag  creates the link aggregation for the physical ports."""
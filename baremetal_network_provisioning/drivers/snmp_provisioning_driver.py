@@ -25,6 +25,11 @@ from oslo_log import log as logging
 LOG = logging.getLogger(__name__)
 
 
+def _chunks(items, size=constants.SNMP_MAX_VAR_BINDS):
+    return [items[index:index + size]
+            for index in range(0, len(items), size)]
+
+
 class SNMPProvisioningDriver(driver.PortProvisioningDriver):
     """SNMP Facet driver implementation for bare
 
@@ -36,27 +41,20 @@ class SNMPProvisioningDriver(driver.PortProvisioningDriver):
         try:
             client = snmp_client.get_client(self._get_switch_dict(port))
             seg_id = port['port']['segmentation_id']
-            vlan_oid = constants.OID_VLAN_CREATE + '.' + str(seg_id)
             egress_oid = constants.OID_VLAN_EGRESS_PORT + '.' + str(seg_id)
-            snmp_response = self._snmp_get(client, vlan_oid)
-            no_such_instance_exists = False
-            if snmp_response:
-                for oid, val in snmp_response:
-                    value = val.prettyPrint()
-                    if constants.SNMP_NO_SUCH_INSTANCE in value:
-                        # Fixed for pysnmp versioning issue
-                        no_such_instance_exists = True
-                        break
-            if not snmp_response or no_such_instance_exists:
-                client.set(vlan_oid, client.get_rfc1902_integer(4))
-            nibble_byte = self._get_device_nibble_map(client, egress_oid)
+            nibble_byte = port['port'].get('egress_bitmap')
+            if nibble_byte is None:
+                self._create_vlan_if_absent(client, seg_id)
+                nibble_byte = self._get_device_nibble_map(client, egress_oid)
             ifindex = self._get_ifindex_for_port(port)
             bit_map = client.get_bit_map_for_add(int(ifindex), nibble_byte)
             bit_list = []
             for line in bit_map:
                 bit_list.append(line)
-            set_string = client.get_rfc1902_octet_string(''.join(bit_list))
+            egress_bitmap = ''.join(bit_list)
+            set_string = client.get_rfc1902_octet_string(egress_bitmap)
             client.set(egress_oid, set_string)
+            return egress_bitmap
         except Exception as e:
             LOG.error(_LE("Exception in configuring VLAN '%s' "), e)
             raise exceptions.SNMPFailure(operation="SET", error=e)
@@ -67,20 +65,118 @@ class SNMPProvisioningDriver(driver.PortProvisioningDriver):
             client = snmp_client.get_client(self._get_switch_dict(port))
             seg_id = port['port']['segmentation_id']
             egress_oid = constants.OID_VLAN_EGRESS_PORT + '.' + str(seg_id)
-            nibble_byte = self._get_device_nibble_map(client, egress_oid)
+            nibble_byte = port['port'].get('egress_bitmap')
+            if nibble_byte is None:
+                nibble_byte = self._get_device_nibble_map(client, egress_oid)
             ifindex = port['port']['ifindex']
             bit_map = client.get_bit_map_for_del(int(ifindex), nibble_byte)
             bit_list = []
             for line in bit_map:
                 bit_list.append(line)
-            set_string = client.get_rfc1902_octet_string(''.join(bit_list))
+            egress_bitmap = ''.join(bit_list)
+            set_string = client.get_rfc1902_octet_string(egress_bitmap)
             client.set(egress_oid, set_string)
             # On port delete removing interface from target vlan,
             #  not deleting global vlan on device
+            return egress_bitmap
         except Exception as e:
             LOG.error(_LE("Exception in deleting VLAN '%s' "), e)
             raise exceptions.SNMPFailure(operation="SET", error=e)
 
+    def update_isolation(self, port):
+        """update_isolation adds and removes physical ports of a vlan
+
+        with a single egress bitmap read and write.
+        """
+        try:
+            client = snmp_client.get_client(self._get_switch_dict(port))
+            seg_id = port['port']['segmentation_id']
+            add_ifindexes = port['port'].get('add_ifindexes', [])
+            del_ifindexes = port['port'].get('del_ifindexes', [])
+            egress_oid = constants.OID_VLAN_EGRESS_PORT + '.' + str(seg_id)
+            bit_map = port['port'].get('egress_bitmap')
+            if bit_map is None:
+                if add_ifindexes:
+                    self._create_vlan_if_absent(client, seg_id)
+                bit_map = self._get_device_nibble_map(client, egress_oid)
+            for ifindex in add_ifindexes:
+                bit_map = client.get_bit_map_for_add(int(ifindex), bit_map)
+            for ifindex in del_ifindexes:
+                bit_map = client.get_bit_map_for_del(int(ifindex), bit_map)
+            egress_bitmap = ''.join(bit_map)
+            set_string = client.get_rfc1902_octet_string(egress_bitmap)
+            client.set(egress_oid, set_string)
+            return egress_bitmap
+        except Exception as e:
+            LOG.error(_LE("Exception in updating VLAN '%s' "), e)
+            raise exceptions.SNMPFailure(operation="SET", error=e)
+
+    def sync_vlans(self, port):
+        """sync_vlans makes physical ports members of their vlans
+
+        with one GET of the vlans, one SET creating the absent ones and
+        one SET of the changed egress bitmaps, each split in requests of
+        SNMP_MAX_VAR_BINDS objects. Absent vlans do not fail the GET, on
+        SNMPv1 either. Other members of the vlans are kept.
+        """
+        try:
+            client = snmp_client.get_client(self._get_switch_dict(port))
+            vlans = port['port']['vlans']
+            seg_ids = sorted(vlans)
+            bitmaps = {}
+            absent = []
+            for chunk in _chunks(seg_ids, constants.SNMP_MAX_VAR_BINDS / 2):
+                oids = []
+                for seg_id in chunk:
+                    oids.append(constants.OID_VLAN_CREATE + '.' + str(seg_id))
+                    oids.append(constants.OID_VLAN_EGRESS_PORT + '.' +
+                                str(seg_id))
+                values = client.get_existing(*oids)
+                for index, seg_id in enumerate(chunk):
+                    egress = values[2 * index + 1]
+                    if values[2 * index] is None:
+                        absent.append(seg_id)
+                        bitmaps[seg_id] = ''
+                    elif egress is None:
+                        bitmaps[seg_id] = ''
+                    else:
+                        egress = client.get_rfc1902_octet_string(egress)
+                        bitmaps[seg_id] = vars(egress)['_value']
+            for chunk in _chunks(absent):
+                client.set_multiple(
+                    [(constants.OID_VLAN_CREATE + '.' + str(seg_id),
+                      client.get_rfc1902_integer(4)) for seg_id in chunk])
+            size = max([len(bit_map) for bit_map in bitmaps.values()] + [0])
+            changes = []
+            result = {}
+            for seg_id in seg_ids:
+                ifindexes = sorted(set(int(ifindex)
+                                       for ifindex in vlans[seg_id]))
+                bit_map = bitmaps[seg_id]
+                length = max(len(bit_map) or size,
+                             (ifindexes[-1] + 7) / 8 if ifindexes else 0)
+                bit_map = bit_map.ljust(length, '\x00')
+                added = []
+                for ifindex in ifindexes:
+                    new_map = ''.join(client.get_bit_map_for_add(ifindex,
+                                                                 bit_map))
+                    if new_map != bit_map:
+                        added.append(ifindex)
+                        bit_map = new_map
+                if added:
+                    changes.append(
+                        (constants.OID_VLAN_EGRESS_PORT + '.' + str(seg_id),
+                         client.get_rfc1902_octet_string(bit_map)))
+                result[seg_id] = {'created': seg_id in absent,
+                                  'added_ifindexes': added,
+                                  'egress_bitmap': bit_map}
+            for chunk in _chunks(changes):
+                client.set_multiple(chunk)
+            return result
+        except Exception as e:
+            LOG.error(_LE("Exception in synchronizing VLANs '%s' "), e)
+            raise exceptions.SNMPFailure(operation="SET", error=e)
+
     def create_lag(self, port):
         """create_lag  creates the link aggregation for the physical ports."""
 
@@ -111,6 +207,20 @@ class SNMPProvisioningDriver(driver.PortProvisioningDriver):
             'priv_key': priv_key}
         return switch_dict
 
+    def _create_vlan_if_absent(self, client, seg_id):
+        vlan_oid = constants.OID_VLAN_CREATE + '.' + str(seg_id)
+        snmp_response = self._snmp_get(client, vlan_oid)
+        no_such_instance_exists = False
+        if snmp_response:
+            for oid, val in snmp_response:
+                value = val.prettyPrint()
+                if constants.SNMP_NO_SUCH_INSTANCE in value:
+                    # Fixed for pysnmp versioning issue
+                    no_such_instance_exists = True
+                    break
+        if not snmp_response or no_such_instance_exists:
+            client.set(vlan_oid, client.get_rfc1902_integer(4))
+
     def _get_device_nibble_map(self, snmp_client_info, egress_oid):
         try:
             var_binds = snmp_client_info.get(egress_oid)
@@ -15,6 +15,7 @@
 
 import webob.exc
 
+from neutron.api import api_common
 from neutron.api import extensions
 from neutron.api.v2 import attributes
 from neutron.api.v2 import base
@@ -23,6 +24,7 @@ from neutron import wsgi
 
 from baremetal_network_provisioning.common import constants as const
 from baremetal_network_provisioning.common import validators
+from baremetal_network_provisioning.db import bm_nw_provision_cache as cache
 from baremetal_network_provisioning.db import bm_nw_provision_db as db
 
 from oslo_log import log as logging
@@ -56,6 +58,8 @@ RESOURCE_ATTRIBUTE_MAP = {
     },
 }
 
+LIST_PARAMS = ('fields', 'limit', 'marker', 'page_reverse')
+
 validator_func = validators.access_parameter_validator
 attributes.validators['type:access_dict'] = validator_func
 
@@ -71,18 +75,21 @@ class BNPCredentialController(wsgi.Controller):
 
     def index(self, request, **kwargs):
         context = request.context
-        filters = {}
-        creds = []
-        req_dict = dict(request.GET)
-        if req_dict and req_dict.get('fields', None):
-            req_dict.pop('fields')
-        filters = req_dict
-        creds = db.get_all_snmp_creds(context, **filters)
-        netconf_creds = db.get_all_netconf_creds(context, **filters)
-        for i in netconf_creds:
-            creds.append(i)
-        creds = self._creds_to_show(creds)
+        filters = dict((key, value) for key, value in request.GET.items()
+                       if key not in LIST_PARAMS)
+        for key in filters:
+            if key not in const.CREDENTIAL_COLUMNS:
+                raise webob.exc.HTTPBadRequest(
+                    _("%s is invalid attribute for filters") % key)
+        limit, marker = api_common.get_limit_and_marker(request)
+        page_reverse = api_common.get_page_reverse(request)
+        creds = db.get_all_bnp_creds(context, limit=limit, marker=marker,
+                                     page_reverse=page_reverse, **filters)
         creds_dict = {'bnp_credentials': creds}
+        if limit:
+            creds_dict['bnp_credentials_links'] = (
+                api_common.get_pagination_links(request, creds, limit,
+                                                marker, page_reverse))
         return creds_dict
 
     def _creds_to_show(self, creds):
@@ -107,13 +114,8 @@ class BNPCredentialController(wsgi.Controller):
 
     def show(self, request, id, **kwargs):
         context = request.context
-        snmp_cred = db.get_snmp_cred_by_id(context, id)
-        netconf_cred = db.get_netconf_cred_by_id(context, id)
-        if snmp_cred:
-            cred = self._creds_to_show(snmp_cred)
-        elif netconf_cred:
-            cred = self._creds_to_show(netconf_cred)
-        else:
+        cred = db.get_bnp_cred_by_id(context, id)
+        if not cred:
             raise webob.exc.HTTPNotFound(
                 _("Credential with id=%s does not exist") % id)
         return {const.BNP_CREDENTIAL_RESOURCE_NAME: cred}
@@ -127,15 +129,15 @@ class BNPCredentialController(wsgi.Controller):
             raise webob.exc.HTTPConflict(
                 _("credential with id=%s is associated with a switch."
                   "Hence can't be deleted.") % id)
-        snmp_cred = db.get_snmp_cred_by_id(context, id)
-        netconf_cred = db.get_netconf_cred_by_id(context, id)
-        if snmp_cred:
-            db.delete_snmp_cred_by_id(context, id)
-        elif netconf_cred:
-            db.delete_netconf_cred_by_id(context, id)
-        else:
+        cred = db.get_bnp_cred_by_id(context, id)
+        if not cred:
             raise webob.exc.HTTPNotFound(
                 _("Credential with id=%s does not exist") % id)
+        if const.PROTOCOL_SNMP in cred['protocol_type']:
+            db.delete_snmp_cred_by_id(context, id)
+        else:
+            db.delete_netconf_cred_by_id(context, id)
+        cache.credentials.invalidate()
 
     def create(self, request, **kwargs):
         """Create a new Credential."""
@@ -233,12 +235,14 @@ class BNPCredentialController(wsgi.Controller):
             if switch_creds:
                 switch_creds_dict = self._update_dict(body, dict(switch_creds))
                 db.update_bnp_snmp_cred_by_id(context, id, switch_creds_dict)
+                cache.credentials.invalidate()
                 return switch_creds_dict
             switch_creds = db.get_netconf_cred_by_id(context, id)
             if switch_creds:
                 switch_creds_dict = self._update_dict(body, dict(switch_creds))
                 db.update_bnp_netconf_cred_by_id(
                     context, id, switch_creds_dict)
+                cache.credentials.invalidate()
                 return switch_creds_dict
             raise webob.exc.HTTPNotFound(
                 _("Credential with id=%s does not exist") % id)
@@ -254,6 +258,7 @@ class BNPCredentialController(wsgi.Controller):
                 body[key] = value
             creds_dict = self._update_dict(body, dict(switch_creds))
             db.update_bnp_snmp_cred_by_id(context, id, creds_dict)
+            cache.credentials.invalidate()
             return creds_dict
 
         elif protocol == const.SNMP_V3:
@@ -281,6 +286,7 @@ class BNPCredentialController(wsgi.Controller):
                 body[key] = value
             creds_dict = self._update_dict(body, dict(switch_creds))
             db.update_bnp_snmp_cred_by_id(context, id, creds_dict)
+            cache.credentials.invalidate()
             return creds_dict
 
         elif protocol == const.NETCONF_SOAP:
@@ -294,6 +300,7 @@ class BNPCredentialController(wsgi.Controller):
                 body[key] = value
             creds_dict = self._update_dict(body, dict(switch_creds))
             db.update_bnp_netconf_cred_by_id(context, id, creds_dict)
+            cache.credentials.invalidate()
             return creds_dict
 
         elif protocol == const.NETCONF_SSH:
@@ -313,6 +320,7 @@ class BNPCredentialController(wsgi.Controller):
                 body[key] = value
             creds_dict = self._update_dict(body, dict(switch_creds))
             db.update_bnp_netconf_cred_by_id(context, id, creds_dict)
+            cache.credentials.invalidate()
             return creds_dict
 
 
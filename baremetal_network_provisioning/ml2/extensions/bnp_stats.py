@@ -0,0 +1,144 @@
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import webob.exc
+
+from neutron.api import extensions
+from neutron.api.v2 import base
+from neutron.api.v2 import resource
+from neutron import wsgi
+
+from baremetal_network_provisioning.common import metrics
+from baremetal_network_provisioning.db import bm_nw_provision_db as db
+
+
+RESOURCE_ATTRIBUTE_MAP = {
+    'bnp-stats': {
+        'switch_id': {'allow_post': False, 'allow_put': False,
+                      'is_visible': True},
+        'name': {'allow_post': False, 'allow_put': False,
+                 'is_visible': True},
+        'bound_ports': {'allow_post': False, 'allow_put': False,
+                        'is_visible': True},
+        'active_vlans': {'allow_post': False, 'allow_put': False,
+                         'is_visible': True},
+        'outcomes': {'allow_post': False, 'allow_put': False,
+                     'is_visible': True},
+        'latencies': {'allow_post': False, 'allow_put': False,
+                      'is_visible': True},
+    },
+}
+
+
+class BNPStatsController(wsgi.Controller):
+
+    """WSGI Controller for the extension bnp-stats.
+
+    The bound ports and active vlans are read from the DB. The bind and
+    unbind counts, the latencies of the SNMP and DB phases and the
+    histograms of the timed operations and of their phases come from
+    the counters of the neutron-server process serving the request.
+    """
+
+    def _check_admin(self, context):
+        reason = _("Only admin can read Bnp-stats")
+        if not context.is_admin:
+            raise webob.exc.HTTPForbidden(reason)
+
+    def _stats(self, switch_id, name, usage, stats):
+        bound_ports, active_vlans = usage.get(switch_id, (0, 0))
+        switch_stats = stats.get(switch_id, {})
+        return {'switch_id': switch_id,
+                'name': name,
+                'bound_ports': bound_ports,
+                'active_vlans': active_vlans,
+                metrics.OUTCOMES: switch_stats.get(metrics.OUTCOMES, {}),
+                metrics.LATENCIES: switch_stats.get(metrics.LATENCIES, {})}
+
+    def index(self, request, **kwargs):
+        context = request.context
+        self._check_admin(context)
+        usage = db.get_bnp_vlan_usage(context)
+        stats = metrics.get_switch_stats()
+        switches = db.get_all_bnp_phys_switches(context,
+                                                fields=['id', 'name'])
+        switch_stats = [self._stats(switch['id'], switch['name'], usage,
+                                    stats) for switch in switches]
+        overall = self._stats(None, None, {}, stats)
+        overall['bound_ports'] = sum(ports for ports, vlans
+                                     in usage.values())
+        overall['active_vlans'] = sum(vlans for ports, vlans
+                                      in usage.values())
+        return {'bnp_stats': switch_stats, 'bnp_stats_overall': overall,
+                'bnp_stats_histograms': metrics.get_histograms()}
+
+    def show(self, request, id, **kwargs):
+        context = request.context
+        self._check_admin(context)
+        switch = db.get_bnp_phys_switch(context, id)
+        if not switch:
+            raise webob.exc.HTTPNotFound(
+                _("Switch %s does not exist") % id)
+        return {'bnp_stat': self._stats(id, switch['name'],
+                                        db.get_bnp_vlan_usage(context),
+                                        metrics.get_switch_stats())}
+
+    def create(self, request, **kwargs):
+        raise webob.exc.HTTPBadRequest(
+            _("This operation is not allowed"))
+
+    def delete(self, request, id, **kwargs):
+        raise webob.exc.HTTPBadRequest(
+            _("This operation is not allowed"))
+
+    def update(self, request, id, **kwargs):
+        raise webob.exc.HTTPBadRequest(
+            _("This operation is not allowed"))
+
+
+class Bnp_stats(extensions.ExtensionDescriptor):
+
+    """API extension for Baremetal provisioning statistics."""
+
+    @classmethod
+    def get_name(cls):
+        return "Bnp-Stats"
+
+    @classmethod
+    def get_alias(cls):
+        return "bnp-stats"
+
+    @classmethod
+    def get_description(cls):
+        return ("Provisioning statistics of the physical switches"
+                " for bare metal instance network provisioning")
+
+    @classmethod
+    def get_updated(cls):
+        return "2016-07-11T00:00:00-00:00"
+
+    def get_resources(self):
+        exts = []
+        controller = resource.Resource(BNPStatsController(),
+                                       base.FAULT_MAP)
+        exts.append(extensions.ResourceExtension(
+            'bnp-stats', controller))
+        return exts
+
+    def get_extended_resources(self, version):
+        if version == "2.0":
+            return RESOURCE_ATTRIBUTE_MAP
+        else:
+            return {}
@@ -13,20 +13,30 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import eventlet
+import six
 import webob.exc
 
 from neutron._i18n import _LE
+from neutron._i18n import _LI
+from neutron._i18n import _LW
+from neutron.api import api_common
 from neutron.api import extensions
 from neutron.api.v2 import attributes
 from neutron.api.v2 import base
 from neutron.api.v2 import resource
+from neutron import context as neutron_context
 from neutron import wsgi
 
 from baremetal_network_provisioning.common import constants as const
+from baremetal_network_provisioning.common import etag
 from baremetal_network_provisioning.common import validators
+from baremetal_network_provisioning.db import bm_nw_provision_cache as cache
 from baremetal_network_provisioning.db import bm_nw_provision_db as db
+from baremetal_network_provisioning.db import bm_nw_provision_models as models
 from baremetal_network_provisioning import managers
 
+from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import uuidutils
 
@@ -61,10 +71,40 @@ RESOURCE_ATTRIBUTE_MAP = {
     },
 }
 
+SWITCH_COLUMNS = models.BNPPhysicalSwitch.__table__.columns.keys()
+LIST_PARAMS = ('fields', 'sort_key', 'sort_dir', 'limit', 'marker',
+               'page_reverse')
+
 validator_func = validators.access_parameter_validator
 attributes.validators['type:access_dict'] = validator_func
 
 
+def get_access_param(context, protocol, creds):
+    """Get the credential of protocol matching creds, an id or a name.
+
+    Raises HTTPBadRequest when no credential or several match.
+    """
+    if not uuidutils.is_uuid_like(creds):
+        access_parameters = cache.get_credentials_by_name(
+            context, protocol, creds)
+    else:
+        access_parameters = cache.get_credential_by_id(
+            context, protocol, creds)
+    if not access_parameters:
+        raise webob.exc.HTTPBadRequest(
+            _("Credentials not found for Id or name: %s") % creds)
+    if isinstance(access_parameters, list) and len(access_parameters) > 1:
+        raise webob.exc.HTTPBadRequest(
+            _("Multiple credentials matches found "
+              "for name: %s, use an ID to be more specific.") % creds)
+    if isinstance(access_parameters, list):
+        access_parameters = access_parameters[0]
+    if access_parameters['protocol_type'] != protocol:
+        raise webob.exc.HTTPBadRequest(
+            _("Credentials not found for Id or name: %s") % creds)
+    return access_parameters
+
+
 class BNPSwitchController(wsgi.Controller):
 
     """WSGI Controller for the extension bnp-switch."""
@@ -79,15 +119,54 @@ class BNPSwitchController(wsgi.Controller):
 
     def index(self, request, **kwargs):
         context = request.context
-        req_dict = dict(request.GET)
-        if req_dict and req_dict.get('fields', None):
-            req_dict.pop('fields')
-        filters = req_dict
-        switches = db.get_all_bnp_phys_switches(context, **filters)
+        filters = dict((key, value) for key, value in request.GET.items()
+                       if key not in LIST_PARAMS)
+        for key in filters:
+            if key not in SWITCH_COLUMNS:
+                raise webob.exc.HTTPBadRequest(
+                    _("%s is invalid attribute for filters") % key)
+        fields = [field for field in api_common.list_args(request, 'fields')
+                  if field in SWITCH_COLUMNS]
+        sorts = self._get_sorts(request)
+        limit, marker = api_common.get_limit_and_marker(request)
+        page_reverse = api_common.get_page_reverse(request)
+        query_fields = list(fields)
+        if fields and limit and 'id' not in fields:
+            # the id of the last switch is the marker of the next page
+            query_fields.append('id')
+        switches = db.get_all_bnp_phys_switches(context, fields=query_fields,
+                                                sorts=sorts, limit=limit,
+                                                marker=marker,
+                                                page_reverse=page_reverse,
+                                                **filters)
         switches = self._switch_to_show(switches)
         switches_dict = {'bnp_switches': switches}
+        if limit:
+            switches_dict['bnp_switches_links'] = (
+                api_common.get_pagination_links(request, switches, limit,
+                                                marker, page_reverse))
+            if query_fields != fields:
+                for switch in switches:
+                    switch.pop('id')
         return switches_dict
 
+    def _get_sorts(self, request):
+        sort_keys = api_common.list_args(request, 'sort_key')
+        sort_dirs = api_common.list_args(request, 'sort_dir')
+        if len(sort_keys) != len(sort_dirs):
+            raise webob.exc.HTTPBadRequest(
+                _("The number of sort_keys and sort_dirs must be same"))
+        for key in sort_keys:
+            if key not in SWITCH_COLUMNS:
+                raise webob.exc.HTTPBadRequest(
+                    _("%s is invalid attribute for sort_keys") % key)
+        for sort_dir in sort_dirs:
+            if sort_dir not in ('asc', 'desc'):
+                raise webob.exc.HTTPBadRequest(
+                    _("%s is invalid value for sort_dirs") % sort_dir)
+        return [(key, sort_dir == 'asc')
+                for key, sort_dir in zip(sort_keys, sort_dirs)]
+
     def _switch_to_show(self, switches):
         switch_list = []
         if isinstance(switches, list):
@@ -101,7 +180,7 @@ class BNPSwitchController(wsgi.Controller):
 
     def show(self, request, id, **kwargs):
         context = request.context
-        switch = db.get_bnp_phys_switch(context, id)
+        switch = cache.get_switch_by_id(context, id)
         if not switch:
             raise webob.exc.HTTPNotFound(
                 _("Switch %s does not exist") % id)
@@ -126,10 +205,7 @@ class BNPSwitchController(wsgi.Controller):
                 _("Disable the switch %s to delete") % id)
         db.delete_bnp_phys_switch(context, id)
 
-    def create(self, request, **kwargs):
-        context = request.context
-        self._check_admin(context)
-        body = validators.validate_request(request)
+    def _check_create_body(self, body):
         key_list = ['name', 'ip_address', 'vendor',
                     'management_protocol', 'credentials',
                     'mac_address']
@@ -140,9 +216,17 @@ class BNPSwitchController(wsgi.Controller):
                     _("Key %s not found in request body") % key)
         key_list.append('family')
         validators.validate_attributes(keys, key_list)
-        ip_address = body['ip_address']
         if const.FAMILY not in body:
             body['family'] = ''
+
+    def create(self, request, **kwargs):
+        context = request.context
+        self._check_admin(context)
+        body = validators.validate_request(request)
+        if 'bnp_switches' in body:
+            return self._create_bulk(context, body['bnp_switches'])
+        self._check_create_body(body)
+        ip_address = body['ip_address']
         bnp_switch = db.get_bnp_phys_switch_by_ip(context,
                                                   ip_address)
         if bnp_switch:
@@ -155,15 +239,274 @@ class BNPSwitchController(wsgi.Controller):
             raise webob.exc.HTTPConflict(
                 _("Switch with mac_address %s is already present") %
                 body['mac_address'])
-        access_parameters = self._get_access_param(context,
-                                                   body['management_protocol'],
-                                                   body['credentials'])
-        credentials = body['credentials']
+        access_parameters = get_access_param(context,
+                                             body['management_protocol'],
+                                             body['credentials'])
+        body['credentials'] = access_parameters['id']
         body['port_provisioning'] = const.PORT_PROVISIONING_STATUS['enable']
-        result = self.validate_protocol(access_parameters, credentials, body)
-        body['validation_result'] = result
+        body['validation_result'] = const.VALIDATION_PENDING
         db_switch = db.add_bnp_phys_switch(context, body)
-        return {const.BNP_SWITCH_RESOURCE_NAME: dict(db_switch)}
+        switch_dict = dict(db_switch)
+        switch_dict['validation_job'] = self._start_validation(
+            context, [db_switch['id']])[0]
+        return {const.BNP_SWITCH_RESOURCE_NAME: switch_dict}
+
+    def _create_bulk(self, context, switches):
+        """Create several switches and validate them in the background.
+
+        The switches are checked against each other and the DB with one
+        query, then inserted in one transaction. Each switch of the request
+        gets either its created switch or its addresses and an error in
+        the result, in the order of the request.
+        """
+        if not isinstance(switches, list):
+            raise webob.exc.HTTPBadRequest(
+                _("bnp_switches must be a list of switches"))
+        for switch in switches:
+            self._check_create_body(switch)
+        existing = db.get_bnp_phys_switches_by_ip_or_mac(
+            context, [switch['ip_address'] for switch in switches],
+            [switch['mac_address'] for switch in switches])
+        ip_addresses = set(ip_address for ip_address, mac in existing)
+        mac_addresses = set(mac for ip_address, mac in existing)
+        results = []
+        new_switches = []
+        positions = []
+        for switch in switches:
+            error = None
+            if switch['ip_address'] in ip_addresses:
+                error = (_("Switch with ip_address %s is already present") %
+                         switch['ip_address'])
+            elif switch['mac_address'] in mac_addresses:
+                error = (_("Switch with mac_address %s is already present") %
+                         switch['mac_address'])
+            else:
+                try:
+                    access_parameters = get_access_param(
+                        context, switch['management_protocol'],
+                        switch['credentials'])
+                except webob.exc.HTTPBadRequest as e:
+                    error = e.explanation
+            ip_addresses.add(switch['ip_address'])
+            mac_addresses.add(switch['mac_address'])
+            if error:
+                results.append({'name': switch['name'],
+                                'ip_address': switch['ip_address'],
+                                'mac_address': switch['mac_address'],
+                                'error': error})
+                continue
+            switch['credentials'] = access_parameters['id']
+            switch['port_provisioning'] = (
+                const.PORT_PROVISIONING_STATUS['enable'])
+            switch['validation_result'] = const.VALIDATION_PENDING
+            positions.append(len(results))
+            results.append(None)
+            new_switches.append(switch)
+        db_switches = db.add_bnp_phys_switches(context, new_switches)
+        job_ids = self._start_validation(
+            context, [db_switch['id'] for db_switch in db_switches])
+        for position, db_switch, job_id in zip(positions, db_switches,
+                                               job_ids):
+            db_switch['validation_job'] = job_id
+            results[position] = db_switch
+        return {'bnp_switches': results}
+
+    def _start_validation(self, context, switch_ids):
+        """Validate switches on their device in the background.
+
+        One job is recorded per switch and the jobs run in green threads
+        of this worker. The switches keep their pending validation result
+        until their job records the outcome. A job left pending or running
+        by a worker that stopped is restarted by run_stale_validation_jobs.
+        Returns the ids of the jobs.
+        """
+        with context.session.begin(subtransactions=True):
+            job_ids = [db.add_bnp_validation_job(context, switch_id)['id']
+                       for switch_id in switch_ids]
+        if job_ids:
+            eventlet.spawn_n(self.run_validation_jobs, job_ids)
+        return job_ids
+
+    def run_validation_jobs(self, job_ids):
+        pool = eventlet.GreenPool(cfg.CONF.ml2_hpe.switch_validation_workers)
+        for job_id in job_ids:
+            pool.spawn_n(self._run_validation_job, job_id)
+        pool.waitall()
+
+    def run_stale_validation_jobs(self):
+        """Restart the validation jobs abandoned by a stopped worker."""
+        context = neutron_context.get_admin_context()
+        job_ids = db.get_stale_bnp_validation_job_ids(
+            context, cfg.CONF.ml2_hpe.validation_job_timeout)
+        if job_ids:
+            LOG.info(_LI("Restarting %s abandoned validation jobs"),
+                     len(job_ids))
+            self.run_validation_jobs(job_ids)
+
+    def _run_validation_job(self, job_id):
+        context = neutron_context.get_admin_context()
+        try:
+            job = db.claim_bnp_validation_job(
+                context, job_id, cfg.CONF.ml2_hpe.validation_job_timeout)
+            if not job:
+                return
+            switch = db.get_bnp_phys_switch(context, job['switch_id'])
+            try:
+                access_parameters = self._get_switch_access_param(context,
+                                                                  switch)
+            except webob.exc.HTTPBadRequest as e:
+                result = e.explanation
+            else:
+                result = self.validate_protocol(access_parameters,
+                                                switch['credentials'],
+                                                dict(switch))
+            db.finish_bnp_validation_job(context, job_id, result)
+        except Exception as e:
+            LOG.error(_LE("Error in validation job %(job)s: %(err)s"),
+                      {'job': job_id, 'err': e})
+
+    def validation(self, request, id, **kwargs):
+        """Show the latest validation job of a switch."""
+        context = request.context
+        if not db.get_bnp_phys_switch(context, id):
+            raise webob.exc.HTTPNotFound(
+                _("Switch %s does not exist") % id)
+        job = db.get_last_bnp_validation_job(context, id)
+        if not job:
+            raise webob.exc.HTTPNotFound(
+                _("Switch %s has no validation job") % id)
+        return {'validation_job': dict(job)}
+
+    def health(self, request, id, **kwargs):
+        """Show the health of a switch last recorded by the poller."""
+        context = request.context
+        if not cache.get_switch_by_id(context, id):
+            raise webob.exc.HTTPNotFound(
+                _("Switch %s does not exist") % id)
+        health = db.get_bnp_switch_health(context, id)
+        if not health:
+            raise webob.exc.HTTPNotFound(
+                _("Switch %s has not been polled yet") % id)
+        return {'bnp_switch_health': dict(health)}
+
+    def ports(self, request, id, **kwargs):
+        """Show the physical ports last walked on a switch.
+
+        The ports are stored by the walks made on port binds and on
+        refresh=true, which walks the switch first.
+        """
+        context = request.context
+        switch = cache.get_switch_by_id(context, id)
+        if not switch:
+            raise webob.exc.HTTPNotFound(
+                _("Switch %s does not exist") % id)
+        refresh = request.GET.get('refresh', False)
+        if attributes.convert_to_boolean(refresh):
+            self._check_admin(context)
+            self._walk_ports(context, switch)
+        updated_at, ports = cache.get_switch_ports(context, id)
+        return {'bnp_switch_ports': {'switch_id': id,
+                                     'updated_at': updated_at,
+                                     'ports': ports}}
+
+    def _get_creds_dict(self, context, switch):
+        access_parameters = self._get_switch_access_param(context, switch)
+        creds_dict = dict(access_parameters)
+        creds_dict['ip_address'] = switch['ip_address']
+        creds_dict['management_protocol'] = switch['management_protocol']
+        return creds_dict
+
+    def _walk_ports(self, context, switch):
+        creds_dict = self._get_creds_dict(context, switch)
+        driver = self._protocol_driver(dict(switch))
+        if not driver:
+            raise webob.exc.HTTPBadRequest(const.NO_DRVR_FOUND)
+        try:
+            ports = driver.obj.get_device_info(
+                {'port': {'credentials': creds_dict}})
+        except Exception as e:
+            LOG.error(_LE("Error in walking the ports of switch %(id)s: "
+                          "%(err)s"), {'id': switch['id'], 'err': e})
+            raise webob.exc.HTTPServiceUnavailable(const.DEVICE_NOT_REACHABLE)
+        cache.set_switch_ports(context, switch['id'], ports)
+
+    def resync(self, request, id, **kwargs):
+        """Push the vlan membership recorded in the DB to a switch.
+
+        Every port mapped on the switch is made a member of the vlan of
+        its neutron port, creating the vlan if needed, and the written
+        egress bitmaps are stored. Returns the vlans that changed, and the
+        vlans skipped because binds kept changing them during the resync.
+        """
+        context = request.context
+        self._check_admin(context)
+        switch = db.get_bnp_phys_switch(context, id)
+        if not switch:
+            raise webob.exc.HTTPNotFound(
+                _("Switch %s does not exist") % id)
+        creds_dict = self._get_creds_dict(context, switch)
+        driver = self._protocol_driver(dict(switch))
+        if not driver:
+            raise webob.exc.HTTPBadRequest(const.NO_DRVR_FOUND)
+        vlans, ports, changes, conflicts = self._sync_vlans(
+            context, id, driver, creds_dict)
+        for attempt in range(const.VLAN_EGRESS_RETRIES):
+            if not conflicts:
+                break
+            LOG.warning(_LW("VLANs %(vlans)s of switch %(id)s changed "
+                            "during the resync, retrying"),
+                        {'vlans': conflicts, 'id': id})
+            retried = self._sync_vlans(context, id, driver, creds_dict,
+                                       conflicts)
+            changes.extend(retried[2])
+            conflicts = retried[3]
+        changes.sort(key=lambda change: change['segmentation_id'])
+        return {'bnp_switch_resync': {'switch_id': id,
+                                      'vlans': vlans,
+                                      'ports': ports,
+                                      'changes': changes,
+                                      'skipped': conflicts}}
+
+    def _sync_vlans(self, context, id, driver, creds_dict, seg_ids=None):
+        """Sync the vlans of a switch, or only seg_ids, with the DB.
+
+        The versions of the stored bitmaps are read before the members,
+        and a bitmap is stored only if its vlan is still at that version.
+        A bind or unbind that changed a vlan meanwhile keeps its bitmap
+        and the vlan is returned as a conflict to be synced again.
+        Returns the number of vlans and ports synced, the changes and the
+        conflicts.
+        """
+        versions = db.get_bnp_switch_vlan_versions(context, id)
+        vlans = {}
+        ports = 0
+        for seg_id, ifindex in db.get_bnp_switch_vlan_members(context, id):
+            if seg_ids is None or seg_id in seg_ids:
+                vlans.setdefault(seg_id, []).append(ifindex)
+                ports += 1
+        try:
+            result = driver.obj.sync_vlans(
+                {'port': {'credentials': creds_dict, 'vlans': vlans}})
+        except Exception as e:
+            LOG.error(_LE("Error in resynchronizing switch %(id)s: "
+                          "%(err)s"), {'id': id, 'err': e})
+            raise webob.exc.HTTPServiceUnavailable(const.DEVICE_NOT_REACHABLE)
+        changes = []
+        conflicts = []
+        with context.session.begin(subtransactions=True):
+            for seg_id, vlan in sorted(result.items()):
+                if (vlan['egress_bitmap'] is not None and
+                        not db.update_bnp_switch_vlan(
+                            context, id, seg_id, vlan['egress_bitmap'],
+                            versions.get(seg_id, 0))):
+                    conflicts.append(seg_id)
+                    continue
+                if vlan['created'] or vlan['added_ifindexes']:
+                    changes.append({'segmentation_id': seg_id,
+                                    'created': vlan['created'],
+                                    'added_ifindexes':
+                                    vlan['added_ifindexes']})
+        return len(vlans), ports, changes, conflicts
 
     def validate_protocol(self, access_parameters, credentials, body):
         for key, value in access_parameters.iteritems():
@@ -189,31 +532,18 @@ class BNPSwitchController(wsgi.Controller):
             result = const.DEVICE_NOT_REACHABLE
         return result
 
-    def _get_access_param(self, context, protocol, creds):
-        if const.PROTOCOL_SNMP in protocol:
-            if not uuidutils.is_uuid_like(creds):
-                access_parameters = db.get_snmp_cred_by_name_and_protocol(
-                    context, creds, protocol)
-            else:
-                access_parameters = db.get_snmp_cred_by_id(context, creds)
-        else:
-            if not uuidutils.is_uuid_like(creds):
-                access_parameters = db.get_netconf_cred_by_name_and_protocol(
-                    context, creds, protocol)
-            else:
-                access_parameters = db.get_netconf_cred_by_id(context, creds)
-        if not access_parameters:
-            raise webob.exc.HTTPBadRequest(
-                _("Credentials not found for Id or name: %s") % creds)
-        if isinstance(access_parameters, list) and len(access_parameters) > 1:
-            raise webob.exc.HTTPBadRequest(
-                _("Multiple credentials matches found "
-                  "for name: %s, use an ID to be more specific.") % creds)
-        if isinstance(access_parameters, list):
-            access_parameters = access_parameters[0]
-        if access_parameters['protocol_type'] != protocol:
+    def _get_switch_access_param(self, context, switch):
+        """Get the access parameters of a stored switch.
+
+        Switches store the id of their credential, resolved when written.
+        """
+        creds = switch['credentials']
+        access_parameters = cache.get_credential_by_id(
+            context, switch['management_protocol'], creds)
+        if (not access_parameters or access_parameters['protocol_type'] !=
+                switch['management_protocol']):
             raise webob.exc.HTTPBadRequest(
-                _("Credentials not found for Id or name: %s") % creds)
+                _("Credentials not found for Id: %s") % creds)
         return access_parameters
 
     def update(self, request, id, **kwargs):
@@ -252,11 +582,11 @@ class BNPSwitchController(wsgi.Controller):
         if body.get('management_protocol') and body.get('credentials'):
             proto = body['management_protocol']
             cred = body['credentials']
-            self._get_access_param(context,
-                                   proto,
-                                   cred)
+            access_parameters = get_access_param(context,
+                                                 proto,
+                                                 cred)
             switch['management_protocol'] = proto
-            switch['credentials'] = cred
+            switch['credentials'] = access_parameters['id']
         elif (body.get('management_protocol')
               and not body.get('credentials')):
             proto = body['management_protocol']
@@ -268,20 +598,13 @@ class BNPSwitchController(wsgi.Controller):
         elif (body.get('credentials') and not
               body.get('management_protocol')):
             cred = body['credentials']
-            self._get_access_param(context,
-                                   switch['management_protocol'],
-                                   cred)
-            switch['credentials'] = cred
-        if body.get('mac_address') or body.get('validate'):
-            body['vendor'] = switch['vendor']
-            body['management_protocol'] = switch['management_protocol']
-            body['family'] = switch['family']
-            sw_proto = switch['management_protocol']
-            sw_cred = switch['credentials']
-            body['ip_address'] = switch['ip_address']
-            access_parameters = self._get_access_param(context,
-                                                       sw_proto,
-                                                       sw_cred)
+            access_parameters = get_access_param(
+                context, switch['management_protocol'], cred)
+            switch['credentials'] = access_parameters['id']
+        validate = body.get('mac_address') or body.get('validate')
+        if validate:
+            # the job validates the stored switch with its credentials
+            self._get_switch_access_param(context, switch)
             if body.get('mac_address'):
                 filters = {'mac_address': body['mac_address']}
                 switch_exists = db.get_if_bnp_phy_switch_exists(
@@ -290,18 +613,96 @@ class BNPSwitchController(wsgi.Controller):
                     raise webob.exc.HTTPConflict(
                         _("Switch with mac_address %s is already present") %
                         body['mac_address'])
-                result = self.validate_protocol(access_parameters,
-                                                switch['credentials'], body)
-                switch['validation_result'] = result
                 switch['mac_address'] = body['mac_address']
-            elif body.get('validate') and not body.get('mac_address'):
-                body['mac_address'] = switch['mac_address']
-                result = self.validate_protocol(access_parameters,
-                                                switch['credentials'], body)
-                switch['validation_result'] = result
+            switch['validation_result'] = const.VALIDATION_PENDING
         db.update_bnp_phy_switch(context, id, switch)
+        if validate:
+            switch = dict(switch)
+            switch['validation_job'] = self._start_validation(context,
+                                                              [id])[0]
         return switch
 
+    def bulk_update(self, request, **kwargs):
+        """Apply one change to the switches matching filters.
+
+        The body holds filters, mapping switch columns to a string or a
+        list of strings, and any of port_provisioning, credentials and
+        validate. Empty filters are refused unless all is true, so that
+        every switch is only changed on purpose. The matched switches
+        are updated with one statement filtered like the index, and
+        revalidated in the background when asked for or when their
+        credentials change. Returns the number of switches updated and
+        the ids of their validation jobs.
+        """
+        context = request.context
+        self._check_admin(context)
+        body = validators.validate_request(request)
+        key_list = ['filters', 'port_provisioning', 'credentials',
+                    'validate', 'all']
+        validators.validate_attributes(body.keys(), key_list)
+        filters = body.get('filters', {})
+        if not isinstance(filters, dict):
+            raise webob.exc.HTTPBadRequest(
+                _("filters must be a dict of switch attributes"))
+        if not filters and body.get('all') is not True:
+            raise webob.exc.HTTPBadRequest(
+                _("filters must not be empty unless all is true"))
+        for key, value in filters.items():
+            self._check_filter(key, value)
+        values = {}
+        if body.get('port_provisioning'):
+            port_prov = body['port_provisioning'].upper()
+            if port_prov not in const.PORT_PROVISIONING_STATUS.values():
+                raise webob.exc.HTTPBadRequest(
+                    _("Invalid port-provisioning option %s ") %
+                    body['port_provisioning'])
+            values['port_provisioning'] = port_prov
+        validate = body.get('credentials') or body.get('validate')
+        if not values and not validate:
+            raise webob.exc.HTTPBadRequest(
+                _("No attribute to update given"))
+        switch_ids = []
+        with context.session.begin(subtransactions=True):
+            access = db.get_bnp_phys_switch_access(context, **filters)
+            if body.get('credentials'):
+                protocols = set(protocol for protocol, creds in access)
+                if len(protocols) > 1:
+                    raise webob.exc.HTTPBadRequest(
+                        _("Switches to update have several "
+                          "management_protocols: %s") %
+                        ', '.join(sorted(protocols)))
+                if protocols:
+                    access_parameters = get_access_param(
+                        context, protocols.pop(), body['credentials'])
+                    values['credentials'] = access_parameters['id']
+            elif validate:
+                for protocol, creds in access:
+                    self._get_switch_access_param(
+                        context, {'management_protocol': protocol,
+                                  'credentials': creds})
+            if validate:
+                values['validation_result'] = const.VALIDATION_PENDING
+                # read first, the update may change the filtered columns
+                switch_ids = [switch['id'] for switch in
+                              db.get_all_bnp_phys_switches(
+                                  context, fields=['id'], **filters)]
+            updated = db.update_bnp_phys_switches(context, values,
+                                                  **filters)
+        job_ids = self._start_validation(context, switch_ids)
+        return {'updated': updated, 'validation_jobs': job_ids}
+
+    def _check_filter(self, key, value):
+        """Check a bulk update filter matches a column with strings."""
+        if key not in SWITCH_COLUMNS:
+            raise webob.exc.HTTPBadRequest(
+                _("%s is invalid attribute for filters") % key)
+        items = value if isinstance(value, list) else [value]
+        if not items or not all(isinstance(item, six.string_types)
+                                for item in items):
+            raise webob.exc.HTTPBadRequest(
+                _("Filter %s must be a string or a non empty list of "
+                  "strings") % key)
+
     def _protocol_driver(self, switch):
         vendor = switch['vendor']
         protocol = switch['management_protocol']
@@ -358,10 +759,14 @@ class Bnp_switch(extensions.ExtensionDescriptor):
 
     def get_resources(self):
         exts = []
-        controller = resource.Resource(BNPSwitchController(),
-                                       base.FAULT_MAP)
+        controller = etag.ETagResource(
+            resource.Resource(BNPSwitchController(), base.FAULT_MAP),
+            [const.BNP_SWITCHES_GENERATION])
         exts.append(extensions.ResourceExtension(
-            'bnp-switches', controller))
+            'bnp-switches', controller,
+            collection_actions={'bulk_update': 'PUT'},
+            member_actions={'validation': 'GET', 'health': 'GET',
+                            'ports': 'GET', 'resync': 'PUT'}))
         return exts
 
     def get_extended_resources(self, version):
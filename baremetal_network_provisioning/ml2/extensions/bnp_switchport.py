@@ -13,6 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
+
+import sqlalchemy as sa
 import webob.exc
 
 from neutron.api import extensions
@@ -21,9 +24,24 @@ from neutron.api.v2 import resource
 from neutron import wsgi
 
 from baremetal_network_provisioning.common import constants as const
+from baremetal_network_provisioning.common import etag
+from baremetal_network_provisioning.common import streaming
 from baremetal_network_provisioning.db import bm_nw_provision_db as db
 from baremetal_network_provisioning.db import bm_nw_provision_models as models
 
+FILTER_COLUMNS = {
+    'switch_name': models.BNPPhysicalSwitch.name,
+    'neutron_port_id': models.BNPSwitchPortMapping.neutron_port_id,
+    'switch_port_name': models.BNPSwitchPortMapping.switch_port_name,
+    'segmentation_id': models.BNPNeutronPort.segmentation_id,
+    'lag_id': models.BNPNeutronPort.lag_id,
+    'bind_status': models.BNPNeutronPort.bind_status,
+    'access_type': models.BNPNeutronPort.access_type,
+}
+RANGE_FILTERS = ('segmentation_id',)
+PREFIX_FILTERS = ('switch_name', 'neutron_port_id', 'switch_port_name',
+                  'lag_id', 'access_type')
+
 RESOURCE_ATTRIBUTE_MAP = {
     'bnp-switch-ports': {
         'switch_name': {'allow_post': False, 'allow_put': False,
@@ -51,54 +69,95 @@ class BNPSwitchPortController(wsgi.Controller):
 
     def index(self, request, **kwargs):
         context = request.context
-        req_dict = dict(request.GET)
-        filter_dict = self.get_filter_dict(**req_dict)
-        port_maps = db.get_all_bnp_switch_port_maps(context, filter_dict)
-        port_list = []
-        for port_map in port_maps:
-            if (port_map[5] == 0):
-                bind_val = const.BIND_SUCCESS
-            else:
-                bind_val = const.BIND_FAILURE
-            port_dict = {'neutron_port_id': port_map[0],
-                         'switch_port_name': port_map[1],
-                         'lag_id': port_map[2],
-                         'segmentation_id': str(port_map[3]),
-                         'access_type': port_map[4],
-                         'bind_status': bind_val,
-                         'switch_name': port_map[6]}
-            port_list.append(port_dict)
+        filters = self.get_filters(request.GET.items())
+        port_maps = db.get_all_bnp_switch_port_maps(context, filters)
+        port_list = [self._port_map_to_show(port_map)
+                     for port_map in port_maps]
         return {'bnp_switch_ports': port_list}
 
-    def get_filter_dict(self, **args):
-        switchportmap = models.BNPSwitchPortMapping
-        neutronport = models.BNPNeutronPort
-        physwitch = models.BNPPhysicalSwitch
-        filter_dict = {}
-        for key in args:
-            val = args[key]
-            if key == 'switch_name':
-                field = physwitch.name
-            elif key == 'neutron_port_id':
-                field = switchportmap.neutron_port_id
-            elif key == 'switch_port_name':
-                field = switchportmap.switch_port_name
-            elif key == 'segmentation_id':
-                field = neutronport.segmentation_id
-            elif key == 'lag_id':
-                field = neutronport.lag_id
-            elif key == 'bind_status':
-                field = neutronport.bind_status
-                if val == 'bind_success':
-                    val = '0'
+    def iter_index(self, request):
+        """Return the collection name and an iterator over its items.
+
+        The filters are checked before returning, the rows are read
+        while the iterator is consumed.
+        """
+        context = request.context
+        filters = self.get_filters(request.GET.items())
+        port_maps = db.iter_bnp_switch_port_maps(context, filters)
+        return 'bnp_switch_ports', itertools.imap(self._port_map_to_show,
+                                                  port_maps)
+
+    def _port_map_to_show(self, port_map):
+        if (port_map[5] == 0):
+            bind_val = const.BIND_SUCCESS
+        else:
+            bind_val = const.BIND_FAILURE
+        return {'neutron_port_id': port_map[0],
+                'switch_port_name': port_map[1],
+                'lag_id': port_map[2],
+                'segmentation_id': str(port_map[3]),
+                'access_type': port_map[4],
+                'bind_status': bind_val,
+                'switch_name': port_map[6]}
+
+    def get_filters(self, params):
+        """Compile query parameters into SQL filter clauses.
+
+        The values of a parameter, repeated or comma separated, match
+        any of them and the parameters must all match. A value ending
+        with '*' matches a prefix of the string fields and a 'lo-hi'
+        segmentation_id value matches a range.
+        """
+        values = {}
+        for key, value in params:
+            if key == 'fields':
+                continue
+            if key not in FILTER_COLUMNS:
+                raise webob.exc.HTTPBadRequest(
+                    _("Invalid field value %s") % key)
+            values.setdefault(key, []).extend(
+                val.strip() for val in value.split(',') if val.strip())
+        filters = []
+        for key, key_values in values.items():
+            column = FILTER_COLUMNS[key]
+            equals = []
+            clauses = []
+            for val in key_values:
+                if key == 'bind_status':
+                    equals.append(val != const.BIND_SUCCESS)
+                elif key in RANGE_FILTERS:
+                    bounds = self._get_range(key, val)
+                    if len(bounds) == 1:
+                        equals.append(bounds[0])
+                    else:
+                        clauses.append(column.between(*bounds))
+                elif key in PREFIX_FILTERS and val.endswith('*'):
+                    prefix = val[:-1]
+                    for char in ('\\', '%', '_'):
+                        prefix = prefix.replace(char, '\\' + char)
+                    clauses.append(column.like(prefix + '%', escape='\\'))
                 else:
-                    val = '1'
-            elif key == 'access_type':
-                field = neutronport.access_type
-            else:
-                raise webob.exc.HTTPBadRequest(_("Invalid field value"))
-            filter_dict[field] = val
-        return filter_dict
+                    equals.append(val)
+            if len(equals) == 1:
+                clauses.append(column == equals[0])
+            elif equals:
+                clauses.append(column.in_(equals))
+            if clauses:
+                filters.append(sa.or_(*clauses))
+        return filters
+
+    def _get_range(self, key, value):
+        try:
+            bounds = [int(bound) for bound in value.split('-', 1)]
+        except ValueError:
+            raise webob.exc.HTTPBadRequest(
+                _("Invalid %(key)s value %(value)s") %
+                {'key': key, 'value': value})
+        if len(bounds) == 2 and bounds[0] > bounds[1]:
+            raise webob.exc.HTTPBadRequest(
+                _("Invalid %(key)s range %(value)s") %
+                {'key': key, 'value': value})
+        return bounds
 
     def create(self, request, **kwargs):
         raise webob.exc.HTTPBadRequest(
@@ -141,8 +200,13 @@ class Bnp_switchport(extensions.ExtensionDescriptor):
 
     def get_resources(self):
         exts = []
-        controller = resource.Resource(BNPSwitchPortController(),
-                                       base.FAULT_MAP)
+        port_controller = BNPSwitchPortController()
+        controller = etag.ETagResource(
+            streaming.StreamingIndexResource(
+                resource.Resource(port_controller, base.FAULT_MAP),
+                port_controller),
+            [const.BNP_SWITCH_PORTS_GENERATION,
+             const.BNP_SWITCHES_GENERATION])
         exts.append(extensions.ResourceExtension(
             'bnp-switch-ports', controller))
         return exts
@@ -13,6 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+import time
+
+import eventlet
 import webob.exc as wexc
 
 from neutron.api.v2 import base
@@ -21,17 +25,23 @@ from neutron import context as neutron_context
 
 from oslo_config import cfg
 from oslo_log import log as logging
-from oslo_utils import uuidutils
+from oslo_service import loopingcall
+from oslo_utils import timeutils
 
 from neutron._i18n import _LE
 from neutron._i18n import _LI
+from neutron._i18n import _LW
 from neutron.common import constants as n_const
 from neutron.extensions import portbindings
 from neutron.plugins.common import constants
 from neutron.plugins.ml2.common import exceptions as ml2_exc
 from neutron.plugins.ml2 import driver_api as api
+from neutron import worker as neutron_worker
 
 from baremetal_network_provisioning.common import constants as hp_const
+from baremetal_network_provisioning.common import metrics
+from baremetal_network_provisioning.common import snmp_client
+from baremetal_network_provisioning.db import bm_nw_provision_cache as cache
 from baremetal_network_provisioning.db import bm_nw_provision_db as db
 from baremetal_network_provisioning import managers
 from baremetal_network_provisioning.ml2.extensions import bnp_switch as bnp_sw
@@ -44,6 +54,74 @@ driver_opts = [
                '.snmp_provisioning_driver.SNMPProvisioningDriver',
                help=_("Driver to provision networks on the switches in"
                       "the cloud fabric")),
+    cfg.FloatOpt('slow_bind_threshold',
+                 default=5.0,
+                 help=_("Duration in seconds above which a port bind, create "
+                        "or delete logs a warning with the time spent in "
+                        "each phase. 0 disables the warning.")),
+    cfg.IntOpt('orphan_purge_interval',
+               default=3600,
+               help=_("Interval in seconds between two purges of the switch "
+                      "port mappings left by neutron ports deleted outside "
+                      "of the mechanism driver. 0 disables the purge.")),
+    cfg.IntOpt('orphan_purge_batch_size',
+               default=500,
+               help=_("Number of orphan switch port mappings removed per "
+                      "transaction by the purge.")),
+    cfg.BoolOpt('orphan_purge_reconcile',
+                default=False,
+                help=_("Remove the switch ports of the purged mappings from "
+                       "the egress ports of their VLAN.")),
+    cfg.IntOpt('switch_validation_workers',
+               default=20,
+               help=_("Maximum number of switches validated concurrently "
+                      "against their device after a bulk import.")),
+    cfg.IntOpt('validation_job_timeout',
+               default=300,
+               help=_("Duration in seconds after which a switch validation "
+                      "job still pending or running is considered abandoned "
+                      "by its worker and is restarted. 0 disables the "
+                      "restart.")),
+    cfg.IntOpt('validation_job_retention',
+               default=86400,
+               help=_("Duration in seconds after which a finished switch "
+                      "validation job is removed by the purge of the "
+                      "orphan port maps. The latest job of each switch is "
+                      "kept. 0 keeps every job.")),
+    cfg.IntOpt('health_poll_interval',
+               default=60,
+               help=_("Interval in seconds between two health polls of "
+                      "the switches. 0 disables the polling.")),
+    cfg.IntOpt('health_poll_workers',
+               default=20,
+               help=_("Maximum number of switches polled concurrently.")),
+    cfg.IntOpt('health_circuit_threshold',
+               default=3,
+               help=_("Number of consecutive failed polls after which a "
+                      "switch is no longer polled.")),
+    cfg.IntOpt('health_circuit_reset',
+               default=300,
+               help=_("Duration in seconds after which a switch that is no "
+                      "longer polled is probed again.")),
+    cfg.IntOpt('switch_ports_max_age',
+               default=3600,
+               help=_("Age in seconds after which the physical ports walked "
+                      "on a port bind are stored again when they did not "
+                      "change, to refresh their walk time. Changed ports "
+                      "are always stored.")),
+    cfg.IntOpt('stream_timeout',
+               default=600,
+               help=_("Duration in seconds after which the streamed list of "
+                      "the switch port mappings is aborted, releasing the "
+                      "database connection held by a slow client. 0 "
+                      "disables the limit.")),
+    cfg.FloatOpt('cache_generation_ttl',
+                 default=1.0,
+                 help=_("Duration in seconds during which the switch and "
+                        "credential caches of a worker are served without "
+                        "checking their generation in the database. Writes "
+                        "made by other workers may be missed for that "
+                        "long. 0 checks it on every lookup.")),
 ]
 cfg.CONF.register_opts(driver_opts, "ml2_hpe")
 param_opts = [
@@ -53,10 +131,53 @@ param_opts = [
     cfg.IntOpt('snmp_timeout',
                default=3,
                help=_("Timeout in seconds to wait for SNMP request"
-                      "completion."))]
+                      "completion.")),
+    cfg.IntOpt('snmp_thread_pool_size',
+               default=20,
+               help=_("Number of native threads running blocking SNMP "
+                      "requests, requests beyond it wait for a free "
+                      "thread. This sizes the eventlet thread pool of the "
+                      "whole neutron-server process, shared with any "
+                      "other user of it."))]
 cfg.CONF.register_opts(param_opts, "default")
 
 
+class BNPPeriodicWorker(neutron_worker.NeutronWorker):
+
+    """Neutron worker running the periodic tasks of the mechanism driver.
+
+    Neutron starts the workers of the plugin in their own process, so the
+    tasks run once per server instead of once per API worker.
+    """
+
+    def __init__(self):
+        super(BNPPeriodicWorker, self).__init__()
+        self.tasks = []
+        self._loops = []
+
+    def add_task(self, task, interval, initial_delay=None):
+        self.tasks.append((task, interval, initial_delay))
+
+    def start(self):
+        super(BNPPeriodicWorker, self).start()
+        for task, interval, initial_delay in self.tasks:
+            loop = loopingcall.FixedIntervalLoopingCall(task)
+            loop.start(interval=interval, initial_delay=initial_delay)
+            self._loops.append(loop)
+
+    def stop(self):
+        for loop in self._loops:
+            loop.stop()
+
+    def wait(self):
+        for loop in self._loops:
+            loop.wait()
+        self._loops = []
+
+    def reset(self):
+        pass
+
+
 class HPEMechanismDriver(api.MechanismDriver):
 
     """Ml2 Mechanism front-end driver interface for bare
@@ -68,6 +189,24 @@ class HPEMechanismDriver(api.MechanismDriver):
         self.vif_type = hp_const.HP_VIF_TYPE
         self.vif_details = {portbindings.CAP_PORT_FILTER: True}
         self.prov_manager = managers.ProvisioningManager()
+        snmp_client.set_thread_pool_size(
+            cfg.CONF.default.snmp_thread_pool_size)
+
+    def get_workers(self):
+        """Run the periodic tasks in a single dedicated neutron worker."""
+        worker = BNPPeriodicWorker()
+        interval = cfg.CONF.ml2_hpe.orphan_purge_interval
+        if interval > 0:
+            worker.add_task(self._purge_orphan_port_maps, interval,
+                            initial_delay=interval)
+        interval = cfg.CONF.ml2_hpe.validation_job_timeout
+        if interval > 0:
+            worker.add_task(self._run_stale_validation_jobs, interval,
+                            initial_delay=interval)
+        interval = cfg.CONF.ml2_hpe.health_poll_interval
+        if interval > 0:
+            worker.add_task(self._poll_switch_health, interval)
+        return [worker] if worker.tasks else []
 
     def create_port_precommit(self, context):
         """create_port_precommit."""
@@ -106,6 +245,25 @@ class HPEMechanismDriver(api.MechanismDriver):
     def delete_port_postcommit(self, context):
         pass
 
+    def delete_network_precommit(self, context):
+        pass
+
+    def delete_network_postcommit(self, context):
+        """Unbind the ports the deleted network left on its vlans.
+
+        ML2 deletes the ports of a network before the network itself, so
+        their mappings are normally gone already. Ports deleted outside
+        of the driver leave their mappings, and their switch ports stay
+        members of the vlan, which another network may reuse. These are
+        removed with one egress update per switch and vlan.
+        """
+        segmentation_ids = [segment[api.SEGMENTATION_ID]
+                            for segment in context.network_segments or []
+                            if self._is_vlan_segment(segment, context)]
+        if segmentation_ids:
+            self.unbind_network(segmentation_ids)
+
+    @metrics.timed('bind_port')
     def bind_port(self, context):
         """bind_port for claiming the ironic port."""
         LOG.debug("HPMechanismDriver Attempting to bind port %(port)s on "
@@ -212,44 +370,47 @@ class HPEMechanismDriver(api.MechanismDriver):
             return False
         return True
 
+    @metrics.timed('create_port')
     def _create_port(self, port):
         switchports = port['port']['switchports']
         LOG.debug(_LE("_create_port switch: %s"), port)
         network_id = port['port']['network_id']
         db_context = neutron_context.get_admin_context()
         subnets = db.get_subnets_by_network(db_context, network_id)
+        metrics.lap('db_lookup')
         if not subnets:
             LOG.error(_LE("Subnet not found for the network"))
             self._raise_ml2_error(wexc.HTTPNotFound, 'create_port')
         for switchport in switchports:
             switch_mac_id = switchport['switch_id']
-            bnp_switch = db.get_bnp_phys_switch_by_mac(db_context,
-                                                       switch_mac_id)
+            bnp_switch = cache.get_switch_by_mac(db_context, switch_mac_id)
+            metrics.lap('db_lookup')
             # check for port and switch level existence
             if not bnp_switch:
                 LOG.error(_LE("No physical switch found '%s' "), switch_mac_id)
                 self._raise_ml2_error(wexc.HTTPNotFound, 'create_port')
             self.sw_obj = bnp_sw.BNPSwitchController()
-            mgmt_proto = bnp_switch['management_protocol']
-            creds = bnp_switch['credentials']
-            access_parameters = self.sw_obj._get_access_param(db_context,
-                                                              mgmt_proto,
-                                                              creds)
+            access_parameters = self.sw_obj._get_switch_access_param(
+                db_context, bnp_switch)
+            metrics.lap('credentials')
+            switch_dict = dict(bnp_switch)
             for key, value in access_parameters.iteritems():
                 if key == hp_const.NAME:
                     continue
-                bnp_switch[key] = value
-            driver_key = self.sw_obj._protocol_driver(bnp_switch)
+                switch_dict[key] = value
+            driver_key = self.sw_obj._protocol_driver(switch_dict)
             try:
                 if driver_key:
                     dr_obj = driver_key.obj
-                    mac_val = dr_obj.get_protocol_validation_result(bnp_switch)
+                    mac_val = dr_obj.get_protocol_validation_result(
+                        switch_dict)
                     if mac_val != bnp_switch['mac_address']:
                         self._raise_ml2_error(wexc.HTTPBadRequest,
                                               'Invalid mac address')
             except Exception as e:
                 LOG.error(e)
                 self._raise_ml2_error(wexc.HTTPBadRequest, 'create_port')
+            metrics.lap('validation')
             port_provisioning_db = bnp_switch.port_provisioning
             if (port_provisioning_db !=
                     hp_const.PORT_PROVISIONING_STATUS['enable']):
@@ -264,14 +425,16 @@ class HPEMechanismDriver(api.MechanismDriver):
         switchports = port['port']['switchports']
         for switchport in switchports:
             switch_id = switchport['switch_id']
-            bnp_switch = db.get_bnp_phys_switch_by_mac(db_context,
-                                                       switch_id)
+            bnp_switch = cache.get_switch_by_mac(db_context, switch_id)
+            metrics.lap('db_lookup')
             port_name = switchport['port_id']
             if not bnp_switch:
                 self._raise_ml2_error(wexc.HTTPNotFound, 'create_port')
             credentials_dict = port.get('port')
-            cred_dict = self._get_credentials_dict(bnp_switch, 'create_port')
+            cred_dict = self._get_credentials_dict(db_context, bnp_switch,
+                                                   'create_port')
             credentials_dict['credentials'] = cred_dict
+            metrics.lap('credentials')
             try:
                 prov_protocol = bnp_switch.management_protocol
                 vendor = bnp_switch.vendor
@@ -283,13 +446,17 @@ class HPEMechanismDriver(api.MechanismDriver):
                                   ))
                     self._raise_ml2_error(wexc.HTTPNotFound, 'create_port')
                 port_list = prov_driver.obj.get_device_info(port)
+                metrics.lap('get_device_info')
+                if port_list:
+                    cache.set_switch_ports(
+                        db_context, bnp_switch.id, port_list,
+                        cfg.CONF.ml2_hpe.switch_ports_max_age)
                 ifindex = self._get_if_index(port_list, port_name)
                 switchport['ifindex'] = ifindex
                 if not port_list:
                     LOG.error(_LE("No physical port found for '%s' "),
                               switch_id)
                     self._raise_ml2_error(wexc.HTTPNotFound, 'create_port')
-                prov_driver.obj.set_isolation(port)
                 port_id = port['port']['id']
                 segmentation_id = port['port']['segmentation_id']
                 mapping_dict = {'neutron_port_id': port_id,
@@ -301,15 +468,16 @@ class HPEMechanismDriver(api.MechanismDriver):
                                 'bind_status': 0,
                                 'ifindex': ifindex
                                 }
-                db.add_bnp_switch_port_map(db_context, mapping_dict)
-                db.add_bnp_neutron_port(db_context, mapping_dict)
-                if bnp_switch.validation_result != hp_const.SUCCESS:
-                    db.update_bnp_phys_switch_result_status(db_context,
-                                                            bnp_switch.id,
-                                                            hp_const.SUCCESS)
+                self._update_vlan_egress(
+                    db_context, prov_driver, 'set_isolation', port,
+                    bnp_switch.id, int(segmentation_id),
+                    functools.partial(db.record_binding, db_context,
+                                      mapping_dict))
+                metrics.record_outcome('bind', bnp_switch.id, True)
                 return hp_const.BIND_SUCCESS
             except Exception as e:
                 LOG.error(_LE("Exception in configuring VLAN '%s' "), e)
+                metrics.record_outcome('bind', bnp_switch.id, False)
                 return hp_const.BIND_FAILURE
 
     def update_port(self, port):
@@ -324,6 +492,7 @@ class HPEMechanismDriver(api.MechanismDriver):
             # value will be supplied.
             self._create_port(port)
 
+    @metrics.timed('delete_port')
     def delete_port(self, port_id):
         """delete_port ."""
         db_context = neutron_context.get_admin_context()
@@ -335,14 +504,19 @@ class HPEMechanismDriver(api.MechanismDriver):
         is_last_port_in_vlan = False
         seg_id = port_map.segmentation_id
         bnp_sw_map = db.get_bnp_switch_port_mappings(db_context, port_id)
-        bnp_switch = db.get_bnp_phys_switch(db_context,
+        bnp_switch = cache.get_switch_by_id(db_context,
                                             bnp_sw_map[0].switch_id)
-        cred_dict = self._get_credentials_dict(bnp_switch, 'delete_port')
-        result = db.get_bnp_neutron_port_by_seg_id(db_context, seg_id)
-        if not result:
-            LOG.error(_LE("No neutron port is associated with the phys port"))
-            self._raise_ml2_error(wexc.HTTPNotFound, 'delete_port')
-        if len(result) == 1:
+        port_count = db.get_bnp_vlan_port_count(db_context, bnp_switch.id,
+                                                seg_id)
+        metrics.lap('db_lookup')
+        cred_dict = self._get_credentials_dict(db_context, bnp_switch,
+                                               'delete_port')
+        metrics.lap('credentials')
+        if not port_count:
+            LOG.warning(_LW("No port count recorded for VLAN %(seg_id)s on "
+                            "switch %(switch)s"),
+                        {'seg_id': seg_id, 'switch': bnp_switch.id})
+        if port_count <= 1:
             # to prevent snmp set from the same VLAN
             is_last_port_in_vlan = True
         port_dict = {'port':
@@ -364,12 +538,301 @@ class HPEMechanismDriver(api.MechanismDriver):
                 LOG.error(_LE("No suitable provisioning driver found"
                               ))
                 self._raise_ml2_error(wexc.HTTPNotFound, 'create_port')
-            prov_driver.obj.delete_isolation(port_dict)
-            db.delete_bnp_neutron_port(db_context, port_id)
-            db.delete_bnp_switch_port_mappings(db_context, port_id)
+            self._update_vlan_egress(
+                db_context, prov_driver, 'delete_isolation', port_dict,
+                bnp_switch.id, seg_id,
+                functools.partial(self._remove_port_maps, db_context,
+                                  bnp_switch.id, seg_id, [port_id]))
         except Exception as e:
             LOG.error(_LE("Error in deleting the port '%s' "), e)
+            metrics.record_outcome('unbind', bnp_switch.id, False)
             self._raise_ml2_error(wexc.HTTPNotFound, 'delete_port')
+        metrics.record_outcome('unbind', bnp_switch.id, True)
+
+    def unbind_network(self, segmentation_ids):
+        """Unbind the ports left without neutron port on the given vlans."""
+        db_context = neutron_context.get_admin_context()
+        port_maps = db.get_orphan_bnp_port_maps(db_context, None,
+                                                segmentation_ids)
+        if port_maps:
+            self._unbind_port_maps(db_context, port_maps, 'delete_network')
+
+    def _unbind_port_maps(self, db_context, port_maps, func_name):
+        """Remove port maps with one egress update per switch and vlan."""
+        vlan_ports = {}
+        for port_map in port_maps:
+            key = (port_map.switch_id, port_map.segmentation_id)
+            vlan_ports.setdefault(key, []).append(port_map)
+        switch_ids = set(switch_id for switch_id, seg_id in vlan_ports)
+        switches = dict((switch.id, switch) for switch in
+                        db.get_bnp_phys_switches_by_ids(db_context,
+                                                        switch_ids))
+        failed = False
+        for (switch_id, seg_id), vlan_port_maps in vlan_ports.items():
+            bnp_switch = switches.get(switch_id)
+            port_ids = [port_map.neutron_port_id
+                        for port_map in vlan_port_maps]
+            remove_port_maps = functools.partial(self._remove_port_maps,
+                                                 db_context, switch_id,
+                                                 seg_id, port_ids)
+            if not bnp_switch:
+                # the switch is gone, only the mappings are left to remove
+                remove_port_maps()
+                continue
+            port_dict = {'port':
+                         {'segmentation_id': seg_id,
+                          'del_ifindexes': [port_map.ifindex
+                                            for port_map in vlan_port_maps],
+                          'credentials': self._get_credentials_dict(
+                              db_context, bnp_switch, func_name)
+                          }
+                         }
+            prov_driver = self._provisioning_driver(
+                bnp_switch.management_protocol, bnp_switch.vendor,
+                bnp_switch.family)
+            try:
+                if not prov_driver:
+                    raise ml2_exc.MechanismDriverError(method=func_name)
+                self._update_vlan_egress(db_context, prov_driver,
+                                         'update_isolation', port_dict,
+                                         switch_id, seg_id, remove_port_maps)
+            except Exception as e:
+                LOG.error(_LE("Error in removing ports %(ports)s from VLAN "
+                              "%(seg_id)s on switch %(switch)s: %(err)s"),
+                          {'ports': port_ids, 'seg_id': seg_id,
+                           'switch': switch_id, 'err': e})
+                metrics.record_outcome('unbind', switch_id, False,
+                                       len(port_ids))
+                failed = True
+            else:
+                metrics.record_outcome('unbind', switch_id, True,
+                                       len(port_ids))
+        if failed:
+            self._raise_ml2_error(wexc.HTTPNotFound, func_name)
+
+    def _purge_orphan_port_maps(self):
+        try:
+            self.purge_orphan_port_maps()
+        except Exception as e:
+            # keep the looping call alive for the next purge
+            LOG.error(_LE("Error in purging orphan port maps: %s"), e)
+        try:
+            self.purge_validation_jobs()
+        except Exception as e:
+            LOG.error(_LE("Error in purging validation jobs: %s"), e)
+
+    def purge_validation_jobs(self):
+        """Remove the validation jobs finished before their retention.
+
+        Jobs are removed in batches of orphan_purge_batch_size, each in
+        its own transaction.
+        """
+        retention = cfg.CONF.ml2_hpe.validation_job_retention
+        if retention <= 0:
+            return
+        db_context = neutron_context.get_admin_context()
+        batch_size = cfg.CONF.ml2_hpe.orphan_purge_batch_size
+        purged = 0
+        while True:
+            deleted = db.delete_finished_bnp_validation_jobs(
+                db_context, retention, batch_size)
+            purged += deleted
+            if deleted < batch_size:
+                break
+        if purged:
+            LOG.info(_LI("Purged %s finished validation jobs"), purged)
+
+    def purge_orphan_port_maps(self):
+        """Remove the port maps of neutron ports that no longer exist.
+
+        Orphans are removed in batches of orphan_purge_batch_size, each in
+        its own transaction. With orphan_purge_reconcile their switch ports
+        are also removed from the egress ports of the vlan.
+        """
+        db_context = neutron_context.get_admin_context()
+        batch_size = cfg.CONF.ml2_hpe.orphan_purge_batch_size
+        reconcile = cfg.CONF.ml2_hpe.orphan_purge_reconcile
+        purged = 0
+        while True:
+            port_maps = db.get_orphan_bnp_port_maps(db_context, batch_size)
+            if not port_maps:
+                break
+            # mappings without a neutron port were never bound to a vlan
+            unbound_ids = [port_map.neutron_port_id for port_map in port_maps
+                           if port_map.segmentation_id is None]
+            bound_maps = [port_map for port_map in port_maps
+                          if port_map.segmentation_id is not None]
+            if unbound_ids:
+                db.delete_bnp_port_maps(db_context, unbound_ids)
+            if reconcile:
+                try:
+                    self._unbind_port_maps(db_context, bound_maps,
+                                           'purge_orphan_port_maps')
+                except ml2_exc.MechanismDriverError:
+                    # the failed mappings would come back in every batch
+                    LOG.warning(_LW("Stopping the purge of orphan port maps "
+                                    "after %s removals"),
+                                purged + len(port_maps))
+                    return
+            else:
+                vlan_ports = {}
+                for port_map in bound_maps:
+                    key = (port_map.switch_id, port_map.segmentation_id)
+                    vlan_ports.setdefault(key, []).append(
+                        port_map.neutron_port_id)
+                with db_context.session.begin(subtransactions=True):
+                    for (switch_id, seg_id), port_ids in vlan_ports.items():
+                        self._remove_port_maps(db_context, switch_id, seg_id,
+                                               port_ids)
+            if unbound_ids or not reconcile:
+                db.bump_bnp_generation(db_context,
+                                       hp_const.BNP_SWITCH_PORTS_GENERATION)
+            purged += len(port_maps)
+        if purged:
+            LOG.info(_LI("Purged %s orphan port maps"), purged)
+
+    def _run_stale_validation_jobs(self):
+        try:
+            bnp_sw.BNPSwitchController().run_stale_validation_jobs()
+        except Exception as e:
+            # keep the looping call alive for the next run
+            LOG.error(_LE("Error in restarting validation jobs: %s"), e)
+
+    def _poll_switch_health(self):
+        try:
+            self.poll_switch_health()
+        except Exception as e:
+            # keep the looping call alive for the next poll
+            LOG.error(_LE("Error in polling the switch health: %s"), e)
+
+    def poll_switch_health(self):
+        """Refresh the health of every switch from its device."""
+        db_context = neutron_context.get_admin_context()
+        health = db.get_all_bnp_switch_health(db_context)
+        pool = eventlet.GreenPool(cfg.CONF.ml2_hpe.health_poll_workers)
+        for bnp_switch in db.get_all_bnp_phys_switches(db_context):
+            pool.spawn_n(self.poll_switch, cache.SwitchSnapshot(bnp_switch),
+                         health.get(bnp_switch.id))
+        pool.waitall()
+
+    def poll_switch(self, bnp_switch, health):
+        """Poll a switch and record its health.
+
+        After health_circuit_threshold consecutive failures the circuit of
+        the switch opens and it is left alone for health_circuit_reset
+        seconds, then a single probe closes the circuit again or reopens
+        it.
+        """
+        conf = cfg.CONF.ml2_hpe
+        circuit = health.circuit_state if health else hp_const.CIRCUIT_CLOSED
+        failures = health.consecutive_failures if health else 0
+        if circuit == hp_const.CIRCUIT_OPEN:
+            if not timeutils.is_older_than(health.last_poll_at,
+                                           conf.health_circuit_reset):
+                return
+            circuit = hp_const.CIRCUIT_HALF_OPEN
+        db_context = neutron_context.get_admin_context()
+        values = {'last_poll_at': timeutils.utcnow()}
+        error = None
+        try:
+            creds_dict = self._get_credentials_dict(db_context, bnp_switch,
+                                                    'poll_switch')
+        except ml2_exc.MechanismDriverError:
+            creds_dict = None
+        prov_driver = self._provisioning_driver(
+            bnp_switch.management_protocol, bnp_switch.vendor,
+            bnp_switch.family)
+        if not creds_dict:
+            error = hp_const.NO_CREDENTIALS_FOUND
+        elif not prov_driver:
+            error = hp_const.NO_DRVR_FOUND
+        else:
+            # only the probe is timed
+            start = time.time()
+            try:
+                if not prov_driver.obj.get_protocol_validation_result(
+                        creds_dict):
+                    error = hp_const.DEVICE_NOT_REACHABLE
+            except Exception as e:
+                error = str(e) or hp_const.DEVICE_NOT_REACHABLE
+            rtt = time.time() - start
+        if error:
+            failures += 1
+            if (circuit == hp_const.CIRCUIT_HALF_OPEN or
+                    failures >= conf.health_circuit_threshold):
+                circuit = hp_const.CIRCUIT_OPEN
+            values.update({'reachable': False,
+                           'consecutive_failures': failures,
+                           'error_count': (health.error_count
+                                           if health else 0) + 1,
+                           'last_error': error[:255]})
+        else:
+            circuit = hp_const.CIRCUIT_CLOSED
+            values.update({'reachable': True,
+                           'rtt': rtt,
+                           'last_success_at': values['last_poll_at'],
+                           'consecutive_failures': 0,
+                           'last_error': None})
+        values['circuit_state'] = circuit
+        db.update_bnp_switch_health(db_context, bnp_switch.id, values)
+
+    def _remove_port_maps(self, db_context, switch_id, seg_id, port_ids):
+        """Remove the mappings of ports of a vlan on a switch."""
+        with db_context.session.begin(subtransactions=True):
+            # the neutron ports go with their mappings, only the mappings
+            # deleted here are taken off the count
+            deleted = db.delete_bnp_port_maps(db_context, port_ids)
+            if deleted:
+                db.update_bnp_vlan_port_count(db_context, switch_id, seg_id,
+                                              -deleted)
+
+    def _update_vlan_egress(self, db_context, prov_driver, operation, port,
+                            switch_id, seg_id, record):
+        """Change the egress ports of a vlan starting from its stored bitmap.
+
+        The driver operation applies the change to the bitmap stored in
+        bnp_switch_vlans, or to the bitmap read on the switch when none is
+        stored yet, and writes it to the switch without reading it first.
+        No lock is held during the switch write. The new bitmap is stored,
+        in the same transaction as the DB changes made by record, only if
+        the row was not changed meanwhile. Otherwise the change is redone
+        from the newer row, which also rewrites the concurrent change the
+        switch write may have overwritten, and at the last retry from the
+        bitmap read on the switch. The generation of the switch port
+        mappings is bumped after that transaction is committed.
+        """
+        port_dict = port['port']
+        retries = hp_const.VLAN_EGRESS_RETRIES
+        for attempt in range(retries + 1):
+            vlan = db.get_bnp_switch_vlan(db_context, switch_id, seg_id)
+            version = vlan.version if vlan else 0
+            from_device = not version or attempt == retries
+            port_dict['egress_bitmap'] = (None if from_device
+                                          else vlan.egress_bitmap)
+            start = time.time()
+            egress_bitmap = getattr(prov_driver.obj, operation)(port)
+            metrics.lap(operation)
+            metrics.record_latency('snmp', switch_id, time.time() - start)
+            start = time.time()
+            with db_context.session.begin(subtransactions=True):
+                stored = (egress_bitmap is None or
+                          db.update_bnp_switch_vlan(db_context, switch_id,
+                                                    seg_id, egress_bitmap,
+                                                    version))
+                if stored:
+                    record()
+            if stored:
+                # bumped once committed, binds do not queue on its row
+                db.bump_bnp_generation(db_context,
+                                       hp_const.BNP_SWITCH_PORTS_GENERATION)
+                metrics.lap('db_write')
+                metrics.record_latency('db', switch_id, time.time() - start)
+                return
+            LOG.warning(_LW("VLAN %(seg_id)s of switch %(switch)s changed "
+                            "during %(operation)s, retrying"),
+                        {'seg_id': seg_id, 'switch': switch_id,
+                         'operation': operation})
+        raise ml2_exc.MechanismDriverError(method=operation)
 
     def _provisioning_driver(self, protocol, vendor, family):
         """Get the provisioning driver instance."""
@@ -398,44 +861,31 @@ class HPEMechanismDriver(api.MechanismDriver):
         base.FAULT_MAP.update({ml2_exc.MechanismDriverError: err_type})
         raise ml2_exc.MechanismDriverError(method=method_name)
 
-    def _get_credentials_dict(self, bnp_switch, func_name):
+    def _get_credentials_dict(self, db_context, bnp_switch, func_name):
         if not bnp_switch:
             self._raise_ml2_error(wexc.HTTPNotFound, func_name)
-        db_context = neutron_context.get_admin_context()
         creds_dict = {}
         creds_dict['ip_address'] = bnp_switch.ip_address
         prov_creds = bnp_switch.credentials
         prov_protocol = bnp_switch.management_protocol
+        cred = cache.get_credential_by_id(db_context, prov_protocol,
+                                          prov_creds)
+        if not cred:
+            LOG.error(_LE("Credentials does not match"))
+            self._raise_ml2_error(wexc.HTTPNotFound, '')
         if hp_const.PROTOCOL_SNMP in prov_protocol:
-            if not uuidutils.is_uuid_like(prov_creds):
-                snmp_cred = db.get_snmp_cred_by_name(db_context, prov_creds)
-                snmp_cred = snmp_cred[0]
-            else:
-                snmp_cred = db.get_snmp_cred_by_id(db_context, prov_creds)
-            if not snmp_cred:
-                LOG.error(_LE("Credentials does not match"))
-                self._raise_ml2_error(wexc.HTTPNotFound, '')
-            creds_dict['write_community'] = snmp_cred.write_community
-            creds_dict['security_name'] = snmp_cred.security_name
-            creds_dict['security_level'] = snmp_cred.security_level
-            creds_dict['auth_protocol'] = snmp_cred.auth_protocol
+            creds_dict['write_community'] = cred['write_community']
+            creds_dict['security_name'] = cred['security_name']
+            creds_dict['security_level'] = cred['security_level']
+            creds_dict['auth_protocol'] = cred['auth_protocol']
             creds_dict['management_protocol'] = prov_protocol
-            creds_dict['auth_key'] = snmp_cred.auth_key
-            creds_dict['priv_protocol'] = snmp_cred.priv_protocol
-            creds_dict['priv_key'] = snmp_cred.priv_key
+            creds_dict['auth_key'] = cred['auth_key']
+            creds_dict['priv_protocol'] = cred['priv_protocol']
+            creds_dict['priv_key'] = cred['priv_key']
         else:
-            if not uuidutils.is_uuid_like(prov_creds):
-                netconf_cred = db.get_netconf_cred_by_name(db_context,
-                                                           prov_creds)
-            else:
-                netconf_cred = db.get_netconf_cred_by_id(db_context,
-                                                         prov_creds)
-            if not netconf_cred:
-                LOG.error(_LE("Credentials does not match"))
-                self._raise_ml2_error(wexc.HTTPNotFound, '')
-            creds_dict['user_name'] = netconf_cred.write_community
-            creds_dict['password'] = netconf_cred.security_name
-            creds_dict['key_path'] = netconf_cred.security_level
+            creds_dict['user_name'] = cred['user_name']
+            creds_dict['password'] = cred['password']
+            creds_dict['key_path'] = cred['key_path']
         return creds_dict
 
     def _get_if_index(self, port_list, port_name):
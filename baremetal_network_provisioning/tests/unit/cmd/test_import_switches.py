@@ -0,0 +1,121 @@
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+
+from neutron import context
+from neutron.tests.unit import testlib_api
+
+from baremetal_network_provisioning.cmd import import_switches
+from baremetal_network_provisioning.common import constants as const
+from baremetal_network_provisioning.common import exceptions
+from baremetal_network_provisioning.db import bm_nw_provision_cache as cache
+from baremetal_network_provisioning.db import bm_nw_provision_db as db
+from baremetal_network_provisioning.ml2.extensions import bnp_switch
+
+
+class TestImportSwitches(testlib_api.SqlTestCase):
+
+    def setUp(self):
+        super(TestImportSwitches, self).setUp()
+        self.ctx = context.get_admin_context()
+        self.controller = mock.Mock()
+        cache.credentials.invalidate()
+        self.addCleanup(cache.credentials.invalidate)
+
+    def _get_inventory(self):
+        switches = [{'name': 'sw%d' % index,
+                     'ip_address': '10.0.0.%d' % index,
+                     'mac_address': '44:31:92:61:89:%02x' % index,
+                     'vendor': 'hpe',
+                     'management_protocol': 'snmpv2c',
+                     'credentials': 'creds1'} for index in range(3)]
+        return {'credentials': [{'name': 'creds1',
+                                 'protocol_type': 'snmpv2c',
+                                 'write_community': 'public'}],
+                'switches': switches}
+
+    def test_import_inventory(self):
+        with mock.patch.object(bnp_switch, 'get_access_param') as get_param:
+            switches = import_switches.import_inventory(
+                self.ctx, self._get_inventory())
+        self.assertFalse(get_param.called)
+        self.assertEqual(3, len(switches))
+        cred = db.get_snmp_cred_by_name(self.ctx, 'creds1')[0]
+        for switch in db.get_all_bnp_phys_switches(self.ctx):
+            self.assertEqual(cred['id'], switch['credentials'])
+            self.assertEqual('', switch['family'])
+            self.assertEqual(const.VALIDATION_PENDING,
+                             switch['validation_result'])
+        for switch in switches:
+            job = db.get_bnp_validation_job(self.ctx,
+                                            switch['validation_job'])
+            self.assertEqual(switch['id'], job['switch_id'])
+            self.assertEqual(const.JOB_PENDING, job['status'])
+
+    def test_import_inventory_existing_credentials(self):
+        import_switches.import_inventory(self.ctx, self._get_inventory())
+        cred = db.get_snmp_cred_by_name(self.ctx, 'creds1')[0]
+        inventory = self._get_inventory()
+        del inventory['credentials']
+        switch = inventory['switches'][0]
+        inventory['switches'] = [switch]
+        switch['ip_address'] = '10.0.1.1'
+        switch['mac_address'] = '44:31:92:61:8a:00'
+        switches = import_switches.import_inventory(self.ctx, inventory)
+        self.assertEqual(cred['id'], switches[0]['credentials'])
+        switch['credentials'] = 'creds2'
+        switch['ip_address'] = '10.0.1.2'
+        switch['mac_address'] = '44:31:92:61:8a:01'
+        self.assertRaises(exceptions.HPNetProvisioningConfigError,
+                          import_switches.import_inventory,
+                          self.ctx, inventory)
+
+    def test_import_inventory_duplicate_mac(self):
+        inventory = self._get_inventory()
+        inventory['switches'][2]['mac_address'] = '44:31:92:61:89:00'
+        self.assertRaises(exceptions.HPNetProvisioningConfigError,
+                          import_switches.import_inventory,
+                          self.ctx, inventory)
+        self.assertEqual([], db.get_all_bnp_phys_switches(self.ctx))
+        self.assertEqual([], db.get_all_snmp_creds(self.ctx))
+
+    def test_import_inventory_existing_ip(self):
+        import_switches.import_inventory(self.ctx, self._get_inventory())
+        inventory = self._get_inventory()
+        del inventory['credentials']
+        for switch in inventory['switches']:
+            switch['mac_address'] = switch['mac_address'].upper()
+        self.assertRaises(exceptions.HPNetProvisioningConfigError,
+                          import_switches.import_inventory,
+                          self.ctx, inventory)
+
+    def test_validate_switches(self):
+        switches = import_switches.import_inventory(self.ctx,
+                                                    self._get_inventory())
+
+        def run_validation_jobs(job_ids):
+            for job_id in job_ids:
+                db.finish_bnp_validation_job(self.ctx, job_id,
+                                             const.SUCCESS)
+
+        self.controller.run_validation_jobs.side_effect = run_validation_jobs
+        results = import_switches.validate_switches(self.ctx,
+                                                    self.controller,
+                                                    switches)
+        self.controller.run_validation_jobs.assert_called_once_with(
+            [switch['validation_job'] for switch in switches])
+        self.assertEqual(dict((switch['id'], const.SUCCESS)
+                              for switch in switches), results)
@@ -0,0 +1,70 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+import mock
+import webob
+
+from baremetal_network_provisioning.common import etag
+from baremetal_network_provisioning.db import bm_nw_provision_db as db
+
+from neutron import context
+from neutron.tests import base
+
+
+class TestETagResource(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestETagResource, self).setUp()
+        self.app = mock.Mock()
+        self.resource = etag.ETagResource(self.app, ['switches', 'ports'])
+        generations = mock.patch.object(db, 'get_bnp_generations',
+                                        return_value={'switches': 3,
+                                                      'ports': 7})
+        generations.start()
+        self.addCleanup(generations.stop)
+
+    def _request(self, action='index', method='GET', **headers):
+        request = webob.Request.blank('/bnp-switches', method=method,
+                                      headers=headers)
+        request.environ['wsgiorg.routing_args'] = ((), {'action': action})
+        request.environ['neutron.context'] = context.get_admin_context()
+        return request
+
+    def test_index_sets_etag(self):
+        self.resource.application = webob.Response(body='{}')
+        response = self._request().get_response(self.resource)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('3-7', response.etag)
+
+    def test_index_not_modified(self):
+        response = self._request(**{'If-None-Match': '"3-7"'}).get_response(
+            self.resource)
+        self.assertEqual(304, response.status_int)
+        self.assertEqual('3-7', response.etag)
+        self.assertFalse(self.app.called)
+
+    def test_index_modified(self):
+        self.resource.application = webob.Response(body='{}')
+        response = self._request(**{'If-None-Match': '"3-6"'}).get_response(
+            self.resource)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('3-7', response.etag)
+
+    def test_show_without_etag(self):
+        self.resource.application = webob.Response(body='{}')
+        response = self._request(action='show').get_response(self.resource)
+        self.assertEqual(200, response.status_int)
+        self.assertIsNone(response.etag)
+        self.assertFalse(db.get_bnp_generations.called)
@@ -0,0 +1,124 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+import mock
+from oslo_config import cfg
+
+from baremetal_network_provisioning.common import metrics
+from baremetal_network_provisioning.ml2 import mechanism_hpe
+
+from neutron.tests import base
+
+CONF = cfg.CONF
+
+
+class FakeDriver(object):
+
+    @metrics.timed('fake_op')
+    def run(self, port_id, phases):
+        for phase in phases:
+            metrics.lap(phase)
+        return port_id
+
+
+class TestMetrics(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestMetrics, self).setUp()
+        CONF.register_opts(mechanism_hpe.driver_opts, 'ml2_hpe')
+        self.addCleanup(metrics._histograms.clear)
+        self.addCleanup(metrics._windows.clear)
+
+    def test_histogram_observe(self):
+        hist = metrics.Histogram(buckets=(0.1, 1.0))
+        hist.observe(0.05)
+        hist.observe(0.5)
+        hist.observe(5)
+        snapshot = hist.snapshot()
+        self.assertEqual(3, snapshot['count'])
+        self.assertAlmostEqual(5.55, snapshot['sum'])
+        self.assertEqual([('0.1', 1), ('1.0', 2), ('+Inf', 3)],
+                         list(snapshot['buckets'].items()))
+
+    def test_timed_feeds_histograms(self):
+        self.assertEqual('port1',
+                         FakeDriver().run('port1', ['db_lookup', 'db_write']))
+        histograms = metrics.get_histograms()
+        self.assertEqual(set(['fake_op', 'fake_op.db_lookup',
+                              'fake_op.db_write']), set(histograms))
+        self.assertEqual(1, histograms['fake_op']['count'])
+
+    def test_timed_without_phases(self):
+        FakeDriver().run('port1', [])
+        self.assertEqual({}, metrics.get_histograms())
+
+    def test_slow_operation_logged(self):
+        CONF.set_override('slow_bind_threshold', 1.0, 'ml2_hpe')
+        with mock.patch.object(metrics.time, 'time',
+                               side_effect=[0.0, 0.5, 3.0, 3.0]), \
+                mock.patch.object(metrics.LOG, 'warning') as log_warning:
+            FakeDriver().run('port1', ['db_lookup', 'set_isolation'])
+        fields = log_warning.call_args[0][1]
+        self.assertEqual('fake_op', fields['operation'])
+        self.assertEqual('port=port1 total=3.000s db_lookup=0.500s '
+                         'set_isolation=2.500s', fields['fields'])
+
+    def test_fast_operation_not_logged(self):
+        CONF.set_override('slow_bind_threshold', 10.0, 'ml2_hpe')
+        with mock.patch.object(metrics.LOG, 'warning') as log_warning:
+            FakeDriver().run('port1', ['db_lookup'])
+        self.assertFalse(log_warning.called)
+
+    def test_sliding_window(self):
+        window = metrics.SlidingWindow(max_age=100, max_samples=3)
+        for stamp in (0, 10, 50, 90):
+            window.add(stamp, now=stamp)
+        self.assertEqual([10, 50, 90], window.values(100, now=90))
+        self.assertEqual([50, 90], window.values(40, now=90))
+        # the sample at 0 was dropped before its age
+        self.assertEqual(90, window.span(100, now=90))
+        self.assertEqual(40, window.span(40, now=90))
+        window.add(150, now=150)
+        self.assertEqual([50, 90, 150], window.values(100, now=150))
+        self.assertEqual(100, window.span(100, now=150))
+        self.assertEqual(100, metrics.SlidingWindow().span(100, now=150))
+
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual(50, metrics.percentile(values, 50))
+        self.assertEqual(99, metrics.percentile(values, 99))
+        self.assertEqual(7, metrics.percentile([7], 90))
+
+    def test_get_switch_stats(self):
+        with mock.patch.object(metrics.time, 'time', return_value=1000.0):
+            metrics.record_outcome('bind', 'sw1', True)
+            metrics.record_outcome('bind', 'sw1', False)
+            metrics.record_outcome('unbind', 'sw2', True, count=3)
+            metrics.record_latency('snmp', 'sw1', 0.2)
+            metrics.record_latency('snmp', 'sw2', 0.4)
+        stats = metrics.get_switch_stats(now=1100.0)
+        self.assertEqual(
+            {'count': 0, 'failures': 0, 'failure_rate': 0.0, 'span': 60},
+            stats['sw1'][metrics.OUTCOMES]['bind']['60'])
+        self.assertEqual(
+            {'count': 2, 'failures': 1, 'failure_rate': 0.5, 'span': 300},
+            stats['sw1'][metrics.OUTCOMES]['bind']['300'])
+        self.assertEqual(
+            3, stats[None][metrics.OUTCOMES]['unbind']['300']['count'])
+        latency = stats[None][metrics.LATENCIES]['snmp']['3600']
+        self.assertEqual(2, latency['count'])
+        self.assertEqual(0.4, latency['p90'])
+        self.assertIsNone(stats['sw2'][metrics.LATENCIES]['snmp']['60'][
+            'p50'])
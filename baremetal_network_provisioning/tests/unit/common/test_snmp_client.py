@@ -13,6 +13,8 @@
 #    under the License.
 #
 
+import contextlib
+
 import mock
 from oslo_config import cfg
 
@@ -23,6 +25,8 @@ from baremetal_network_provisioning.ml2 import mechanism_hpe
 from neutron.tests import base
 
 from pysnmp.entity.rfc3413.oneliner import cmdgen
+from pysnmp.proto import rfc1902
+from pysnmp.proto import rfc1905
 
 CONF = cfg.CONF
 
@@ -113,6 +117,24 @@ class TestSNMPClient(base.BaseTestCase):
             self.client.get('oid')
             cmdgen.CommandGenerator.getCmd.called
 
+    def test_get_existing_v1_retries_without_missing_object(self):
+        missing = (0, 2, 1, ())
+        result = (0, 0, 0, [('oid2', rfc1902.Integer32(1))])
+        with mock.patch.object(snmp_client.tpool, 'execute',
+                               side_effect=[missing, result]) as execute:
+            values = self.client.get_existing('oid1', 'oid2')
+        self.assertEqual([None, rfc1902.Integer32(1)], values)
+        execute.assert_called_with(self.client.cmd_gen.getCmd,
+                                   mock.ANY, mock.ANY, 'oid2')
+
+    def test_get_existing_v2c_no_such_instance(self):
+        result = (0, 0, 0, [('oid1', rfc1905.noSuchInstance),
+                            ('oid2', rfc1902.Integer32(1))])
+        with mock.patch.object(snmp_client.tpool, 'execute',
+                               return_value=result):
+            values = self.client.get_existing('oid1', 'oid2')
+        self.assertEqual([None, rfc1902.Integer32(1)], values)
+
     def test_get_bulk(self):
         result = (0, 0, 0, ('oid', 'value'))
         with mock.patch.object(cmdgen.CommandGenerator,
@@ -120,3 +142,45 @@ class TestSNMPClient(base.BaseTestCase):
                                return_value=result):
             self.client.get_bulk('oid1', 'oid2')
             cmdgen.CommandGenerator.bulkCmd.called
+
+    def test_set_multiple(self):
+        result = (0, 0, 0, ())
+        with mock.patch.object(snmp_client.tpool, 'execute',
+                               return_value=result) as execute:
+            self.client.set_multiple([('oid1', 'value1'),
+                                      ('oid2', 'value2')])
+            execute.assert_called_once_with(self.client.cmd_gen.setCmd,
+                                            mock.ANY, mock.ANY,
+                                            ('oid1', 'value1'),
+                                            ('oid2', 'value2'))
+
+    def test_get_runs_in_thread_pool(self):
+        result = (0, 0, 0, ('oid', 'value'))
+        with mock.patch.object(snmp_client.tpool, 'execute',
+                               return_value=result) as execute:
+            self.client.get('oid')
+            execute.assert_called_once_with(self.client.cmd_gen.getCmd,
+                                            mock.ANY, mock.ANY, 'oid')
+
+    def test_set_thread_pool_size(self):
+        with contextlib.nested(
+                mock.patch.object(snmp_client, '_pool_started', False),
+                mock.patch.object(snmp_client.tpool, 'set_num_threads')):
+            snmp_client.set_thread_pool_size(10)
+            snmp_client.tpool.set_num_threads.assert_called_once_with(10)
+
+    def test_request_starts_thread_pool(self):
+        result = (0, 0, 0, ('oid', 'value'))
+        with contextlib.nested(
+                mock.patch.object(snmp_client, '_pool_started', False),
+                mock.patch.object(snmp_client.tpool, 'execute',
+                                  return_value=result)):
+            self.client.get('oid')
+            self.assertTrue(snmp_client._pool_started)
+
+    def test_set_thread_pool_size_once_started(self):
+        with contextlib.nested(
+                mock.patch.object(snmp_client, '_pool_started', True),
+                mock.patch.object(snmp_client.tpool, 'set_num_threads')):
+            snmp_client.set_thread_pool_size(10)
+            self.assertFalse(snmp_client.tpool.set_num_threads.called)
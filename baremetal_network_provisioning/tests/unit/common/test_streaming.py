@@ -0,0 +1,108 @@
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+import json
+
+import mock
+from oslo_config import cfg
+import webob
+import webob.exc
+
+from baremetal_network_provisioning.common import exceptions as hp_exc
+from baremetal_network_provisioning.common import streaming
+from baremetal_network_provisioning.ml2 import mechanism_hpe
+
+from neutron.tests import base
+
+CONF = cfg.CONF
+
+
+class TestStreaming(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestStreaming, self).setUp()
+        CONF.register_opts(mechanism_hpe.driver_opts, 'ml2_hpe')
+        self.controller = mock.Mock()
+        self.app = mock.Mock()
+        self.resource = streaming.StreamingIndexResource(self.app,
+                                                         self.controller)
+
+    def _request(self, action='index'):
+        request = webob.Request.blank('/bnp-switch-ports')
+        request.environ['wsgiorg.routing_args'] = ((), {'action': action})
+        return request
+
+    def test_encode_collection(self):
+        items = iter([{'id': index} for index in range(5)])
+        chunks = list(streaming.encode_collection('items', items,
+                                                  chunk_size=2))
+        self.assertEqual(5, len(chunks))
+        self.assertEqual({'items': [{'id': index} for index in range(5)]},
+                         json.loads(''.join(chunks)))
+
+    def test_encode_empty_collection(self):
+        chunks = streaming.encode_collection('items', iter([]))
+        self.assertEqual({'items': []}, json.loads(''.join(chunks)))
+
+    def test_index_streamed(self):
+        self.controller.iter_index.return_value = ('items',
+                                                   iter([{'id': 1}]))
+        response = self._request().get_response(self.resource)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual({'items': [{'id': 1}]}, json.loads(response.body))
+        self.assertFalse(self.app.called)
+
+    def test_index_invalid_request(self):
+        self.controller.iter_index.side_effect = webob.exc.HTTPBadRequest
+        self.resource.application = webob.exc.HTTPBadRequest()
+        response = self._request().get_response(self.resource)
+        self.assertEqual(400, response.status_int)
+
+    def test_show_not_streamed(self):
+        self.resource.application = webob.Response(body='{}')
+        response = self._request(action='show').get_response(self.resource)
+        self.assertEqual('{}', response.body)
+        self.assertFalse(self.controller.iter_index.called)
+
+    def _failing_items(self, count):
+        for index in range(count):
+            yield {'id': index}
+        raise RuntimeError('lost connection')
+
+    def test_index_error_before_streaming(self):
+        self.controller.iter_index.return_value = ('items',
+                                                   self._failing_items(0))
+        response = self._request().get_response(self.resource)
+        self.assertEqual(500, response.status_int)
+
+    def test_index_error_while_streaming(self):
+        self.controller.iter_index.return_value = ('items',
+                                                   self._failing_items(3))
+        with mock.patch.object(streaming.const, 'STREAM_CHUNK_SIZE', 2):
+            response = self._request().get_response(self.resource)
+            self.assertEqual(200, response.status_int)
+            # the truncated list is not closed into a valid document
+            self.assertRaises(RuntimeError, lambda: response.body)
+
+    def test_index_stream_timeout(self):
+        CONF.set_override('stream_timeout', 60, 'ml2_hpe')
+        self.addCleanup(CONF.clear_override, 'stream_timeout', 'ml2_hpe')
+        items = iter([{'id': index} for index in range(5)])
+        self.controller.iter_index.return_value = ('items', items)
+        with mock.patch.object(streaming.const, 'STREAM_CHUNK_SIZE', 2), \
+                mock.patch.object(streaming, 'time') as timer:
+            timer.time.side_effect = [0, 10, 70]
+            response = self._request().get_response(self.resource)
+            self.assertRaises(hp_exc.StreamTimeout, lambda: response.body)
@@ -0,0 +1,240 @@
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import operator
+
+import mock
+from oslo_config import cfg
+
+from neutron import context
+from neutron.tests.unit import testlib_api
+
+from baremetal_network_provisioning.common import constants as const
+from baremetal_network_provisioning.db import bm_nw_provision_cache as cache
+from baremetal_network_provisioning.db import bm_nw_provision_db as db
+from baremetal_network_provisioning.db import bm_nw_provision_models as models
+from baremetal_network_provisioning.ml2 import mechanism_hpe
+
+CONF = cfg.CONF
+
+
+class NetworkProvisionCacheTestCase(testlib_api.SqlTestCase):
+    """Test the generation validated caches."""
+
+    def setUp(self):
+        super(NetworkProvisionCacheTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+        CONF.register_opts(mechanism_hpe.driver_opts, 'ml2_hpe')
+        CONF.set_override('cache_generation_ttl', 1.0, 'ml2_hpe')
+        self.addCleanup(CONF.clear_override, 'cache_generation_ttl',
+                        'ml2_hpe')
+        cache.credentials.invalidate()
+        self.addCleanup(cache.credentials.invalidate)
+        cache.switches.invalidate()
+        self.addCleanup(cache.switches.invalidate)
+        cache.physical_ports.invalidate()
+        self.addCleanup(cache.physical_ports.invalidate)
+
+    def _get_snmp_cred_dict(self):
+        """Get a snmp credential dict."""
+        snmp_cred_dict = {
+            'name': 'CRED1',
+            'protocol_type': 'snmpv2c',
+            'write_community': 'public',
+            'security_name': None,
+            'auth_protocol': None,
+            'auth_key': None,
+            'priv_protocol': None,
+            'priv_key': None,
+            'security_level': None}
+        return snmp_cred_dict
+
+    def _get_bnp_phys_switch_dict(self):
+        """Get a phy switch dict."""
+        switch_dict = {'name': "switch1",
+                       'ip_address': "1.1.1.1",
+                       'mac_address': "44:31:92:61:89:d2",
+                       'port_provisioning': "ENABLED",
+                       'management_protocol': "snmpv2c",
+                       'credentials': "CRED1",
+                       'validation_result': "Success",
+                       'vendor': "hpe",
+                       'family': None}
+        return switch_dict
+
+    def test_get_credential_by_id_is_cached(self):
+        """Test a credential is loaded once per generation."""
+        cred = db.add_bnp_snmp_cred(self.ctx, self._get_snmp_cred_dict())
+        with mock.patch.object(db, 'get_snmp_cred_by_id',
+                               wraps=db.get_snmp_cred_by_id) as get_cred:
+            first = cache.get_credential_by_id(self.ctx, 'snmpv2c',
+                                               cred['id'])
+            second = cache.get_credential_by_id(self.ctx, 'snmpv2c',
+                                                cred['id'])
+        self.assertEqual(1, get_cred.call_count)
+        self.assertEqual(first, second)
+        self.assertEqual('public', first['write_community'])
+
+    def test_get_credentials_by_name(self):
+        """Test name lookups return every matching credential."""
+        db.add_bnp_snmp_cred(self.ctx, self._get_snmp_cred_dict())
+        creds = cache.get_credentials_by_name(self.ctx, 'snmpv2c', 'CRED1')
+        self.assertEqual(1, len(creds))
+        self.assertEqual([], cache.get_credentials_by_name(
+            self.ctx, 'snmpv2c', 'CRED2'))
+
+    def test_write_invalidates_cached_credential(self):
+        """Test a credential update is seen through the generation."""
+        cred_dict = self._get_snmp_cred_dict()
+        cred = db.add_bnp_snmp_cred(self.ctx, cred_dict)
+        cache.get_credential_by_id(self.ctx, 'snmpv2c', cred['id'])
+        cred_dict['write_community'] = 'private'
+        db.update_bnp_snmp_cred_by_id(self.ctx, cred['id'], cred_dict)
+        cached = cache.get_credential_by_id(self.ctx, 'snmpv2c', cred['id'])
+        self.assertEqual('private', cached['write_community'])
+
+    def test_returned_credential_is_a_copy(self):
+        """Test callers cannot mutate the cached credential."""
+        cred = db.add_bnp_snmp_cred(self.ctx, self._get_snmp_cred_dict())
+        cached = cache.get_credential_by_id(self.ctx, 'snmpv2c', cred['id'])
+        cached['write_community'] = 'changed'
+        cached = cache.get_credential_by_id(self.ctx, 'snmpv2c', cred['id'])
+        self.assertEqual('public', cached['write_community'])
+
+    def test_get_switch_is_cached_by_each_key(self):
+        """Test switches are loaded once per key and generation."""
+        switch = db.add_bnp_phys_switch(self.ctx,
+                                        self._get_bnp_phys_switch_dict())
+        with mock.patch.object(db, 'get_bnp_phys_switch_by_mac',
+                               wraps=db.get_bnp_phys_switch_by_mac) as get_sw:
+            by_mac = cache.get_switch_by_mac(self.ctx, "44:31:92:61:89:d2")
+            cache.get_switch_by_mac(self.ctx, "44:31:92:61:89:d2")
+        self.assertEqual(1, get_sw.call_count)
+        self.assertEqual(switch['id'], by_mac.id)
+        self.assertEqual(by_mac, cache.get_switch_by_id(self.ctx,
+                                                        switch['id']))
+        self.assertEqual(by_mac, cache.get_switch_by_ip(self.ctx, "1.1.1.1"))
+        self.assertEqual([by_mac], cache.get_switches_by_name(self.ctx,
+                                                              "switch1"))
+
+    def test_switch_write_invalidates_cached_switch(self):
+        """Test a switch update is seen through the generation."""
+        switch = db.add_bnp_phys_switch(self.ctx,
+                                        self._get_bnp_phys_switch_dict())
+        cache.get_switch_by_id(self.ctx, switch['id'])
+        db.update_bnp_phys_switch_result_status(self.ctx, switch['id'],
+                                                "Device not reachable")
+        self.ctx.session.expire_all()
+        cached = cache.get_switch_by_id(self.ctx, switch['id'])
+        self.assertEqual("Device not reachable", cached.validation_result)
+        db.delete_bnp_phys_switch(self.ctx, switch['id'])
+        self.assertIsNone(cache.get_switch_by_id(self.ctx, switch['id']))
+
+    def test_switch_snapshot_is_read_only(self):
+        """Test callers cannot mutate the cached switch."""
+        switch = db.add_bnp_phys_switch(self.ctx,
+                                        self._get_bnp_phys_switch_dict())
+        cached = cache.get_switch_by_id(self.ctx, switch['id'])
+        self.assertRaises(TypeError, operator.setitem, cached, 'name',
+                          'changed')
+        self.assertRaises(AttributeError, setattr, cached, 'name', 'changed')
+        switch_dict = dict(cached)
+        switch_dict['name'] = 'changed'
+        cached = cache.get_switch_by_id(self.ctx, switch['id'])
+        self.assertEqual('switch1', cached['name'])
+
+    def test_switch_ports(self):
+        """Test the ports walked on a switch are kept with the walk time."""
+        switch = db.add_bnp_phys_switch(self.ctx,
+                                        self._get_bnp_phys_switch_dict())
+        self.assertEqual((None, []),
+                         cache.get_switch_ports(self.ctx, switch['id']))
+        ports = [{'ifindex': '1', 'interface_name': 'Ten-GigabitEthernet1/0/1',
+                  'port_status': '1'}]
+        cache.set_switch_ports(self.ctx, switch['id'], ports)
+        ports[0]['port_status'] = '2'
+        updated_at, cached = cache.get_switch_ports(self.ctx, switch['id'])
+        self.assertIsNotNone(updated_at)
+        self.assertEqual('1', cached[0]['port_status'])
+
+    def test_switch_ports_walked_by_another_worker(self):
+        """Test a walk stored by another worker invalidates the ports."""
+        switch = db.add_bnp_phys_switch(self.ctx,
+                                        self._get_bnp_phys_switch_dict())
+        ports = [{'ifindex': '1', 'interface_name': 'Ten-GigabitEthernet1/0/1',
+                  'port_status': '1'}]
+        cache.set_switch_ports(self.ctx, switch['id'], ports)
+        self.assertEqual(ports,
+                         cache.get_switch_ports(self.ctx, switch['id'])[1])
+        ports[0]['port_status'] = '2'
+        db.set_bnp_switch_physical_ports(self.ctx, switch['id'], ports)
+        self.assertEqual(ports,
+                         cache.get_switch_ports(self.ctx, switch['id'])[1])
+
+    def test_generation_is_checked_once_per_ttl(self):
+        """Test a hit within the ttl does not read the generation."""
+        cred = db.add_bnp_snmp_cred(self.ctx, self._get_snmp_cred_dict())
+        with contextlib.nested(
+                mock.patch.object(cache, 'time'),
+                mock.patch.object(db, 'get_bnp_generation',
+                                  wraps=db.get_bnp_generation)):
+            cache.time.time.return_value = 100.0
+            cache.get_credential_by_id(self.ctx, 'snmpv2c', cred['id'])
+            cache.get_credential_by_id(self.ctx, 'snmpv2c', cred['id'])
+            self.assertEqual(1, db.get_bnp_generation.call_count)
+            cache.time.time.return_value = 101.0
+            cache.get_credential_by_id(self.ctx, 'snmpv2c', cred['id'])
+            self.assertEqual(2, db.get_bnp_generation.call_count)
+
+    def test_write_by_another_worker_seen_after_ttl(self):
+        """Test a generation bumped by another worker is seen after ttl."""
+        cred_dict = self._get_snmp_cred_dict()
+        cred = db.add_bnp_snmp_cred(self.ctx, cred_dict)
+        with mock.patch.object(cache, 'time') as timer:
+            timer.time.return_value = 100.0
+            cache.get_credential_by_id(self.ctx, 'snmpv2c', cred['id'])
+            # written by another worker, without a bump of this process
+            with self.ctx.session.begin(subtransactions=True):
+                self.ctx.session.query(models.BNPSNMPCredential).filter_by(
+                    id=cred['id']).update({'write_community': 'private'})
+                self.ctx.session.query(models.BNPGeneration).filter_by(
+                    resource=const.BNP_CREDENTIALS_GENERATION).update(
+                        {'generation': models.BNPGeneration.generation + 1})
+            cached = cache.get_credential_by_id(self.ctx, 'snmpv2c',
+                                                cred['id'])
+            self.assertEqual('public', cached['write_community'])
+            timer.time.return_value = 101.0
+            cached = cache.get_credential_by_id(self.ctx, 'snmpv2c',
+                                                cred['id'])
+        self.assertEqual('private', cached['write_community'])
+
+    def test_unchanged_switch_ports_not_stored_again(self):
+        """Test an unchanged walk is only stored once the last is old."""
+        switch = db.add_bnp_phys_switch(self.ctx,
+                                        self._get_bnp_phys_switch_dict())
+        ports = [{'ifindex': '1', 'interface_name': 'Ten-GigabitEthernet1/0/1',
+                  'port_status': '1'}]
+        cache.set_switch_ports(self.ctx, switch['id'], ports, 3600)
+        with mock.patch.object(db, 'set_bnp_switch_physical_ports') as store:
+            cache.set_switch_ports(self.ctx, switch['id'], ports, 3600)
+            self.assertFalse(store.called)
+            with mock.patch.object(cache.timeutils, 'is_older_than',
+                                   return_value=True):
+                cache.set_switch_ports(self.ctx, switch['id'], ports, 3600)
+            self.assertEqual(1, store.call_count)
+            changed = [dict(ports[0], port_status='2')]
+            cache.set_switch_ports(self.ctx, switch['id'], changed, 3600)
+            self.assertEqual(2, store.call_count)
@@ -12,11 +12,19 @@
 # implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import datetime
+
+import mock
 from oslo_log import log as logging
+from oslo_utils import timeutils
+from oslo_utils import uuidutils
+from sqlalchemy import orm
 
+from neutron.common import exceptions as n_exc
 from neutron import context
 from neutron.tests.unit import testlib_api
 
+from baremetal_network_provisioning.common import constants as const
 from baremetal_network_provisioning.db import bm_nw_provision_db as db
 from baremetal_network_provisioning.db import bm_nw_provision_models as models
 
@@ -86,6 +94,15 @@ class NetworkProvisionDBTestCase(testlib_api.SqlTestCase):
                     'ifindex': "1"}
         return port_map
 
+    def _add_bnp_switch_port_map(self):
+        """Add a phy switch and a switch port mapping on it."""
+        phy_switch = db.add_bnp_phys_switch(self.ctx,
+                                            self._get_bnp_phys_switch_dict())
+        port_map = self._get_bnp_switch_port_map_dict()
+        port_map['switch_id'] = phy_switch['id']
+        db.add_bnp_switch_port_map(self.ctx, port_map)
+        return phy_switch
+
     def test_add_bnp_phys_switch(self):
         """Test add_bnp_phys_switch method."""
         sw_dict = self._get_bnp_phys_switch_dict()
@@ -93,8 +110,28 @@ class NetworkProvisionDBTestCase(testlib_api.SqlTestCase):
         count = self.ctx.session.query(models.BNPPhysicalSwitch).count()
         self.assertEqual(1, count)
 
+    def test_add_bnp_phys_switches(self):
+        """Test add_bnp_phys_switches method."""
+        switches = []
+        for index in range(3):
+            sw_dict = self._get_bnp_phys_switch_dict()
+            sw_dict['ip_address'] = "1.1.1.%d" % index
+            sw_dict['mac_address'] = "A:B:C:%d" % index
+            switches.append(sw_dict)
+        rows = db.add_bnp_phys_switches(self.ctx, switches)
+        self.assertEqual(3, len(db.get_all_bnp_phys_switches(self.ctx)))
+        sw = db.get_bnp_phys_switch(self.ctx, rows[1]['id'])
+        self.assertEqual("1.1.1.1", sw['ip_address'])
+        self.assertEqual(1, db.get_bnp_generation(
+            self.ctx, const.BNP_SWITCHES_GENERATION))
+        found = db.get_bnp_phys_switches_by_ip_or_mac(
+            self.ctx, ["1.1.1.0", "2.2.2.2"], ["A:B:C:2"])
+        self.assertEqual(set([("1.1.1.0", "A:B:C:0"), ("1.1.1.2", "A:B:C:2")]),
+                         set(tuple(row) for row in found))
+
     def test_add_bnp_neutron_port(self):
         """Test add_bnp_neutron_port method."""
+        self._add_bnp_switch_port_map()
         port_dict = self._get_bnp_neutron_port_dict()
         db.add_bnp_neutron_port(self.ctx, port_dict)
         count = self.ctx.session.query(models.BNPNeutronPort).count()
@@ -102,13 +139,13 @@ class NetworkProvisionDBTestCase(testlib_api.SqlTestCase):
 
     def test_add_bnp_switch_port_map(self):
         """Test add_bnp_switch_port_map method."""
-        port_map = self._get_bnp_switch_port_map_dict()
-        db.add_bnp_switch_port_map(self.ctx, port_map)
+        self._add_bnp_switch_port_map()
         count = self.ctx.session.query(models.BNPSwitchPortMapping).count()
         self.assertEqual(1, count)
 
     def test_delete_bnp_neutron_port(self):
         """Test delete_bnp_neutron_port method."""
+        self._add_bnp_switch_port_map()
         port_dict = self._get_bnp_neutron_port_dict()
         db.add_bnp_neutron_port(self.ctx, port_dict)
         db.delete_bnp_neutron_port(self.ctx, port_dict['neutron_port_id'])
@@ -125,6 +162,16 @@ class NetworkProvisionDBTestCase(testlib_api.SqlTestCase):
         count = self.ctx.session.query(models.BNPPhysicalSwitch).count()
         self.assertEqual(0, count)
 
+    def test_delete_bnp_phys_switch_cascades(self):
+        """Test deleting a switch deletes its ports mappings and counts."""
+        phy_switch = self._add_bnp_switch_port_map()
+        db.add_bnp_neutron_port(self.ctx, self._get_bnp_neutron_port_dict())
+        db.update_bnp_vlan_port_count(self.ctx, phy_switch['id'], 100, 1)
+        db.delete_bnp_phys_switch(self.ctx, phy_switch['id'])
+        for model in (models.BNPSwitchPortMapping, models.BNPNeutronPort,
+                      models.BNPVlanPortCount):
+            self.assertEqual(0, self.ctx.session.query(model).count())
+
     def test_delete_bnp_phys_switch_by_name(self):
         """Test delete_bnp_phys_switch_by_name method."""
         sw_dict = self._get_bnp_phys_switch_dict()
@@ -136,15 +183,11 @@ class NetworkProvisionDBTestCase(testlib_api.SqlTestCase):
 
     def test_get_all_bnp_switch_port_maps(self):
         """Test get_all_bnp_switch_port_maps method."""
-        sw_dict = self._get_bnp_phys_switch_dict()
-        phy_switch = db.add_bnp_phys_switch(self.ctx, sw_dict)
+        self._add_bnp_switch_port_map()
         port_dict = self._get_bnp_neutron_port_dict()
         db.add_bnp_neutron_port(self.ctx, port_dict)
-        port_map = self._get_bnp_switch_port_map_dict()
-        port_map['switch_id'] = phy_switch['id']
-        db.add_bnp_switch_port_map(self.ctx, port_map)
         ports = db.get_all_bnp_switch_port_maps(self.ctx)
-        self.assertEqual(ports[0][0], port_map['neutron_port_id'])
+        self.assertEqual(ports[0][0], port_dict['neutron_port_id'])
 
     def test_get_bnp_phys_switch(self):
         """Test get_bnp_phys_switch method."""
@@ -166,6 +209,55 @@ class NetworkProvisionDBTestCase(testlib_api.SqlTestCase):
         switches = db.get_all_bnp_phys_switches(self.ctx)
         self.assertEqual(1, len(switches))
 
+    def test_get_all_bnp_phys_switches_paginated(self):
+        """Test get_all_bnp_phys_switches with sorts, pages and fields."""
+        for index in range(5):
+            sw_dict = self._get_bnp_phys_switch_dict()
+            sw_dict['name'] = "test%d" % index
+            sw_dict['ip_address'] = "1.1.1.%d" % index
+            db.add_bnp_phys_switch(self.ctx, sw_dict)
+        sorts = [('name', False)]
+        page = db.get_all_bnp_phys_switches(self.ctx, fields=['name', 'id'],
+                                            sorts=sorts, limit=2)
+        self.assertEqual(['test4', 'test3'], [sw['name'] for sw in page])
+        self.assertEqual(set(['name', 'id']), set(page[0]))
+        page = db.get_all_bnp_phys_switches(self.ctx, fields=['name'],
+                                            sorts=sorts, limit=2,
+                                            marker=page[-1]['id'])
+        self.assertEqual([{'name': 'test2'}, {'name': 'test1'}], page)
+
+    def test_get_all_bnp_phys_switches_invalid(self):
+        """Test get_all_bnp_phys_switches with bad filters and markers."""
+        db.add_bnp_phys_switch(self.ctx, self._get_bnp_phys_switch_dict())
+        self.assertRaises(n_exc.BadRequest, db.get_all_bnp_phys_switches,
+                          self.ctx, pod='pod1')
+        self.assertRaises(n_exc.BadRequest, db.get_all_bnp_phys_switches,
+                          self.ctx, fields=['pod'])
+        self.assertRaises(n_exc.BadRequest, db.get_all_bnp_phys_switches,
+                          self.ctx, limit=1,
+                          marker=uuidutils.generate_uuid())
+
+    def test_update_bnp_phys_switches(self):
+        """Test update_bnp_phys_switches applies its filters."""
+        for index in range(3):
+            sw_dict = self._get_bnp_phys_switch_dict()
+            sw_dict['name'] = "test%d" % index
+            sw_dict['ip_address'] = "1.1.1.%d" % index
+            db.add_bnp_phys_switch(self.ctx, sw_dict)
+        self.assertEqual([('snmpv1', 'creds1')],
+                         db.get_bnp_phys_switch_access(self.ctx))
+        updated = db.update_bnp_phys_switches(
+            self.ctx, {'port_provisioning': "DISABLED"},
+            name=["test0", "test2"], port_provisioning="ENABLED")
+        self.assertEqual(2, updated)
+        self.ctx.session.expire_all()
+        disabled = db.get_all_bnp_phys_switches(
+            self.ctx, port_provisioning="DISABLED")
+        self.assertEqual(["test0", "test2"],
+                         sorted(sw['name'] for sw in disabled))
+        self.assertEqual(0, db.update_bnp_phys_switches(
+            self.ctx, {'port_provisioning': "DISABLED"}, name="test9"))
+
     def test_add_bnp_snmp_cred(self):
         """Test test_add_bnp_snmp_cred method."""
         snmp_cred_dict = self._get_snmp_cred_dict()
@@ -207,3 +299,223 @@ class NetworkProvisionDBTestCase(testlib_api.SqlTestCase):
         retval = [db.add_bnp_netconf_cred(self.ctx, netconf_cred_dict)]
         cred_val = db.get_netconf_cred_by_id(self.ctx, retval[0]['id'])
         self.assertEqual(retval[0], cred_val)
+
+    def test_get_all_bnp_creds(self):
+        """Test get_all_bnp_creds and get_bnp_cred_by_id methods."""
+        snmp_cred = db.add_bnp_snmp_cred(self.ctx,
+                                         self._get_snmp_cred_dict())
+        netconf_cred = db.add_bnp_netconf_cred(self.ctx,
+                                               self._get_netconf_cred_dict())
+        ids = sorted([snmp_cred['id'], netconf_cred['id']])
+        creds = db.get_all_bnp_creds(self.ctx)
+        self.assertEqual(ids, [cred['id'] for cred in creds])
+        creds = db.get_all_bnp_creds(self.ctx, limit=1, marker=ids[0])
+        self.assertEqual([ids[1]], [cred['id'] for cred in creds])
+        creds = db.get_all_bnp_creds(self.ctx, limit=1, marker=ids[1],
+                                     page_reverse=True)
+        self.assertEqual([ids[0]], [cred['id'] for cred in creds])
+        cred = db.get_bnp_cred_by_id(self.ctx, netconf_cred['id'])
+        self.assertEqual({'id': netconf_cred['id'],
+                          'name': netconf_cred['name'],
+                          'protocol_type': netconf_cred['protocol_type']},
+                         cred)
+        self.assertIsNone(db.get_bnp_cred_by_id(self.ctx, 'fake-id'))
+
+    def test_bump_bnp_generation(self):
+        """Test get_bnp_generation and bump_bnp_generation methods."""
+        self.assertEqual(0, db.get_bnp_generation(self.ctx, 'resource'))
+        db.bump_bnp_generation(self.ctx, 'resource')
+        db.bump_bnp_generation(self.ctx, 'resource')
+        self.assertEqual(2, db.get_bnp_generation(self.ctx, 'resource'))
+
+    def test_snmp_cred_writes_bump_generation(self):
+        """Test credential writes bump the credentials generation."""
+        resource = const.BNP_CREDENTIALS_GENERATION
+        snmp_cred_dict = self._get_snmp_cred_dict()
+        cred = db.add_bnp_snmp_cred(self.ctx, snmp_cred_dict)
+        self.assertEqual(1, db.get_bnp_generation(self.ctx, resource))
+        db.update_bnp_snmp_cred_by_id(self.ctx, cred['id'], snmp_cred_dict)
+        self.assertEqual(2, db.get_bnp_generation(self.ctx, resource))
+        db.delete_snmp_cred_by_id(self.ctx, cred['id'])
+        self.assertEqual(3, db.get_bnp_generation(self.ctx, resource))
+
+    def test_port_map_writes_bump_generation(self):
+        """Test port mapping writes bump the switch ports generation."""
+        resource = const.BNP_SWITCH_PORTS_GENERATION
+        self._add_bnp_switch_port_map()
+        self.assertEqual(1, db.get_bnp_generation(self.ctx, resource))
+        port_dict = self._get_bnp_neutron_port_dict()
+        db.add_bnp_neutron_port(self.ctx, port_dict)
+        self.assertEqual(2, db.get_bnp_generation(self.ctx, resource))
+        db.delete_bnp_neutron_port(self.ctx, port_dict['neutron_port_id'])
+        self.assertEqual(3, db.get_bnp_generation(self.ctx, resource))
+        self.assertEqual({resource: 3, 'resource': 0},
+                         db.get_bnp_generations(self.ctx,
+                                                [resource, 'resource']))
+
+    def test_delete_bnp_port_maps(self):
+        """Test delete_bnp_port_maps method."""
+        self._add_bnp_switch_port_map()
+        port = self._get_bnp_neutron_port_dict()
+        db.add_bnp_neutron_port(self.ctx, port)
+        port_ids = [port['neutron_port_id']]
+        self.assertEqual(1, db.delete_bnp_port_maps(self.ctx, port_ids))
+        self.assertEqual(0, db.delete_bnp_port_maps(self.ctx, port_ids))
+        count = self.ctx.session.query(models.BNPSwitchPortMapping).count()
+        self.assertEqual(0, count)
+        count = self.ctx.session.query(models.BNPNeutronPort).count()
+        self.assertEqual(0, count)
+
+    def test_get_orphan_bnp_port_maps(self):
+        """Test get_orphan_bnp_port_maps method."""
+        phy_switch = self._add_bnp_switch_port_map()
+        db.add_bnp_neutron_port(self.ctx, self._get_bnp_neutron_port_dict())
+        port_maps = db.get_orphan_bnp_port_maps(self.ctx, 10)
+        self.assertEqual(1, len(port_maps))
+        self.assertEqual(("1234", phy_switch['id'], "1", 100),
+                         tuple(port_maps[0]))
+        self.assertEqual([], db.get_orphan_bnp_port_maps(self.ctx, 0))
+        self.assertEqual(1, len(db.get_orphan_bnp_port_maps(self.ctx, None,
+                                                            [100, 200])))
+        self.assertEqual([], db.get_orphan_bnp_port_maps(self.ctx, None,
+                                                         [200]))
+
+    def test_record_binding(self):
+        """Test record_binding method."""
+        sw_dict = self._get_bnp_phys_switch_dict()
+        phy_switch = db.add_bnp_phys_switch(self.ctx, sw_dict)
+        bindings = []
+        for port_id in ("1234", "5678"):
+            binding = self._get_bnp_switch_port_map_dict()
+            binding.update(self._get_bnp_neutron_port_dict())
+            binding['neutron_port_id'] = port_id
+            binding['switch_id'] = phy_switch['id']
+            bindings.append(binding)
+        db.record_binding(self.ctx, bindings)
+        count = self.ctx.session.query(models.BNPSwitchPortMapping).count()
+        self.assertEqual(2, count)
+        count = self.ctx.session.query(models.BNPNeutronPort).count()
+        self.assertEqual(2, count)
+        self.assertEqual(2, db.get_bnp_vlan_port_count(self.ctx,
+                                                       phy_switch['id'], 100))
+        self.ctx.session.expire_all()
+        switch = db.get_bnp_phys_switch(self.ctx, phy_switch['id'])
+        self.assertEqual(const.SUCCESS, switch['validation_result'])
+        # left to the caller to bump once committed
+        self.assertEqual(0, db.get_bnp_generation(
+            self.ctx, const.BNP_SWITCH_PORTS_GENERATION))
+
+    def test_finish_bnp_validation_job(self):
+        """Test the validation result of the latest job is kept."""
+        sw_dict = self._get_bnp_phys_switch_dict()
+        switch_id = db.add_bnp_phys_switch(self.ctx, sw_dict)['id']
+        old_job = db.add_bnp_validation_job(self.ctx, switch_id)
+        new_job = db.add_bnp_validation_job(self.ctx, switch_id)
+        new_job.created_at = old_job.created_at + datetime.timedelta(0, 1)
+        self.ctx.session.flush()
+        db.finish_bnp_validation_job(self.ctx, new_job['id'], const.SUCCESS)
+        db.finish_bnp_validation_job(self.ctx, old_job['id'],
+                                     const.DEVICE_NOT_REACHABLE)
+        self.ctx.session.expire_all()
+        switch = db.get_bnp_phys_switch(self.ctx, switch_id)
+        self.assertEqual(const.SUCCESS, switch['validation_result'])
+        job = db.get_bnp_validation_job(self.ctx, old_job['id'])
+        self.assertEqual(const.JOB_DONE, job['status'])
+        self.assertEqual(const.DEVICE_NOT_REACHABLE, job['validation_result'])
+        job = db.get_last_bnp_validation_job(self.ctx, switch_id)
+        self.assertEqual(new_job['id'], job['id'])
+
+    def test_delete_finished_bnp_validation_jobs(self):
+        """Test old finished jobs go, the latest of each switch stays."""
+        sw_dict = self._get_bnp_phys_switch_dict()
+        switch_id = db.add_bnp_phys_switch(self.ctx, sw_dict)['id']
+        jobs = [db.add_bnp_validation_job(self.ctx, switch_id)
+                for index in range(4)]
+        for index, job in enumerate(jobs):
+            job.created_at += datetime.timedelta(0, index)
+        self.ctx.session.flush()
+        for job in jobs[:3]:
+            db.finish_bnp_validation_job(self.ctx, job['id'], const.SUCCESS)
+        self.assertEqual(0, db.delete_finished_bnp_validation_jobs(
+            self.ctx, 3600, 10))
+        with mock.patch.object(db.timeutils, 'utcnow',
+                               return_value=timeutils.utcnow() +
+                               datetime.timedelta(0, 7200)):
+            self.assertEqual(1, db.delete_finished_bnp_validation_jobs(
+                self.ctx, 3600, 1))
+            self.assertEqual(2, db.delete_finished_bnp_validation_jobs(
+                self.ctx, 3600, 10))
+        job_ids = [job_id for job_id, in self.ctx.session.query(
+            models.BNPValidationJob.id)]
+        self.assertEqual([jobs[3]['id']], job_ids)
+
+    def test_update_bnp_switch_health(self):
+        """Test update_bnp_switch_health adds then updates the health."""
+        sw_dict = self._get_bnp_phys_switch_dict()
+        switch_id = db.add_bnp_phys_switch(self.ctx, sw_dict)['id']
+        self.assertIsNone(db.get_bnp_switch_health(self.ctx, switch_id))
+        db.update_bnp_switch_health(self.ctx, switch_id,
+                                    {'reachable': True, 'rtt': 0.5})
+        db.update_bnp_switch_health(self.ctx, switch_id,
+                                    {'reachable': False, 'error_count': 1})
+        health = db.get_all_bnp_switch_health(self.ctx)[switch_id]
+        self.assertFalse(health['reachable'])
+        self.assertEqual(0.5, health['rtt'])
+        self.assertEqual(1, health['error_count'])
+        self.assertEqual(const.CIRCUIT_CLOSED, health['circuit_state'])
+
+    def test_update_bnp_switch_vlan(self):
+        """Test the versioned update of bnp_switch_vlans."""
+        sw_dict = self._get_bnp_phys_switch_dict()
+        switch_id = db.add_bnp_phys_switch(self.ctx, sw_dict)['id']
+        self.assertIsNone(db.get_bnp_switch_vlan(self.ctx, switch_id, 100))
+        # version 0 stores the first bitmap of the vlan only
+        self.assertTrue(db.update_bnp_switch_vlan(self.ctx, switch_id, 100,
+                                                  '\x80', 0))
+        self.assertFalse(db.update_bnp_switch_vlan(self.ctx, switch_id, 100,
+                                                   '\x40', 0))
+        vlan = db.get_bnp_switch_vlan(self.ctx, switch_id, 100)
+        self.assertEqual(('\x80', 1), (vlan.egress_bitmap, vlan.version))
+        self.assertTrue(db.update_bnp_switch_vlan(self.ctx, switch_id, 100,
+                                                  '\xc0', 1))
+        self.assertFalse(db.update_bnp_switch_vlan(self.ctx, switch_id, 100,
+                                                   '\xe0', 1))
+        vlan = db.get_bnp_switch_vlan(self.ctx, switch_id, 100)
+        self.assertEqual(('\xc0', 2), (vlan.egress_bitmap, vlan.version))
+
+    def test_update_bnp_vlan_port_count(self):
+        """Test get and update of bnp_vlan_port_counts."""
+        sw_dict = self._get_bnp_phys_switch_dict()
+        phy_switch = db.add_bnp_phys_switch(self.ctx, sw_dict)
+        switch_id = phy_switch['id']
+        self.assertEqual(0, db.get_bnp_vlan_port_count(self.ctx, switch_id,
+                                                       100))
+        db.update_bnp_vlan_port_count(self.ctx, switch_id, 100, 1)
+        db.update_bnp_vlan_port_count(self.ctx, switch_id, 100, 2)
+        self.assertEqual(3, db.get_bnp_vlan_port_count(self.ctx, switch_id,
+                                                       100))
+        self.assertEqual(0, db.get_bnp_vlan_port_count(self.ctx, switch_id,
+                                                       200))
+        db.update_bnp_vlan_port_count(self.ctx, switch_id, 100, -3)
+        count = self.ctx.session.query(models.BNPVlanPortCount).count()
+        self.assertEqual(0, count)
+
+    def test_update_bnp_vlan_port_count_concurrent_first_bind(self):
+        """Test a first bind racing with another one adds to its row."""
+        sw_dict = self._get_bnp_phys_switch_dict()
+        switch_id = db.add_bnp_phys_switch(self.ctx, sw_dict)['id']
+        db.update_bnp_vlan_port_count(self.ctx, switch_id, 100, 1)
+        update = orm.Query.update
+        missed = []
+
+        def racing_update(query, values, **kwargs):
+            # the row of the other bind is not seen by the first update
+            if not missed:
+                missed.append(query)
+                return 0
+            return update(query, values, **kwargs)
+
+        with mock.patch.object(orm.Query, 'update', racing_update):
+            db.update_bnp_vlan_port_count(self.ctx, switch_id, 100, 2)
+        self.assertEqual(3, db.get_bnp_vlan_port_count(self.ctx, switch_id,
+                                                       100))
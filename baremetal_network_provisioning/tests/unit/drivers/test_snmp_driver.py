@@ -116,6 +116,95 @@ class TestSnmpDriver(base.BaseTestCase):
                               self.driver.set_isolation,
                               self.port)
 
+    def test_update_isolation(self):
+        self.port = self._get_port_payload()
+        self.port['port']['del_ifindexes'] = ['1', '2']
+        self.client = snmp_client.get_client(self.snmp_info)
+        prov_driver_instance = prov_driver.SNMPProvisioningDriver
+        with contextlib.nested(mock.patch.object(snmp_client, 'get_client',
+                                                 return_value=self.client),
+                               mock.patch.object(snmp_client.SNMPClient, 'set',
+                                                 return_value=None),
+                               mock.patch.object(prov_driver_instance,
+                                                 '_get_device_nibble_map',
+                                                 return_value='\xc0'),
+                               mock.patch.object(prov_driver_instance,
+                                                 '_create_vlan_if_absent')):
+            self.driver.update_isolation(self.port)
+            self.assertEqual(1, snmp_client.SNMPClient.set.call_count)
+            self.assertFalse(prov_driver_instance.
+                             _create_vlan_if_absent.called)
+            egress = snmp_client.SNMPClient.set.call_args[0][1]
+            self.assertEqual('\x00', str(egress))
+
+    def test_update_isolation_from_stored_bitmap(self):
+        self.port = self._get_port_payload()
+        self.port['port']['add_ifindexes'] = ['2']
+        self.port['port']['egress_bitmap'] = '\x80'
+        self.client = snmp_client.get_client(self.snmp_info)
+        prov_driver_instance = prov_driver.SNMPProvisioningDriver
+        with contextlib.nested(mock.patch.object(snmp_client, 'get_client',
+                                                 return_value=self.client),
+                               mock.patch.object(snmp_client.SNMPClient, 'set',
+                                                 return_value=None),
+                               mock.patch.object(prov_driver_instance,
+                                                 '_get_device_nibble_map'),
+                               mock.patch.object(prov_driver_instance,
+                                                 '_create_vlan_if_absent')):
+            egress_bitmap = self.driver.update_isolation(self.port)
+            self.assertEqual('\xc0', egress_bitmap)
+            self.assertEqual(1, snmp_client.SNMPClient.set.call_count)
+            self.assertFalse(prov_driver_instance.
+                             _get_device_nibble_map.called)
+            self.assertFalse(prov_driver_instance.
+                             _create_vlan_if_absent.called)
+
+    def test_sync_vlans(self):
+        self.client = snmp_client.get_client(self.snmp_info)
+        values = [rfc1902.Integer32(1), rfc1902.OctetString('\x80\x00'),
+                  None, None]
+        creds_dict = self._get_credentials_dict()
+        creds_dict['management_protocol'] = 'snmpv2c'
+        port = {'port': {'credentials': creds_dict,
+                         'vlans': {100: ['2', '1'], 200: ['9']}}}
+        with contextlib.nested(mock.patch.object(snmp_client, 'get_client',
+                                                 return_value=self.client),
+                               mock.patch.object(snmp_client.SNMPClient,
+                                                 'get_existing',
+                                                 return_value=values),
+                               mock.patch.object(snmp_client.SNMPClient,
+                                                 'set_multiple')):
+            result = self.driver.sync_vlans(port)
+            self.assertEqual(
+                1, snmp_client.SNMPClient.get_existing.call_count)
+            create, egress = snmp_client.SNMPClient.set_multiple.call_args_list
+        self.assertEqual({'created': False, 'added_ifindexes': [2],
+                          'egress_bitmap': '\xc0\x00'}, result[100])
+        self.assertEqual({'created': True, 'added_ifindexes': [9],
+                          'egress_bitmap': '\x00\x80'}, result[200])
+        self.assertEqual([hp_const.OID_VLAN_CREATE + '.200'],
+                         [oid for oid, value in create[0][0]])
+        self.assertEqual([hp_const.OID_VLAN_EGRESS_PORT + '.100',
+                          hp_const.OID_VLAN_EGRESS_PORT + '.200'],
+                         [oid for oid, value in egress[0][0]])
+
+    def test_sync_vlans_fallback(self):
+        base_driver = prov_driver.driver.PortProvisioningDriver
+        port = {'port': {'credentials': self._get_credentials_dict(),
+                         'vlans': {100: ['1', '2']}}}
+        with mock.patch.object(prov_driver.SNMPProvisioningDriver,
+                               'set_isolation',
+                               side_effect=['\x80', '\xc0']) as set_iso:
+            result = base_driver.sync_vlans(self.driver, port)
+            calls = set_iso.call_args_list
+        self.assertEqual({100: {'created': False,
+                                'added_ifindexes': ['1', '2'],
+                                'egress_bitmap': '\xc0'}}, result)
+        self.assertEqual([[{'ifindex': '1'}], [{'ifindex': '2'}]],
+                         [call[0][0]['port']['switchports']
+                          for call in calls])
+        self.assertEqual(100, calls[0][0][0]['port']['segmentation_id'])
+
     def test__get_device_nibble_map(self):
         self.client = snmp_client.get_client(self.snmp_info)
         seg_id = 1001
@@ -97,6 +97,42 @@ class TestBnpCredential(test_plugin.NeutronDbPluginV2TestCase,
             os.path.isfile.called
             return result
 
+    def test_list_show_delete_credentials(self):
+        snmp = self._test_create_credential_for_snmp(self.snmpv2c_data)
+        netconf = self._test_create_credential_for_netconf(
+            self.netconf_soap_data)
+        ids = sorted([snmp['bnp_credential']['id'],
+                      netconf['bnp_credential']['id']])
+        list_req = self.new_list_request('bnp-credentials', params='limit=1')
+        result = self.bnp_wsgi_controller.index(list_req)
+        self.assertEqual([ids[0]],
+                         [cred['id'] for cred in result['bnp_credentials']])
+        self.assertEqual('next', result['bnp_credentials_links'][0]['rel'])
+        list_req = self.new_list_request(
+            'bnp-credentials', params='protocol_type=netconf_soap')
+        result = self.bnp_wsgi_controller.index(list_req)
+        self.assertEqual([{'id': netconf['bnp_credential']['id'],
+                           'name': "CRED1",
+                           'protocol_type': "netconf_soap"}],
+                         result['bnp_credentials'])
+        show_req = self.new_show_request('bnp-credentials', ids[1])
+        result = self.bnp_wsgi_controller.show(show_req, ids[1])
+        self.assertEqual(ids[1], result['bnp_credential']['id'])
+        for cred_id in ids:
+            delete_req = self.new_delete_request('bnp-credentials', cred_id)
+            self.bnp_wsgi_controller.delete(delete_req, cred_id)
+        list_req = self.new_list_request('bnp-credentials')
+        result = self.bnp_wsgi_controller.index(list_req)
+        self.assertEqual([], result['bnp_credentials'])
+        self.assertRaises(webob.exc.HTTPNotFound,
+                          self.bnp_wsgi_controller.show, show_req, ids[1])
+
+    def test_list_credentials_invalid_filter(self):
+        list_req = self.new_list_request('bnp-credentials',
+                                         params='write_community=public')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.bnp_wsgi_controller.index, list_req)
+
     def test_create_valid_cred_for_snmp(self):
         body_snmpv3 = {"bnp_credential":
                        {"name": "CRED1",
@@ -0,0 +1,79 @@
+# Copyright (c) 2016 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import webob.exc
+
+from neutron import context
+from neutron.tests.unit.db import test_db_base_plugin_v2 as test_plugin
+from neutron.tests.unit import testlib_api
+
+from baremetal_network_provisioning.common import metrics
+from baremetal_network_provisioning.db import bm_nw_provision_db as db
+from baremetal_network_provisioning.ml2.extensions import bnp_stats
+
+
+class TestBnpStats(test_plugin.NeutronDbPluginV2TestCase,
+                   testlib_api.WebTestCase):
+
+    def setUp(self):
+        super(TestBnpStats, self).setUp()
+        self.bnp_wsgi_controller = bnp_stats.BNPStatsController()
+        self.ctx = context.get_admin_context()
+        self.addCleanup(metrics._windows.clear)
+        self.addCleanup(metrics._histograms.clear)
+
+    def _add_switch(self):
+        data = {'vendor': "hpe",
+                'name': "switch1",
+                'family': "hp5900",
+                'management_protocol': "snmpv1",
+                'port_provisioning': "ENABLED",
+                'mac_address': "44:31:92:61:89:d2",
+                'credentials': "cred1",
+                'ip_address': "105.0.1.109",
+                'validation_result': "success"}
+        return db.add_bnp_phys_switch(self.ctx, data)
+
+    def test_list_stats(self):
+        sw = self._add_switch()
+        db.update_bnp_vlan_port_count(self.ctx, sw['id'], 100, 2)
+        db.update_bnp_vlan_port_count(self.ctx, sw['id'], 200, 1)
+        db.update_bnp_vlan_port_count(self.ctx, sw['id'], 200, -1)
+        metrics.record_outcome('bind', sw['id'], False)
+        metrics.observe('bind_port.set_isolation', 0.2)
+        list_req = self.new_list_request('bnp-stats')
+        result = self.bnp_wsgi_controller.index(list_req)
+        stats = result['bnp_stats'][0]
+        self.assertEqual(sw['id'], stats['switch_id'])
+        self.assertEqual(2, stats['bound_ports'])
+        self.assertEqual(1, stats['active_vlans'])
+        self.assertEqual(
+            1.0, stats[metrics.OUTCOMES]['bind']['60']['failure_rate'])
+        overall = result['bnp_stats_overall']
+        self.assertEqual(2, overall['bound_ports'])
+        self.assertEqual(
+            1, overall[metrics.OUTCOMES]['bind']['60']['failures'])
+        histogram = result['bnp_stats_histograms']['bind_port.set_isolation']
+        self.assertEqual(1, histogram['count'])
+        self.assertEqual(1, histogram['buckets']['0.25'])
+
+    def test_show_stats(self):
+        sw = self._add_switch()
+        show_req = self.new_show_request('bnp-stats', sw['id'])
+        result = self.bnp_wsgi_controller.show(show_req, sw['id'])
+        self.assertEqual(0, result['bnp_stat']['bound_ports'])
+        self.assertEqual({}, result['bnp_stat'][metrics.LATENCIES])
+        self.assertRaises(webob.exc.HTTPNotFound,
+                          self.bnp_wsgi_controller.show, show_req, 'fake-id')
@@ -14,14 +14,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+import datetime
+
+import mock
+from oslo_utils import timeutils
+import webob.exc
+
 from neutron.api import extensions
 from neutron.common import config
+from neutron.common import exceptions as n_exc
+from neutron import context
 import neutron.extensions
 from neutron.plugins.ml2 import config as ml2_config
 from neutron.tests.unit.api.v2 import test_base
 from neutron.tests.unit.db import test_db_base_plugin_v2 as test_plugin
 from neutron.tests.unit import testlib_api
 
+from baremetal_network_provisioning.common import constants as const
+from baremetal_network_provisioning.db import bm_nw_provision_db as db
+from baremetal_network_provisioning.db import bm_nw_provision_models as models
 from baremetal_network_provisioning.ml2.extensions import bnp_switch
 
 
@@ -193,3 +205,428 @@ class TestBnpSwitches(test_plugin.NeutronDbPluginV2TestCase,
                                    "write_community": "public"}}}
         self.assertRaises(webob.exc.HTTPBadRequest,
                           self._update_switch, data, switch_id)'''
+
+    def test_list_switches_paginated(self):
+        ctx = context.get_admin_context()
+        for index in range(3):
+            switch = {'name': "switch%d" % index,
+                      'ip_address': "1.1.1.%d" % index,
+                      'mac_address': "44:31:92:dc:2e:c%d" % index,
+                      'port_provisioning': "ENABLED",
+                      'management_protocol': "snmpv2c",
+                      'credentials': "cred1",
+                      'validation_result': "Success",
+                      'vendor': "hpe",
+                      'family': None}
+            db.add_bnp_phys_switch(ctx, switch)
+        list_req = self.new_list_request(
+            'bnp-switches',
+            params='limit=2&sort_key=name&sort_dir=desc&fields=name')
+        result = self.bnp_wsgi_controller.index(list_req)
+        self.assertEqual([{'name': "switch2"}, {'name': "switch1"}],
+                         result['bnp_switches'])
+        self.assertEqual('next', result['bnp_switches_links'][0]['rel'])
+
+    def test_list_switches_invalid_filter(self):
+        list_req = self.new_list_request('bnp-switches', params='pod=pod1')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.bnp_wsgi_controller.index, list_req)
+
+    def test_list_switches_unknown_marker(self):
+        list_req = self.new_list_request('bnp-switches',
+                                         params='limit=2&marker=unknown')
+        self.assertRaises(n_exc.BadRequest,
+                          self.bnp_wsgi_controller.index, list_req)
+
+    def _add_snmp_cred(self, ctx, name):
+        return db.add_bnp_snmp_cred(ctx, {'name': name,
+                                          'protocol_type': "snmpv2c",
+                                          'write_community': "private",
+                                          'security_name': None,
+                                          'auth_protocol': None,
+                                          'auth_key': None,
+                                          'priv_protocol': None,
+                                          'priv_key': None,
+                                          'security_level': None})
+
+    def test_update_switch_stores_credential_id(self):
+        ctx = context.get_admin_context()
+        cred = self._add_snmp_cred(ctx, "cred2")
+        switch = {'name': "switch1",
+                  'ip_address': "1.1.1.1",
+                  'mac_address': "44:31:92:dc:2e:c0",
+                  'port_provisioning': "ENABLED",
+                  'management_protocol': "snmpv2c",
+                  'credentials': "cred-id",
+                  'validation_result': "Success",
+                  'vendor': "hpe",
+                  'family': None}
+        switch_id = db.add_bnp_phys_switch(ctx, switch)['id']
+        data = {'bnp_switch': {'credentials': "cred2"}}
+        update_req = self.new_update_request('bnp-switches', data, switch_id)
+        self.bnp_wsgi_controller.update(update_req, switch_id)
+        switch = db.get_bnp_phys_switch(ctx, switch_id)
+        self.assertEqual(cred['id'], switch['credentials'])
+
+    def test_create_switches_bulk(self):
+        ctx = context.get_admin_context()
+        cred = self._add_snmp_cred(ctx, "cred1")
+        switches = [{'name': "switch%d" % index,
+                     'ip_address': "1.1.1.%d" % index,
+                     'mac_address': "44:31:92:dc:2e:c%d" % index,
+                     'management_protocol': "snmpv2c",
+                     'credentials': "cred1",
+                     'vendor': "hpe"} for index in range(3)]
+        switches[1]['credentials'] = "cred2"
+        switches[2]['mac_address'] = switches[0]['mac_address']
+        create_req = self.new_create_request(
+            'bnp-switches', {'bnp_switches': switches}, 'json')
+        with mock.patch.object(bnp_switch.eventlet, 'spawn_n') as spawn_n:
+            result = self.bnp_wsgi_controller.create(create_req)
+        results = result['bnp_switches']
+        self.assertEqual(const.VALIDATION_PENDING,
+                         results[0]['validation_result'])
+        self.assertEqual(cred['id'], results[0]['credentials'])
+        self.assertIn('error', results[1])
+        self.assertIn('error', results[2])
+        job_ids = spawn_n.call_args[0][1]
+        self.assertEqual([results[0]['validation_job']], job_ids)
+        with mock.patch.object(bnp_switch.BNPSwitchController,
+                               'validate_protocol',
+                               return_value=const.SUCCESS):
+            self.bnp_wsgi_controller.run_validation_jobs(job_ids)
+        switches = db.get_all_bnp_phys_switches(ctx)
+        self.assertEqual([results[0]['id']], [sw['id'] for sw in switches])
+        self.assertEqual(const.SUCCESS, switches[0]['validation_result'])
+
+    def test_create_switch_validates_in_background(self):
+        ctx = context.get_admin_context()
+        cred = self._add_snmp_cred(ctx, "cred1")
+        data = {'bnp_switch': {'name': "switch1",
+                               'ip_address': "1.1.1.1",
+                               'mac_address': "44:31:92:dc:2e:c0",
+                               'management_protocol': "snmpv2c",
+                               'credentials': cred['id'],
+                               'vendor': "hpe"}}
+        create_req = self.new_create_request('bnp-switches', data, 'json')
+        with mock.patch.object(bnp_switch.eventlet, 'spawn_n') as spawn_n:
+            result = self.bnp_wsgi_controller.create(create_req)
+        switch = result['bnp_switch']
+        self.assertEqual(const.VALIDATION_PENDING,
+                         switch['validation_result'])
+        show_req = self.new_show_request('bnp-switches', switch['id'])
+        job = self.bnp_wsgi_controller.validation(
+            show_req, switch['id'])['validation_job']
+        self.assertEqual(switch['validation_job'], job['id'])
+        self.assertEqual(const.JOB_PENDING, job['status'])
+        with mock.patch.object(bnp_switch.BNPSwitchController,
+                               'validate_protocol',
+                               return_value=const.SUCCESS):
+            self.bnp_wsgi_controller.run_validation_jobs(
+                *spawn_n.call_args[0][1:])
+        job = self.bnp_wsgi_controller.validation(
+            show_req, switch['id'])['validation_job']
+        self.assertEqual(const.JOB_DONE, job['status'])
+        switch = db.get_bnp_phys_switch(ctx, switch['id'])
+        self.assertEqual(const.SUCCESS, switch['validation_result'])
+
+    def test_run_stale_validation_jobs(self):
+        ctx = context.get_admin_context()
+        cred = self._add_snmp_cred(ctx, "cred1")
+        switch = {'name': "switch1",
+                  'ip_address': "1.1.1.1",
+                  'mac_address': "44:31:92:dc:2e:c0",
+                  'port_provisioning': "ENABLED",
+                  'management_protocol': "snmpv2c",
+                  'credentials': cred['id'],
+                  'validation_result': const.VALIDATION_PENDING,
+                  'vendor': "hpe",
+                  'family': None}
+        switch_id = db.add_bnp_phys_switch(ctx, switch)['id']
+        job = db.add_bnp_validation_job(ctx, switch_id)
+        # claimed by a worker that stopped before finishing it
+        self.assertTrue(db.claim_bnp_validation_job(ctx, job['id'], 300))
+        self.assertIsNone(db.claim_bnp_validation_job(ctx, job['id'], 300))
+        self.assertEqual([], db.get_stale_bnp_validation_job_ids(ctx, 300))
+        with mock.patch.object(bnp_switch.BNPSwitchController,
+                               'validate_protocol',
+                               return_value=const.SUCCESS):
+            self.bnp_wsgi_controller.run_stale_validation_jobs()
+        self.assertEqual(const.JOB_RUNNING,
+                         db.get_bnp_validation_job(ctx, job['id'])['status'])
+        started_at = timeutils.utcnow() - datetime.timedelta(0, 301)
+        ctx.session.query(models.BNPValidationJob).update(
+            {'started_at': started_at})
+        with mock.patch.object(bnp_switch.BNPSwitchController,
+                               'validate_protocol',
+                               return_value=const.SUCCESS):
+            self.bnp_wsgi_controller.run_stale_validation_jobs()
+        ctx.session.expire_all()
+        self.assertEqual(const.JOB_DONE,
+                         db.get_bnp_validation_job(ctx, job['id'])['status'])
+        switch = db.get_bnp_phys_switch(ctx, switch_id)
+        self.assertEqual(const.SUCCESS, switch['validation_result'])
+
+    def test_bulk_update_switches(self):
+        ctx = context.get_admin_context()
+        old_cred = self._add_snmp_cred(ctx, "cred1")
+        new_cred = self._add_snmp_cred(ctx, "cred2")
+        for index in range(3):
+            switch = {'name': "switch%d" % index,
+                      'ip_address': "1.1.1.%d" % index,
+                      'mac_address': "44:31:92:dc:2e:c%d" % index,
+                      'port_provisioning': "ENABLED",
+                      'management_protocol': "snmpv2c",
+                      'credentials': old_cred['id'],
+                      'validation_result': "Success",
+                      'vendor': "hpe",
+                      'family': None}
+            db.add_bnp_phys_switch(ctx, switch)
+        data = {'bnp_switch': {'filters': {'name': ["switch0", "switch2"]},
+                               'port_provisioning': "disable",
+                               'credentials': "cred2"}}
+        update_req = self.new_update_request('bnp-switches', data,
+                                             'bulk_update')
+        with mock.patch.object(bnp_switch.eventlet, 'spawn_n') as spawn_n:
+            result = self.bnp_wsgi_controller.bulk_update(update_req)
+        self.assertEqual(2, result['updated'])
+        job_ids = spawn_n.call_args[0][1]
+        self.assertEqual(job_ids, result['validation_jobs'])
+        self.assertEqual(2, len(job_ids))
+        for switch in db.get_all_bnp_phys_switches(ctx):
+            if switch['name'] == "switch1":
+                self.assertEqual("ENABLED", switch['port_provisioning'])
+                self.assertEqual(old_cred['id'], switch['credentials'])
+            else:
+                self.assertEqual("DISABLED", switch['port_provisioning'])
+                self.assertEqual(new_cred['id'], switch['credentials'])
+                self.assertEqual(const.VALIDATION_PENDING,
+                                 switch['validation_result'])
+        with mock.patch.object(bnp_switch.BNPSwitchController,
+                               'validate_protocol',
+                               return_value=const.SUCCESS):
+            self.bnp_wsgi_controller.run_validation_jobs(job_ids)
+        switches = db.get_all_bnp_phys_switches(ctx, name="switch2")
+        self.assertEqual(const.SUCCESS, switches[0]['validation_result'])
+
+    def test_bulk_update_switches_invalid_filter(self):
+        data = {'bnp_switch': {'filters': {'pod': "pod1"},
+                               'port_provisioning': "disable"}}
+        update_req = self.new_update_request('bnp-switches', data,
+                                             'bulk_update')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.bnp_wsgi_controller.bulk_update, update_req)
+
+    def test_bulk_update_switches_invalid_filter_value(self):
+        for value in (1, {'name': "switch1"}, [], ["switch1", None]):
+            data = {'bnp_switch': {'filters': {'name': value},
+                                   'port_provisioning': "disable"}}
+            update_req = self.new_update_request('bnp-switches', data,
+                                                 'bulk_update')
+            self.assertRaises(webob.exc.HTTPBadRequest,
+                              self.bnp_wsgi_controller.bulk_update,
+                              update_req)
+
+    def test_bulk_update_switches_empty_filters(self):
+        data = {'bnp_switch': {'filters': {},
+                               'port_provisioning': "disable"}}
+        update_req = self.new_update_request('bnp-switches', data,
+                                             'bulk_update')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.bnp_wsgi_controller.bulk_update, update_req)
+
+    def test_bulk_update_all_switches(self):
+        ctx = context.get_admin_context()
+        cred = self._add_snmp_cred(ctx, "cred1")
+        for index in range(2):
+            switch = {'name': "switch%d" % index,
+                      'ip_address': "1.1.1.%d" % index,
+                      'mac_address': "44:31:92:dc:2e:c%d" % index,
+                      'port_provisioning': "ENABLED",
+                      'management_protocol': "snmpv2c",
+                      'credentials': cred['id'],
+                      'validation_result': "Success",
+                      'vendor': "hpe",
+                      'family': None}
+            db.add_bnp_phys_switch(ctx, switch)
+        data = {'bnp_switch': {'all': True,
+                               'port_provisioning': "disable"}}
+        update_req = self.new_update_request('bnp-switches', data,
+                                             'bulk_update')
+        result = self.bnp_wsgi_controller.bulk_update(update_req)
+        self.assertEqual({'updated': 2, 'validation_jobs': []}, result)
+        for switch in db.get_all_bnp_phys_switches(ctx):
+            self.assertEqual("DISABLED", switch['port_provisioning'])
+
+    def test_resync_switch(self):
+        ctx = context.get_admin_context()
+        switch_id = self._add_resync_switch(ctx)
+        driver = mock.Mock()
+        driver.obj.sync_vlans.return_value = {
+            100: {'created': True, 'added_ifindexes': [1, 2],
+                  'egress_bitmap': '\xc0'}}
+        update_req = self.new_update_request('bnp-switches', {}, switch_id)
+        with mock.patch.object(bnp_switch.BNPSwitchController,
+                               '_protocol_driver', return_value=driver):
+            result = self.bnp_wsgi_controller.resync(update_req, switch_id)
+        vlans = driver.obj.sync_vlans.call_args[0][0]['port']['vlans']
+        self.assertEqual({100: ["1", "2"]},
+                         dict((seg_id, sorted(ifindexes))
+                              for seg_id, ifindexes in vlans.items()))
+        self.assertEqual({'switch_id': switch_id, 'vlans': 1, 'ports': 2,
+                          'changes': [{'segmentation_id': 100,
+                                       'created': True,
+                                       'added_ifindexes': [1, 2]}],
+                          'skipped': []},
+                         result['bnp_switch_resync'])
+        vlan = db.get_bnp_switch_vlan(ctx, switch_id, 100)
+        self.assertEqual('\xc0', vlan.egress_bitmap)
+
+    def _add_resync_switch(self, ctx):
+        cred = self._add_snmp_cred(ctx, "cred1")
+        switch = {'name': "switch1",
+                  'ip_address': "1.1.1.1",
+                  'mac_address': "44:31:92:dc:2e:c0",
+                  'port_provisioning': "ENABLED",
+                  'management_protocol': "snmpv2c",
+                  'credentials': cred['id'],
+                  'validation_result': "Success",
+                  'vendor': "hpe",
+                  'family': None}
+        switch_id = db.add_bnp_phys_switch(ctx, switch)['id']
+        for port_id, ifindex in (("24", "1"), ("25", "2")):
+            self._bind_resync_port(ctx, switch_id, port_id, ifindex)
+        return switch_id
+
+    def _bind_resync_port(self, ctx, switch_id, port_id, ifindex):
+        mapping_dict = {'neutron_port_id': port_id,
+                        'switch_port_name': "Ten-GigabitEthernet1/0/1",
+                        'switch_id': switch_id,
+                        'lag_id': None,
+                        'access_type': "access",
+                        'segmentation_id': 100,
+                        'bind_status': 0,
+                        'ifindex': ifindex}
+        db.add_bnp_switch_port_map(ctx, mapping_dict)
+        db.add_bnp_neutron_port(ctx, mapping_dict)
+
+    def test_resync_switch_concurrent_bind(self):
+        ctx = context.get_admin_context()
+        switch_id = self._add_resync_switch(ctx)
+        synced = []
+
+        def sync_vlans(port):
+            synced.append(sorted(port['port']['vlans'][100]))
+            if len(synced) == 1:
+                # a bind of port 26 completes during the first sync
+                bind_ctx = context.get_admin_context()
+                self._bind_resync_port(bind_ctx, switch_id, "26", "3")
+                db.update_bnp_switch_vlan(bind_ctx, switch_id, 100, '\x20',
+                                          0)
+                return {100: {'created': True, 'added_ifindexes': [1, 2],
+                              'egress_bitmap': '\xc0'}}
+            return {100: {'created': False, 'added_ifindexes': [1, 2],
+                          'egress_bitmap': '\xe0'}}
+
+        driver = mock.Mock()
+        driver.obj.sync_vlans.side_effect = sync_vlans
+        update_req = self.new_update_request('bnp-switches', {}, switch_id)
+        with mock.patch.object(bnp_switch.BNPSwitchController,
+                               '_protocol_driver', return_value=driver):
+            result = self.bnp_wsgi_controller.resync(update_req, switch_id)
+        self.assertEqual([["1", "2"], ["1", "2", "3"]], synced)
+        self.assertEqual([], result['bnp_switch_resync']['skipped'])
+        self.assertEqual([{'segmentation_id': 100, 'created': False,
+                           'added_ifindexes': [1, 2]}],
+                         result['bnp_switch_resync']['changes'])
+        ctx.session.expire_all()
+        vlan = db.get_bnp_switch_vlan(ctx, switch_id, 100)
+        self.assertEqual(('\xe0', 2), (vlan.egress_bitmap, vlan.version))
+
+    def test_resync_switch_skips_busy_vlan(self):
+        ctx = context.get_admin_context()
+        switch_id = self._add_resync_switch(ctx)
+        db.update_bnp_switch_vlan(ctx, switch_id, 100, '\xc0')
+        driver = mock.Mock()
+        driver.obj.sync_vlans.return_value = {
+            100: {'created': False, 'added_ifindexes': [],
+                  'egress_bitmap': '\xc0'}}
+        update_req = self.new_update_request('bnp-switches', {}, switch_id)
+        with contextlib.nested(
+                mock.patch.object(bnp_switch.BNPSwitchController,
+                                  '_protocol_driver', return_value=driver),
+                mock.patch.object(db, 'update_bnp_switch_vlan',
+                                  return_value=False)):
+            result = self.bnp_wsgi_controller.resync(update_req, switch_id)
+        self.assertEqual([100], result['bnp_switch_resync']['skipped'])
+        self.assertEqual(const.VLAN_EGRESS_RETRIES + 1,
+                         driver.obj.sync_vlans.call_count)
+
+    def test_show_switch_health(self):
+        ctx = context.get_admin_context()
+        cred = self._add_snmp_cred(ctx, "cred1")
+        switch = {'name': "switch1",
+                  'ip_address': "1.1.1.1",
+                  'mac_address': "44:31:92:dc:2e:c0",
+                  'port_provisioning': "ENABLED",
+                  'management_protocol': "snmpv2c",
+                  'credentials': cred['id'],
+                  'validation_result': "Success",
+                  'vendor': "hpe",
+                  'family': None}
+        switch_id = db.add_bnp_phys_switch(ctx, switch)['id']
+        show_req = self.new_show_request('bnp-switches', switch_id)
+        self.assertRaises(webob.exc.HTTPNotFound,
+                          self.bnp_wsgi_controller.health,
+                          show_req, switch_id)
+        polled_at = timeutils.utcnow()
+        db.update_bnp_switch_health(ctx, switch_id,
+                                    {'last_poll_at': polled_at,
+                                     'reachable': False,
+                                     'consecutive_failures': 1,
+                                     'error_count': 1,
+                                     'circuit_state': const.CIRCUIT_CLOSED,
+                                     'last_error': const.NO_DRVR_FOUND})
+        health = self.bnp_wsgi_controller.health(
+            show_req, switch_id)['bnp_switch_health']
+        self.assertEqual(switch_id, health['switch_id'])
+        self.assertFalse(health['reachable'])
+        self.assertEqual(const.NO_DRVR_FOUND, health['last_error'])
+        self.assertEqual(const.CIRCUIT_CLOSED, health['circuit_state'])
+
+    def test_show_health_of_invalid_switch(self):
+        show_req = self.new_show_request('bnp-switches', 'unknown')
+        self.assertRaises(webob.exc.HTTPNotFound,
+                          self.bnp_wsgi_controller.health,
+                          show_req, 'unknown')
+
+    def test_show_switch_ports_refresh(self):
+        ctx = context.get_admin_context()
+        cred = self._add_snmp_cred(ctx, "cred1")
+        switch = {'name': "switch1",
+                  'ip_address': "1.1.1.1",
+                  'mac_address': "44:31:92:dc:2e:c0",
+                  'port_provisioning': "ENABLED",
+                  'management_protocol': "snmpv2c",
+                  'credentials': cred['id'],
+                  'validation_result': "Success",
+                  'vendor': "hpe",
+                  'family': None}
+        switch_id = db.add_bnp_phys_switch(ctx, switch)['id']
+        ports = [{'ifindex': '1', 'interface_name': 'Ten-GigabitEthernet1/0/1',
+                  'port_status': '1'}]
+        driver = mock.Mock()
+        driver.obj.get_device_info.return_value = ports
+        show_req = self.new_show_request('bnp-switches', switch_id)
+        result = self.bnp_wsgi_controller.ports(show_req, switch_id)
+        self.assertEqual([], result['bnp_switch_ports']['ports'])
+        self.assertIsNone(result['bnp_switch_ports']['updated_at'])
+        show_req = self._req('GET', 'bnp-switches', id=switch_id,
+                             params='refresh=true')
+        with mock.patch.object(bnp_switch.BNPSwitchController,
+                               '_protocol_driver', return_value=driver):
+            result = self.bnp_wsgi_controller.ports(show_req, switch_id)
+        self.assertEqual(ports, result['bnp_switch_ports']['ports'])
+        creds = driver.obj.get_device_info.call_args[0][0]['port'][
+            'credentials']
+        self.assertEqual("1.1.1.1", creds['ip_address'])
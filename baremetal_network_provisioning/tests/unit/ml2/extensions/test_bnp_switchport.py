@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import webob.exc
+
 from neutron import context
 from neutron.tests.unit.db import test_db_base_plugin_v2 as test_plugin
 from neutron.tests.unit import testlib_api
@@ -54,3 +56,44 @@ class TestBnpSwitchPort(test_plugin.NeutronDbPluginV2TestCase,
         result = self.bnp_wsgi_controller.index(list_req)
         result = result.pop('bnp_switch_ports')
         self.assertEqual(1, len(result))
+        collection, ports = self.bnp_wsgi_controller.iter_index(list_req)
+        self.assertEqual('bnp_switch_ports', collection)
+        self.assertEqual(result, list(ports))
+
+    def test_list_switch_port_filters(self):
+        data = {'vendor': "hpe",
+                'name': "switch1",
+                'family': "hp5900",
+                'management_protocol': "snmpv1",
+                'port_provisioning': "ENABLED",
+                'mac_address': "44:31:92:61:89:d2",
+                'credentials': "cred1",
+                'ip_address': "105.0.1.109",
+                'validation_result': "success"}
+        sw = db.add_bnp_phys_switch(self.ctx, data)
+        ports = [("24", "Ten-GigabitEthernet1/0/1", 3),
+                 ("25", "Ten-GigabitEthernet1/0/2", 7),
+                 ("26", "FortyGigE1/0/49", 5)]
+        for port_id, port_name, seg_id in ports:
+            mapping_dict = {'neutron_port_id': port_id,
+                            'switch_port_name': port_name,
+                            'switch_id': sw['id'],
+                            'lag_id': None,
+                            'access_type': "access",
+                            'segmentation_id': seg_id,
+                            'bind_status': 0,
+                            'ifindex': "8"}
+            db.add_bnp_switch_port_map(self.ctx, mapping_dict)
+            db.add_bnp_neutron_port(self.ctx, mapping_dict)
+        list_req = self.new_list_request(
+            'bnp-switch-ports',
+            params='segmentation_id=1-5,7&switch_port_name=Ten*'
+                   '&switch_name=switch1&switch_name=switch2')
+        result = self.bnp_wsgi_controller.index(list_req)
+        result = result.pop('bnp_switch_ports')
+        self.assertEqual(['24', '25'],
+                         sorted(port['neutron_port_id'] for port in result))
+        list_req = self.new_list_request('bnp-switch-ports',
+                                         params='segmentation_id=9-1')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.bnp_wsgi_controller.index, list_req)
@@ -13,11 +13,14 @@
 #    under the License.
 #
 from baremetal_network_provisioning.common import constants as hp_const
+from baremetal_network_provisioning.db import bm_nw_provision_cache as cache
 from baremetal_network_provisioning.db import bm_nw_provision_db as db
 from baremetal_network_provisioning.db import bm_nw_provision_models as models
 from baremetal_network_provisioning.ml2 import mechanism_hpe as hpe_mech
 
+import collections
 import contextlib
+import datetime
 
 import mock
 from oslo_config import cfg
@@ -99,7 +102,7 @@ class TestHPEMechDriver(base.BaseTestCase):
                               return_value=self._get_port_dict()),
             mock.patch.object(db, 'get_subnets_by_network',
                               return_value=["subnet"]),
-            mock.patch.object(db, 'get_bnp_phys_switch_by_mac',
+            mock.patch.object(cache, 'get_switch_by_mac',
                               return_value=bnp_phys_switch),
             mock.patch.object(db, 'get_bnp_phys_port',
                               return_value=bnp_phys_port)):
@@ -125,6 +128,354 @@ class TestHPEMechDriver(base.BaseTestCase):
                                return_value=portbindings.VNIC_BAREMETAL):
             self.driver.delete_port_precommit(port_context)
 
+    def _delete_port_with_count(self, port_count):
+        """Delete a port of a vlan holding port_count ports."""
+        port_map = mock.Mock(segmentation_id=1001)
+        sw_map = mock.Mock(switch_id='sw1', ifindex='3')
+        bnp_switch = mock.Mock(id='sw1', management_protocol='snmpv2c',
+                               vendor='hpe', family=None)
+        with contextlib.nested(
+                mock.patch.object(hpe_mech.neutron_context,
+                                  'get_admin_context'),
+                mock.patch.object(db, 'get_bnp_neutron_port',
+                                  return_value=port_map),
+                mock.patch.object(db, 'get_bnp_switch_port_mappings',
+                                  return_value=[sw_map]),
+                mock.patch.object(cache, 'get_switch_by_id',
+                                  return_value=bnp_switch),
+                mock.patch.object(db, 'get_bnp_vlan_port_count',
+                                  return_value=port_count),
+                mock.patch.object(hpe_mech.HPEMechanismDriver,
+                                  '_get_credentials_dict', return_value={}),
+                mock.patch.object(hpe_mech.HPEMechanismDriver,
+                                  '_provisioning_driver'),
+                mock.patch.object(hpe_mech.HPEMechanismDriver,
+                                  '_update_vlan_egress')):
+            self.driver.delete_port('port1')
+            db.get_bnp_vlan_port_count.assert_called_once_with(
+                mock.ANY, 'sw1', 1001)
+            return self.driver._update_vlan_egress.call_args[0][3]
+
+    def test_delete_port_keeps_vlan_of_other_ports(self):
+        """Test the vlan is kept while other ports are bound to it."""
+        port_dict = self._delete_port_with_count(2)
+        self.assertFalse(port_dict['port']['is_last_port_vlan'])
+
+    def test_delete_last_port_of_vlan(self):
+        """Test the vlan is removed with its last port."""
+        port_dict = self._delete_port_with_count(1)
+        self.assertTrue(port_dict['port']['is_last_port_vlan'])
+
+    def test_delete_network_postcommit(self):
+        """Test the orphan maps of the vlan segments are unbound."""
+        network = {'id': 'net1-id'}
+        segments = [{'segmentation_id': 1001, 'network_type': 'vlan'},
+                    {'segmentation_id': 1002, 'network_type': 'vxlan'}]
+        network_context = FakeNetworkContext(network, segments, network)
+        port_maps = [mock.Mock()]
+        with contextlib.nested(
+                mock.patch.object(hpe_mech.neutron_context,
+                                  'get_admin_context'),
+                mock.patch.object(db, 'get_orphan_bnp_port_maps',
+                                  return_value=port_maps),
+                mock.patch.object(hpe_mech.HPEMechanismDriver,
+                                  '_unbind_port_maps')):
+            self.driver.delete_network_postcommit(network_context)
+            db.get_orphan_bnp_port_maps.assert_called_once_with(
+                mock.ANY, None, [1001])
+            self.driver._unbind_port_maps.assert_called_once_with(
+                mock.ANY, port_maps, 'delete_network')
+
+    def test_delete_network_postcommit_without_vlan(self):
+        """Test a network without vlan segment is left alone."""
+        network = {'id': 'net1-id'}
+        segments = [{'segmentation_id': 1002, 'network_type': 'vxlan'}]
+        network_context = FakeNetworkContext(network, segments, network)
+        with mock.patch.object(db, 'get_orphan_bnp_port_maps') as get_maps:
+            self.driver.delete_network_postcommit(network_context)
+            self.assertFalse(get_maps.called)
+
+    def test__unbind_port_maps(self):
+        """Test port maps are removed with one egress update per vlan."""
+        port_map = collections.namedtuple('port_map',
+                                          ['neutron_port_id', 'switch_id',
+                                           'ifindex', 'segmentation_id'])
+        port_maps = [port_map('port1', 'sw1', '1', 1001),
+                     port_map('port2', 'sw1', '2', 1001)]
+        bnp_switch = mock.Mock(id='sw1', management_protocol='snmpv2c',
+                               vendor='hpe', family=None)
+        prov_driver = mock.Mock()
+        with contextlib.nested(
+            mock.patch.object(db, 'get_bnp_phys_switches_by_ids',
+                              return_value=[bnp_switch]),
+            mock.patch.object(db, 'delete_bnp_port_maps'),
+            mock.patch.object(db, 'update_bnp_vlan_port_count'),
+            mock.patch.object(db, 'get_bnp_switch_vlan', return_value=None),
+            mock.patch.object(db, 'update_bnp_switch_vlan'),
+            mock.patch.object(hpe_mech.HPEMechanismDriver,
+                              '_get_credentials_dict',
+                              return_value={}),
+            mock.patch.object(hpe_mech.HPEMechanismDriver,
+                              '_provisioning_driver',
+                              return_value=prov_driver)):
+            self.driver._unbind_port_maps(mock.MagicMock(), port_maps,
+                                          'purge_orphan_port_maps')
+            self.assertEqual(1, prov_driver.obj.update_isolation.call_count)
+            port = prov_driver.obj.update_isolation.call_args[0][0]['port']
+            self.assertEqual(['1', '2'], port['del_ifindexes'])
+            db.delete_bnp_port_maps.assert_called_once_with(
+                mock.ANY, ['port1', 'port2'])
+
+    def test__update_vlan_egress_from_stored_row(self):
+        """Test the change applies to the stored bitmap of the vlan."""
+        vlan = collections.namedtuple('vlan', ['egress_bitmap', 'version'])
+        prov_driver = mock.Mock()
+        prov_driver.obj.set_isolation.side_effect = ['\xc0', '\x40']
+        record = mock.Mock()
+        port = self._get_port_dict()
+        db_context = mock.MagicMock()
+        with contextlib.nested(
+                mock.patch.object(db, 'get_bnp_switch_vlan',
+                                  side_effect=[vlan('\x80', 1), None]),
+                mock.patch.object(db, 'update_bnp_switch_vlan',
+                                  return_value=True),
+                mock.patch.object(db, 'bump_bnp_generation')):
+            self.driver._update_vlan_egress(db_context, prov_driver,
+                                            'set_isolation', port, 'sw1',
+                                            1001, record)
+            self.assertEqual('\x80', port['port']['egress_bitmap'])
+            db.update_bnp_switch_vlan.assert_called_with(
+                db_context, 'sw1', 1001, '\xc0', 1)
+            # without stored bitmap the driver reads the switch
+            self.driver._update_vlan_egress(db_context, prov_driver,
+                                            'set_isolation', port, 'sw1',
+                                            1001, record)
+            self.assertIsNone(port['port']['egress_bitmap'])
+            db.update_bnp_switch_vlan.assert_called_with(
+                db_context, 'sw1', 1001, '\x40', 0)
+            resource = hp_const.BNP_SWITCH_PORTS_GENERATION
+            db.bump_bnp_generation.assert_has_calls(
+                [mock.call(db_context, resource)] * 2)
+        self.assertEqual(2, record.call_count)
+
+    def test__update_vlan_egress_redone_on_conflict(self):
+        """Test a change losing to a concurrent one is redone from it."""
+        vlan = collections.namedtuple('vlan', ['egress_bitmap', 'version'])
+        prov_driver = mock.Mock()
+        prov_driver.obj.set_isolation.side_effect = ['\xc0', '\xe0']
+        record = mock.Mock()
+        port = self._get_port_dict()
+        db_context = mock.MagicMock()
+        with contextlib.nested(
+                mock.patch.object(db, 'get_bnp_switch_vlan',
+                                  side_effect=[vlan('\x80', 1),
+                                               vlan('\xa0', 2)]),
+                mock.patch.object(db, 'update_bnp_switch_vlan',
+                                  side_effect=[False, True])):
+            self.driver._update_vlan_egress(db_context, prov_driver,
+                                            'set_isolation', port, 'sw1',
+                                            1001, record)
+            self.assertEqual('\xa0', port['port']['egress_bitmap'])
+            db.update_bnp_switch_vlan.assert_called_with(
+                db_context, 'sw1', 1001, '\xe0', 2)
+        self.assertEqual(2, prov_driver.obj.set_isolation.call_count)
+        record.assert_called_once_with()
+
+    def test__update_vlan_egress_gives_up(self):
+        """Test the last retry reads the switch and then fails."""
+        vlan = collections.namedtuple('vlan', ['egress_bitmap', 'version'])
+        prov_driver = mock.Mock()
+        prov_driver.obj.set_isolation.return_value = '\xc0'
+        record = mock.Mock()
+        port = self._get_port_dict()
+        with contextlib.nested(
+                mock.patch.object(db, 'get_bnp_switch_vlan',
+                                  return_value=vlan('\x80', 1)),
+                mock.patch.object(db, 'update_bnp_switch_vlan',
+                                  return_value=False)):
+            self.assertRaises(hpe_mech.ml2_exc.MechanismDriverError,
+                              self.driver._update_vlan_egress,
+                              mock.MagicMock(), prov_driver, 'set_isolation',
+                              port, 'sw1', 1001, record)
+        self.assertIsNone(port['port']['egress_bitmap'])
+        self.assertEqual(hp_const.VLAN_EGRESS_RETRIES + 1,
+                         prov_driver.obj.set_isolation.call_count)
+        self.assertFalse(record.called)
+
+    def test_purge_orphan_port_maps(self):
+        """Test orphans are purged in batches without a switch update."""
+        port_map = collections.namedtuple('port_map',
+                                          ['neutron_port_id', 'switch_id',
+                                           'ifindex', 'segmentation_id'])
+        batches = [[port_map('port1', 'sw1', '1', 1001),
+                    port_map('port2', 'sw1', '2', 1001)],
+                   [port_map('port3', 'sw1', '3', None)],
+                   []]
+        with contextlib.nested(
+            mock.patch.object(hpe_mech.neutron_context, 'get_admin_context',
+                              return_value=mock.MagicMock()),
+            mock.patch.object(db, 'get_orphan_bnp_port_maps',
+                              side_effect=batches),
+            mock.patch.object(db, 'delete_bnp_port_maps',
+                              side_effect=[2, 1]),
+            mock.patch.object(db, 'update_bnp_vlan_port_count'),
+            mock.patch.object(db, 'bump_bnp_generation'),
+            mock.patch.object(hpe_mech.HPEMechanismDriver,
+                              '_unbind_port_maps')):
+            self.driver.purge_orphan_port_maps()
+            self.assertEqual(3, db.get_orphan_bnp_port_maps.call_count)
+            # once per batch, after the batch is committed
+            self.assertEqual(2, db.bump_bnp_generation.call_count)
+            db.delete_bnp_port_maps.assert_has_calls(
+                [mock.call(mock.ANY, ['port1', 'port2']),
+                 mock.call(mock.ANY, ['port3'])])
+            db.update_bnp_vlan_port_count.assert_called_once_with(
+                mock.ANY, 'sw1', 1001, -2)
+            self.assertFalse(self.driver._unbind_port_maps.called)
+
+    def test_purge_validation_jobs(self):
+        """Test finished validation jobs are purged in batches."""
+        CONF.set_override('orphan_purge_batch_size', 2, 'ml2_hpe')
+        with contextlib.nested(
+                mock.patch.object(hpe_mech.neutron_context,
+                                  'get_admin_context'),
+                mock.patch.object(db, 'delete_finished_bnp_validation_jobs',
+                                  side_effect=[2, 1])):
+            self.driver.purge_validation_jobs()
+            db.delete_finished_bnp_validation_jobs.assert_called_with(
+                mock.ANY, 86400, 2)
+            self.assertEqual(
+                2, db.delete_finished_bnp_validation_jobs.call_count)
+            CONF.set_override('validation_job_retention', 0, 'ml2_hpe')
+            db.delete_finished_bnp_validation_jobs.reset_mock()
+            self.driver.purge_validation_jobs()
+            self.assertFalse(db.delete_finished_bnp_validation_jobs.called)
+
+    def test__remove_port_maps_counts_deleted_maps(self):
+        """Test maps deleted by a concurrent purge are not counted twice."""
+        db_context = mock.MagicMock()
+        with contextlib.nested(
+                mock.patch.object(db, 'delete_bnp_port_maps',
+                                  side_effect=[1, 0]),
+                mock.patch.object(db, 'update_bnp_vlan_port_count')):
+            self.driver._remove_port_maps(db_context, 'sw1', 1001,
+                                          ['port1', 'port2'])
+            self.driver._remove_port_maps(db_context, 'sw1', 1001,
+                                          ['port1', 'port2'])
+            db.update_bnp_vlan_port_count.assert_called_once_with(
+                db_context, 'sw1', 1001, -1)
+
+    def test_get_workers(self):
+        """Test the periodic tasks run in a single dedicated worker."""
+        CONF.set_override('orphan_purge_interval', 600, 'ml2_hpe')
+        CONF.set_override('validation_job_timeout', 300, 'ml2_hpe')
+        CONF.set_override('health_poll_interval', 60, 'ml2_hpe')
+        workers = self.driver.get_workers()
+        self.assertEqual(1, len(workers))
+        self.assertEqual([(self.driver._purge_orphan_port_maps, 600, 600),
+                          (self.driver._run_stale_validation_jobs, 300, 300),
+                          (self.driver._poll_switch_health, 60, None)],
+                         workers[0].tasks)
+        CONF.set_override('orphan_purge_interval', 0, 'ml2_hpe')
+        CONF.set_override('validation_job_timeout', 0, 'ml2_hpe')
+        CONF.set_override('health_poll_interval', 0, 'ml2_hpe')
+        self.assertEqual([], self.driver.get_workers())
+
+    def test_poll_switch_opens_circuit(self):
+        """Test failed polls open the circuit of the switch."""
+        CONF.set_override('health_circuit_threshold', 2, 'ml2_hpe')
+        bnp_switch = mock.Mock(id='sw1', management_protocol='snmpv2c',
+                               vendor='hpe', family=None)
+        health = mock.Mock(circuit_state=hp_const.CIRCUIT_CLOSED,
+                           consecutive_failures=1, error_count=4)
+        prov_driver = mock.Mock()
+        prov_driver.obj.get_protocol_validation_result.return_value = None
+        with contextlib.nested(
+                mock.patch.object(hpe_mech.neutron_context,
+                                  'get_admin_context'),
+                mock.patch.object(hpe_mech.HPEMechanismDriver,
+                                  '_get_credentials_dict', return_value={}),
+                mock.patch.object(hpe_mech.HPEMechanismDriver,
+                                  '_provisioning_driver',
+                                  return_value=prov_driver),
+                mock.patch.object(db, 'update_bnp_switch_health')):
+            self.driver.poll_switch(bnp_switch, health)
+            values = db.update_bnp_switch_health.call_args[0][2]
+            self.assertEqual(hp_const.CIRCUIT_OPEN, values['circuit_state'])
+            self.assertEqual(2, values['consecutive_failures'])
+            self.assertEqual(5, values['error_count'])
+            self.assertFalse(values['reachable'])
+            self.assertEqual(hp_const.DEVICE_NOT_REACHABLE,
+                             values['last_error'])
+            health.circuit_state = hp_const.CIRCUIT_OPEN
+            health.last_poll_at = values['last_poll_at']
+            db.update_bnp_switch_health.reset_mock()
+            self.driver.poll_switch(bnp_switch, health)
+            self.assertFalse(db.update_bnp_switch_health.called)
+
+    def _poll_switch_error(self, creds_dict, prov_driver):
+        bnp_switch = mock.Mock(id='sw1', management_protocol='snmpv2c',
+                               vendor='hpe', family=None)
+        with contextlib.nested(
+                mock.patch.object(hpe_mech.neutron_context,
+                                  'get_admin_context'),
+                mock.patch.object(hpe_mech.HPEMechanismDriver,
+                                  '_get_credentials_dict', **creds_dict),
+                mock.patch.object(hpe_mech.HPEMechanismDriver,
+                                  '_provisioning_driver',
+                                  return_value=prov_driver),
+                mock.patch.object(db, 'update_bnp_switch_health')):
+            self.driver.poll_switch(bnp_switch, None)
+            values = db.update_bnp_switch_health.call_args[0][2]
+        self.assertFalse(values['reachable'])
+        self.assertNotIn('rtt', values)
+        return values['last_error']
+
+    def test_poll_switch_without_driver(self):
+        """Test a switch without driver is not reported unreachable."""
+        error = self._poll_switch_error(
+            {'return_value': {'ip_address': '1.1.1.1'}}, None)
+        self.assertEqual(hp_const.NO_DRVR_FOUND, error)
+
+    def test_poll_switch_without_credentials(self):
+        """Test a switch without credentials is not reported unreachable."""
+        prov_driver = mock.Mock()
+        error = self._poll_switch_error(
+            {'side_effect': hpe_mech.ml2_exc.MechanismDriverError(
+                method='poll_switch')}, prov_driver)
+        self.assertEqual(hp_const.NO_CREDENTIALS_FOUND, error)
+        self.assertFalse(
+            prov_driver.obj.get_protocol_validation_result.called)
+
+    def test_poll_switch_closes_half_open_circuit(self):
+        """Test a successful probe closes an expired open circuit."""
+        bnp_switch = mock.Mock(id='sw1', management_protocol='snmpv2c',
+                               vendor='hpe', family=None)
+        health = mock.Mock(circuit_state=hp_const.CIRCUIT_OPEN,
+                           consecutive_failures=3, error_count=3,
+                           last_poll_at=datetime.datetime(2016, 1, 1))
+        prov_driver = mock.Mock()
+        prov_driver.obj.get_protocol_validation_result.return_value = (
+            '44:31:92:61:89:d2')
+        with contextlib.nested(
+                mock.patch.object(hpe_mech.neutron_context,
+                                  'get_admin_context'),
+                mock.patch.object(hpe_mech.HPEMechanismDriver,
+                                  '_get_credentials_dict', return_value={}),
+                mock.patch.object(hpe_mech.HPEMechanismDriver,
+                                  '_provisioning_driver',
+                                  return_value=prov_driver),
+                mock.patch.object(hpe_mech, 'time'),
+                mock.patch.object(db, 'update_bnp_switch_health')):
+            # the rtt is the duration of the probe alone
+            hpe_mech.time.time.side_effect = [10.0, 10.25]
+            self.driver.poll_switch(bnp_switch, health)
+            values = db.update_bnp_switch_health.call_args[0][2]
+        self.assertEqual(hp_const.CIRCUIT_CLOSED, values['circuit_state'])
+        self.assertTrue(values['reachable'])
+        self.assertEqual(0, values['consecutive_failures'])
+        self.assertEqual(0.25, values['rtt'])
+
     def test__get_binding_profile(self):
         """Test _get_binding_profile method."""
         tenant_id = 'ten-1'
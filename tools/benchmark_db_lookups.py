@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# Copyright 2016 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the cost of the hot BNP DB lookups as the tables grow.
+
+Usage: benchmark_db_lookups.py [--without-indexes] [--lookups N] [SIZE ...]
+
+Every table is filled with SIZE rows in an in-memory sqlite database and
+the hot lookups are timed. Each lookup matches a single row, so that only
+the index use is measured: the vlan looked up by segmentation id holds
+one port and the other ports share the other vlans. With the lookup
+indexes the cost per lookup stays flat from 100 to 100000 rows, without
+them (--without-indexes) it grows with the table size.
+"""
+
+import argparse
+import random
+import time
+
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from baremetal_network_provisioning.db import bm_nw_provision_db as db
+from baremetal_network_provisioning.db import bm_nw_provision_models as models
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+MAX_VLAN = 4094
+LOOKUP_VLAN = 1
+
+TABLES = [models.BNPPhysicalSwitch.__table__,
+          models.BNPSwitchPortMapping.__table__,
+          models.BNPNeutronPort.__table__,
+          models.BNPSNMPCredential.__table__]
+
+
+class Context(object):
+
+    def __init__(self, session):
+        self.session = session
+
+
+def _mac(index):
+    return ':'.join('%02x' % ((index >> shift) & 0xff)
+                    for shift in (40, 32, 24, 16, 8, 0))
+
+
+def _vlan(index):
+    # the first port is alone in LOOKUP_VLAN, the others share the rest
+    if not index:
+        return LOOKUP_VLAN
+    return index % (MAX_VLAN - 1) + LOOKUP_VLAN + 1
+
+
+def populate(engine, size):
+    switches = []
+    mappings = []
+    ports = []
+    creds = []
+    for index in range(size):
+        switch_id = 'switch-%d' % index
+        switches.append({'id': switch_id,
+                         'name': 'switch%d' % index,
+                         'vendor': 'hpe',
+                         'family': None,
+                         'ip_address': '10.%d.%d.%d' % (index >> 16,
+                                                        (index >> 8) & 0xff,
+                                                        index & 0xff),
+                         'mac_address': _mac(index),
+                         'port_provisioning': 'ENABLED',
+                         'management_protocol': 'snmpv2c',
+                         'credentials': 'creds%d' % index})
+        mappings.append({'neutron_port_id': 'port-%d' % index,
+                         'switch_port_name': 'Ten-GigabitEthernet1/0/1',
+                         'switch_id': switch_id,
+                         'ifindex': '1'})
+        ports.append({'neutron_port_id': 'port-%d' % index,
+                      'access_type': 'access',
+                      'segmentation_id': _vlan(index),
+                      'bind_status': False})
+        creds.append({'id': 'cred-%d' % index,
+                      'name': 'creds%d' % index,
+                      'protocol_type': 'snmpv2c',
+                      'write_community': 'public'})
+    with engine.begin() as conn:
+        conn.execute(models.BNPPhysicalSwitch.__table__.insert(), switches)
+        conn.execute(models.BNPSwitchPortMapping.__table__.insert(), mappings)
+        conn.execute(models.BNPNeutronPort.__table__.insert(), ports)
+        conn.execute(models.BNPSNMPCredential.__table__.insert(), creds)
+
+
+def lookups(context, size):
+    index = random.randrange(size)
+    return [
+        ('get_bnp_phys_switch_by_mac',
+         lambda: db.get_bnp_phys_switch_by_mac(context, _mac(index))),
+        ('get_bnp_phys_switch_by_name',
+         lambda: db.get_bnp_phys_switch_by_name(context, 'switch%d' % index)),
+        ('get_bnp_neutron_port_by_seg_id',
+         lambda: db.get_bnp_neutron_port_by_seg_id(context, LOOKUP_VLAN)),
+        ('get_bnp_switch_port_map_by_switchid',
+         lambda: db.get_bnp_switch_port_map_by_switchid(
+             context, 'switch-%d' % index)),
+        ('get_snmp_cred_by_name_and_protocol',
+         lambda: db.get_snmp_cred_by_name_and_protocol(
+             context, 'creds%d' % index, 'snmpv2c')),
+    ]
+
+
+def run(size, count, with_indexes):
+    engine = sa.create_engine('sqlite://')
+    metadata = sa.MetaData()
+    for table in TABLES:
+        table = table.tometadata(metadata)
+        if not with_indexes:
+            table.indexes.clear()
+    metadata.create_all(engine)
+    populate(engine, size)
+    context = Context(orm.sessionmaker(bind=engine, autocommit=True)())
+    results = {}
+    for name, lookup in lookups(context, size):
+        start = time.time()
+        for i in range(count):
+            lookup()
+            context.session.expunge_all()
+        results[name] = (time.time() - start) / count
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sizes', metavar='SIZE', type=int, nargs='*',
+                        default=DEFAULT_SIZES)
+    parser.add_argument('--lookups', type=int, default=200,
+                        help='number of times each lookup is timed')
+    parser.add_argument('--without-indexes', action='store_true',
+                        help='create the tables without the lookup indexes')
+    args = parser.parse_args()
+    names = None
+    for size in args.sizes:
+        results = run(size, args.lookups, not args.without_indexes)
+        if names is None:
+            names = sorted(results)
+            print('%-8s %s' % ('rows', ' '.join('%36s' % name
+                                                for name in names)))
+        print('%-8d %s' % (size, ' '.join('%34.3fms' % (results[name] * 1000)
+                                          for name in names)))
+
+
+if __name__ == '__main__':
+    main()